@@ -5,9 +5,14 @@ import sys
 import subprocess
 import json
 import time
+import functools
+import queue
 from threading import Thread, Lock as ThreadLock
 from config import ENV_PATH
 from dotenv import load_dotenv
+from circuit_breaker import classify_error
+from intelligence_core import invalidate_workspace_context
+from cancellation import CancellationToken, OperationCancelled, kill_process_tree, new_process_group_kwargs
 load_dotenv(ENV_PATH, override=True)  # ALWAYS load fresh key from portable .env
 
 # Lightweight Agent Framework (NO HuggingFace dependency)
@@ -49,7 +54,8 @@ def _dbg(hypothesis_id: str, location: str, message: str, data: dict):
 # SECURITY SANDBOX & FILE SYSTEM WRAPPERS
 # ------------------------------------------------------------------
 
-# This is set by main.py when the user changes directory
+# Legacy default workspace for callers that do not pass one explicitly
+# (standalone get_agent()). OmniAgent instances bind their own workspace.
 WORKING_DIRECTORY = None
 
 def get_fallback_working_dir():
@@ -62,16 +68,17 @@ def get_fallback_working_dir():
         return desktop
     return Path.home()
 
-def get_base_path():
-    """Returns WORKING_DIRECTORY. Raises error if no folder is open."""
+def get_base_path(workspace: str = None):
+    """Returns the given workspace (or WORKING_DIRECTORY). Raises error if no folder is open."""
     from pathlib import Path
-    if WORKING_DIRECTORY:
-        return Path(WORKING_DIRECTORY)
+    workspace = workspace or WORKING_DIRECTORY
+    if workspace:
+        return Path(workspace)
     raise ValueError("No folder is open. Please open a folder first using the Open Folder button.")
 
-def safe_write(filename: str, content: str) -> str:
+def safe_write(filename: str, content: str, workspace: str = None) -> str:
     """Safely writes content to a file. Phase 4.5: Intercepts writes for Diff Staging."""
-    base = get_base_path()
+    base = get_base_path(workspace)
     filename = filename.lstrip("/").lstrip("\\")
     filepath = (base / filename).resolve()
 
@@ -81,8 +88,8 @@ def safe_write(filename: str, content: str) -> str:
     filepath.parent.mkdir(parents=True, exist_ok=True)
 
     # Phase 5 Diff Staging Hook
-    from diff_staging_layer import DiffStagingLayer
-    layer = DiffStagingLayer(str(base))
+    from diff_staging_layer import get_staging_layer
+    layer = get_staging_layer(str(base))
     patch_result = layer.create_patch(str(filepath), content)
 
     if "error" in patch_result:
@@ -102,14 +109,15 @@ def safe_write(filename: str, content: str) -> str:
 
     # If it's a completely new file creation, write it instantly to not slow down scaffolding
     filepath.write_text(content, encoding='utf-8')
+    invalidate_workspace_context(base)
     logger.info(f"safe_write: Created entirely new file {filepath}")
     return str(filepath)
 
-def safe_open(filepath_str, mode='r', **kwargs):
-    """Safe wrapper for open() rooted to WORKING_DIRECTORY."""
+def safe_open(filepath_str, mode='r', *args, workspace: str = None, **kwargs):
+    """Safe wrapper for open() rooted to the workspace."""
     from pathlib import Path
     import builtins
-    base = get_base_path()
+    base = get_base_path(workspace)
     filepath = Path(filepath_str)
 
     if not filepath.is_absolute():
@@ -123,12 +131,12 @@ def safe_open(filepath_str, mode='r', **kwargs):
     if any(m in mode for m in ('w', 'a', 'x')):
         filepath.parent.mkdir(parents=True, exist_ok=True)
 
-    return builtins.open(str(filepath), mode, **kwargs)
+    return builtins.open(str(filepath), mode, *args, **kwargs)
 
-def safe_mkdir(path_str, *args, **kwargs):
-    """Safe wrapper for directory creation rooted to WORKING_DIRECTORY."""
+def safe_mkdir(path_str, *args, workspace: str = None, **kwargs):
+    """Safe wrapper for directory creation rooted to the workspace."""
     from pathlib import Path
-    base = get_base_path()
+    base = get_base_path(workspace)
     path = Path(path_str)
 
     if not path.is_absolute():
@@ -141,11 +149,11 @@ def safe_mkdir(path_str, *args, **kwargs):
     path.mkdir(parents=True, exist_ok=True)
     return str(path)
 
-def safe_delete(filename):
+def safe_delete(filename, workspace: str = None):
     """Delete a file from the working directory (sandboxed)."""
     from pathlib import Path
     import os
-    base = get_base_path()
+    base = get_base_path(workspace)
     path = Path(filename)
     if not path.is_absolute():
         path = base / path
@@ -159,11 +167,13 @@ def safe_delete(filename):
 
     if path.is_file():
         os.remove(path)
+        invalidate_workspace_context(base)
         logger.info(f"Deleted file: {path}")
         return f"Deleted: {filename}"
     elif path.is_dir():
         import shutil
         shutil.rmtree(path)
+        invalidate_workspace_context(base)
         logger.info(f"Deleted directory: {path}")
         return f"Deleted directory: {filename}"
     else:
@@ -183,11 +193,12 @@ def open_in_browser(filepath_str):
     wb.open(filepath.as_uri())
     return str(filepath)
 
-def create_web_page(folder_name: str, page_type: str = "landing", title: str = "My Page", theme: str = "dark") -> str:
+def create_web_page(folder_name: str, page_type: str = "landing", title: str = "My Page", theme: str = "dark",
+                    workspace: str = None) -> str:
     """
     Generates professional HTML/CSS templates for standard pages.
     """
-    folder_path = safe_mkdir(folder_name)
+    folder_path = safe_mkdir(folder_name, workspace=workspace)
     from pathlib import Path
     folder = Path(folder_path)
 
@@ -217,6 +228,28 @@ def create_web_page(folder_name: str, page_type: str = "landing", title: str = "
     (folder / "index.html").write_text(html_content, encoding='utf-8')
     return open_in_browser(str(folder / "index.html"))
 
+def _bind_workspace(fn, workspace: str):
+    """Pin a sandboxed helper to one workspace (agent code calls it without one)."""
+    @functools.wraps(fn)
+    def bound(*args, **kwargs):
+        kwargs.setdefault("workspace", workspace)
+        return fn(*args, **kwargs)
+    return bound
+
+
+def bind_workspace_tools(workspace: str = None) -> dict:
+    """File helpers exposed to agent code, bound to `workspace` (None → WORKING_DIRECTORY)."""
+    return {
+        name: _bind_workspace(fn, workspace) if workspace else fn
+        for name, fn in (
+            ("safe_write", safe_write),
+            ("safe_open", safe_open),
+            ("safe_delete", safe_delete),
+            ("safe_mkdir", safe_mkdir),
+            ("create_web_page", create_web_page),
+        )
+    }
+
 # ------------------------------------------------------------------
 # TERMINAL TOOL — The "Hands" of the God Agent
 # ------------------------------------------------------------------
@@ -246,6 +279,19 @@ class TerminalTool(Tool):
     }
     output_type = "string"
 
+    def __init__(self, working_directory: str = None, **kwargs):
+        super().__init__(**kwargs)
+        self.working_directory = working_directory
+        # Set by OmniAgent for the duration of each run
+        self.cancel_token: CancellationToken = None
+        # on_output(command, stream, line) is called for every line as it is produced
+        self.on_output = None
+        # Persistent shell (OMNI_PERSISTENT_SHELL=1); created on first command
+        self._shell = None
+
+    HARD_TIMEOUT_S = 120  # total runtime cap
+    IDLE_TIMEOUT_S = 60   # no stdout/stderr for this long → treat as hung
+
     # Commands that are too dangerous even for God Mode
     BLOCKED_COMMANDS = frozenset({
         "format", "del /q C:", "rd /s /q C:", "shutdown", "restart", ":(){", "mkfs",
@@ -292,10 +338,114 @@ class TerminalTool(Tool):
 
         return command
 
-    def forward(self, command: str) -> str:
-        """Execute a command and return structured stdout/stderr output."""
-
-        # Translate command for Windows if necessary
+    def _run_process(self, command: str, cwd: str, env: dict, token: CancellationToken):
+        """
+        Run `command`, streaming each output line to `on_output` as it arrives.
+        Returns (returncode, stdout, stderr, status) where status is one of
+        "exited", "timeout", "idle" or "cancelled".
+        """
+        # Own process group so a timeout or cancel kills the whole tree
+        proc = subprocess.Popen(
+            command,
+            shell=True,
+            stdin=subprocess.DEVNULL,  # a prompt for input would otherwise hang until the idle timeout
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            encoding="utf-8",
+            errors="replace",
+            cwd=cwd,
+            env=env,
+            **new_process_group_kwargs(),
+        )
+        buffers = {"stdout": [], "stderr": []}
+        last_output = [time.monotonic()]
+
+        def pump(pipe, name):
+            for line in iter(pipe.readline, ""):
+                line = line.rstrip("\r\n")
+                buffers[name].append(line)
+                last_output[0] = time.monotonic()
+                if self.on_output is not None:
+                    try:
+                        self.on_output(command, name, line)
+                    except Exception:
+                        pass
+            pipe.close()
+
+        readers = [Thread(target=pump, args=(proc.stdout, "stdout"), daemon=True),
+                   Thread(target=pump, args=(proc.stderr, "stderr"), daemon=True)]
+        for reader in readers:
+            reader.start()
+
+        kill = lambda: kill_process_tree(proc)
+        if token is not None:
+            token.add_callback(kill)
+        status = "exited"
+        started = time.monotonic()
+        try:
+            while True:
+                try:
+                    proc.wait(timeout=0.25)
+                    break
+                except subprocess.TimeoutExpired:
+                    pass
+                now = time.monotonic()
+                if token is not None and token.cancelled:
+                    status = "cancelled"
+                elif now - started > self.HARD_TIMEOUT_S:
+                    status = "timeout"
+                elif now - last_output[0] > self.IDLE_TIMEOUT_S:
+                    status = "idle"
+                else:
+                    continue
+                kill()
+                proc.wait()
+                break
+        finally:
+            if token is not None:
+                token.remove_callback(kill)
+        if token is not None and token.cancelled:
+            status = "cancelled"
+        for reader in readers:
+            reader.join(timeout=2)
+        return proc.returncode, "\n".join(buffers["stdout"]).strip(), "\n".join(buffers["stderr"]).strip(), status
+
+    def _shell_session(self, cwd: str, env: dict):
+        """The persistent shell for this tool, or None when disabled/unsupported."""
+        import shell_session
+        if not (shell_session.is_enabled() and shell_session.is_supported()):
+            return None
+        if self._shell is not None and self._shell.cwd != cwd:
+            self._shell.close()  # workspace changed — don't carry state across projects
+            self._shell = None
+        if self._shell is None:
+            self._shell = shell_session.ShellSession(cwd, env)
+        return self._shell
+
+    def _run_in_shell(self, shell, command: str, token: CancellationToken):
+        """Same contract as _run_process, executed in the persistent shell."""
+        on_line = None
+        if self.on_output is not None:
+            on_line = lambda line: self.on_output(command, "stdout", line)
+        returncode, output, status = shell.run(
+            command, on_line=on_line, token=token,
+            hard_timeout=self.HARD_TIMEOUT_S, idle_timeout=self.IDLE_TIMEOUT_S,
+        )
+        if status == "died":
+            output += "\n\n(The command exited the shell; a fresh shell will be started — cd/env state was reset.)"
+            status = "exited"
+        elif status in ("timeout", "idle"):
+            output += "\n\n(The shell was restarted — cd/env state was reset.)"
+        return (returncode if returncode is not None else -1), output.strip(), "", status
+
+    def close(self):
+        if self._shell is not None:
+            self._shell.close()
+            self._shell = None
+
+    def prepare(self, command: str):
+        """Translate for the platform and screen it → (command, refusal message or None)."""
         original_command = command
         command = self._translate_command(command)
 
@@ -303,7 +453,24 @@ class TerminalTool(Tool):
         cmd_lower = command.lower().strip()
         for blocked in self.BLOCKED_COMMANDS:
             if blocked in cmd_lower:
-                return f"🛑 BLOCKED: Command '{original_command}' (translated to '{command}') is too dangerous. Refusing to execute."
+                return command, f"🛑 BLOCKED: Command '{original_command}' (translated to '{command}') is too dangerous. Refusing to execute."
+        return command, None
+
+    def cwd(self) -> str:
+        return self.working_directory or WORKING_DIRECTORY or os.getcwd()
+
+    def forward(self, command: str) -> str:
+        """Execute a command and return structured stdout/stderr output."""
+
+        # Translate command for Windows if necessary; refuse blocked commands
+        original_command = command
+        command, refusal = self.prepare(command)
+        if refusal:
+            return refusal
+
+        token = self.cancel_token
+        if token is not None and token.cancelled:
+            return f"🛑 CANCELLED: Run was cancelled ({token.reason}); '{original_command}' was not executed."
 
         if command != original_command:
             logger.info(f"🖥️  TERMINAL: Translated → {original_command} to {command}")
@@ -312,25 +479,33 @@ class TerminalTool(Tool):
 
         try:
             # Determine working directory
-            cwd = WORKING_DIRECTORY if WORKING_DIRECTORY else os.getcwd()
+            cwd = self.cwd()
 
             # Build a clean environment
             env = os.environ.copy()
             env['PYTHONIOENCODING'] = 'utf-8'
+            env['PYTHONUNBUFFERED'] = '1'  # let Python children stream instead of block-buffering
 
-            result = subprocess.run(
-                command,
-                shell=True,
-                capture_output=True,
-                text=True,
-                timeout=120,  # 2 minute hard timeout
-                cwd=cwd,
-                env=env,
-            )
-
-            stdout = result.stdout.strip()
-            stderr = result.stderr.strip()
-            returncode = result.returncode
+            shell = self._shell_session(cwd, env)
+            if shell is not None:
+                returncode, stdout, stderr, status = self._run_in_shell(shell, command, token)
+            else:
+                returncode, stdout, stderr, status = self._run_process(command, cwd, env, token)
+            # Commands routinely create/modify files — don't serve a stale context snapshot
+            invalidate_workspace_context(cwd)
+
+            if status == "cancelled":
+                logger.info(f"🖥️  TERMINAL: 🛑 Killed on cancel → {command}")
+                return f"🛑 CANCELLED: Command '{original_command}' was killed ({token.reason})."
+            if status in ("timeout", "idle"):
+                limit = (f"exceeded {self.HARD_TIMEOUT_S} seconds" if status == "timeout"
+                         else f"produced no output for {self.IDLE_TIMEOUT_S} seconds (likely hung or waiting for input)")
+                logger.error(f"🖥️  TERMINAL: ⏰ {status.title()} timeout → {command}")
+                output = f"❌ TIMEOUT: Command '{command}' {limit}.\nThe process was killed. Consider breaking the task into smaller steps."
+                tail = "\n".join((stdout + "\n" + stderr).strip().splitlines()[-20:])
+                if tail:
+                    output += f"\n\nLast output:\n{tail}"
+                return output
 
             # Build structured output
             if returncode != 0:
@@ -357,12 +532,6 @@ class TerminalTool(Tool):
             logger.info(f"🖥️  TERMINAL: ✅ Success (exit={returncode})")
             return output
 
-        except subprocess.TimeoutExpired:
-            logger.error(f"🖥️  TERMINAL: ⏰ Timeout after 120s → {command}")
-            return (
-                f"❌ TIMEOUT: Command '{command}' exceeded 120 seconds.\n"
-                "The process was killed. Consider breaking the task into smaller steps."
-            )
         except Exception as e:
             logger.error(f"🖥️  TERMINAL: 💥 Exception → {e}")
             return f"❌ SYSTEM ERROR: {str(e)}\n(Review this error and fix your approach.)"
@@ -405,10 +574,10 @@ class VisionTool(Tool):
                 return "Vision unavailable: GEMINI_API_KEY not configured in .env"
 
             # Use Gemini Pro Vision via LiteLLM
-            import litellm
-            response = litellm.completion(
-                model="gemini/gemini-3.1-flash-lite-preview",
-                api_key=self.gemini_key,
+            from gateway import get_gateway
+            from request_coalescer import coalesced_completion
+            response = coalesced_completion(
+                **get_gateway().cloud_completion_kwargs(self.gemini_key),
                 messages=[
                     {
                         "role": "user",
@@ -419,11 +588,6 @@ class VisionTool(Tool):
                     }
                 ],
                 max_tokens=500,
-                fallbacks=[
-                    {"model": "gemini/gemini-3-flash-preview", "api_key": self.gemini_key},
-                    {"model": "gemini/gemini-2.5-flash-lite", "api_key": self.gemini_key},
-                    {"model": "gemini/gemini-flash-lite-latest", "api_key": self.gemini_key},
-                ]
             )
 
             result = response.choices[0].message.content
@@ -439,8 +603,13 @@ class VisionTool(Tool):
 # ------------------------------------------------------------------
 
 class OmniAgent:
-    def __init__(self):
+    def __init__(self, working_directory: str = None):
         logger.info("Initializing Hybrid Intelligence Engine (Gemini + Local Qwen)...")
+        # Workspace is bound per instance so pooled agents never share one
+        self.working_directory = working_directory
+        self.tools = bind_workspace_tools(working_directory)
+        # A CodeAgent keeps per-run memory: one run at a time per instance
+        self.run_lock = ThreadLock()
         _dbg(
             hypothesis_id="H1",
             location="backend/agent.py:OmniAgent.__init__",
@@ -457,7 +626,13 @@ class OmniAgent:
                 return self.latest_image
 
         self.vision_tool = VisionTool(get_latest_image)
-        self.terminal_tool = TerminalTool()
+        self.terminal_tool = TerminalTool(working_directory=working_directory)
+        # Long-running commands (dev servers, watchers) outlive a single step
+        from job_manager import JobManager
+        self.jobs = JobManager(self.terminal_tool.cwd, prepare=self.terminal_tool.prepare)
+        # Terminal lines produced during a run, drained into progress events
+        self._progress = queue.Queue()
+        self.terminal_tool.on_output = lambda command, stream, line: self._progress.put((command, stream, line))
 
         # ----------------------------------------------------------
         # HYBRID INTELLIGENCE GATEWAY (Smart Model Routing)
@@ -541,6 +716,9 @@ RULE 4 - TOOLS AVAILABLE:
   - `safe_delete(filename)` - Delete a file or directory
   - `safe_mkdir(dirname)` - Create a directory
   - `terminal(command)` - Execute ANY shell command (pip, python, node, git, etc.)
+  - `start_job(command)` - Start a long-running command (dev server, watcher) in the background; returns a message naming its job id ("✅ Started job-N: ...") or a "❌" refusal
+  - `job_output(job_id, tail=50)` - Status and last output lines of a background job
+  - `stop_job(job_id)` - Stop a background job
   - `analyze_screen(question)` - See the user's screen
 
 RULE 5 - FILE DELETION (when user says "delete", "remove"):
@@ -556,6 +734,9 @@ RULE 6 - TERMINAL EXECUTION (when user says "run", "install", "test", "execute")
     * `terminal("git status")`
   - If the terminal returns an error, ANALYZE it and FIX it automatically.
   - Do NOT just report the error back to the user.
+  - Servers and watchers never exit: use `start_job` instead of `terminal`, e.g.
+    * `print(start_job("npm run dev"))`, then in the next step `job_output("job-N", tail=20)` with the
+      job id from that message to check it started.
 
 RULE 7 - SELF-HEALING PROTOCOL:
   When you encounter an error:
@@ -672,10 +853,13 @@ final_answer("Done!")             # WRONG! Must include filenames: "DONE: file.h
                         message="Attempting LiteLLMModel local fallback",
                         data={"local_model": local_model, "local_url": local_url},
                     )
-                    self.model = LiteLLMModel(
-                        model_id=local_model,
-                        api_base=local_url,
-                    )
+                    if self.gateway:
+                        self.model = self.gateway.get_pooled_model(local_model, api_base=local_url)
+                    else:
+                        self.model = LiteLLMModel(
+                            model_id=local_model,
+                            api_base=local_url,
+                        )
                     logger.info(f"⚡ FALLBACK: Using Local {local_model} (Ollama)")
                     _dbg(
                         hypothesis_id="H4",
@@ -723,13 +907,12 @@ final_answer("Done!")             # WRONG! Must include filenames: "DONE: file.h
                         stream_outputs=False,
                         executor_kwargs={
                             "additional_functions": {
-                                "safe_write": safe_write,
-                                "safe_open": safe_open,
-                                "safe_delete": safe_delete,
-                                "safe_mkdir": safe_mkdir,
+                                **self.tools,
                                 "open_in_browser": open_in_browser,
-                                "create_web_page": create_web_page,
                                 "terminal": self.terminal_tool.forward,
+                                "start_job": self.jobs.start_job,
+                                "job_output": self.jobs.job_output,
+                                "stop_job": self.jobs.stop_job,
                                 "VisionTool": VisionTool
                             }
                         }
@@ -788,8 +971,100 @@ final_answer("Done!")             # WRONG! Must include filenames: "DONE: file.h
             logger.warning(f"⚠️ Gateway routing failed ({e}). Using default model.")
             return None
 
-    def execute_stream(self, task: str):
-        """Execute a task context-aware and yield ONLY the clean final answer to the frontend."""
+    def _is_local_model_failure(self, error: BaseException) -> bool:
+        """True when the current (non-cloud) model is unreachable or behind an open circuit."""
+        kind = classify_error(error)
+        if kind in ("connection", "not_found"):
+            return True
+        return kind == "circuit_open" and not getattr(self.model, "cloud_chain", False)
+
+    def close(self):
+        """Release per-session resources when the agent leaves the pool."""
+        self.terminal_tool.close()
+        self.jobs.stop_all()
+
+    def _drain_progress(self):
+        """Turn queued terminal lines into copilot progress events (consecutive lines batched)."""
+        batch, key = [], None
+        while True:
+            try:
+                command, stream, line = self._progress.get_nowait()
+            except queue.Empty:
+                break
+            if key is not None and key != (command, stream):
+                yield self._progress_event(key, batch)
+                batch = []
+            key = (command, stream)
+            batch.append(line)
+        if batch:
+            yield self._progress_event(key, batch)
+
+    @staticmethod
+    def _progress_event(key, lines):
+        command, stream = key
+        return {
+            "__copilot_event__": True,
+            "source": "terminal",
+            "type": "progress",
+            "payload": {"command": command, "stream": stream, "lines": lines}
+        }
+
+    def _run_with_progress(self, fn, *args):
+        """fn(*args) on a worker thread, yielding terminal progress while it works; returns its result."""
+        outcome = {}
+
+        def target():
+            try:
+                outcome["result"] = fn(*args)
+            except BaseException as e:
+                outcome["error"] = e
+
+        worker = Thread(target=target, daemon=True)
+        worker.start()
+        while worker.is_alive():
+            worker.join(timeout=0.2)
+            yield from self._drain_progress()
+        yield from self._drain_progress()
+        if "error" in outcome:
+            raise outcome["error"]
+        return outcome.get("result")
+
+    def _run_agent_streaming(self, prompt: str):
+        """agent.run() with terminal progress streamed while it works; returns the result."""
+        return (yield from self._run_with_progress(self.agent.run, prompt, False))
+
+    def _iterate_with_progress(self, iterable):
+        """Yield from a blocking iterator, each step on a worker thread so progress keeps flowing."""
+        iterator, done = iter(iterable), object()
+        while True:
+            item = yield from self._run_with_progress(next, iterator, done)
+            if item is done:
+                return
+            yield item
+
+    def execute_stream(self, task: str, cancel_token: CancellationToken = None):
+        """Execute a task context-aware and yield ONLY the clean final answer to the frontend.
+
+        Cancelling `cancel_token` stops the CodeAgent before its next step and
+        kills any running terminal command.
+        """
+        token = cancel_token or CancellationToken()
+        self.terminal_tool.cancel_token = token
+        self._progress = queue.Queue()
+        interrupt = getattr(self.agent, "interrupt", None)
+        if interrupt is not None:
+            token.add_callback(interrupt)
+        try:
+            yield from self._execute_stream(task, token)
+        except OperationCancelled as e:
+            logger.info(f"🛑 Agent run stopped: {e}")
+            yield f"🛑 **Run cancelled** ({e.reason})."
+        finally:
+            if interrupt is not None:
+                token.remove_callback(interrupt)
+            self.terminal_tool.cancel_token = None
+
+    def _execute_stream(self, task: str, token: CancellationToken):
         logger.info(f"Agent task received: {task}")
         final_answer = None
 
@@ -803,12 +1078,14 @@ final_answer("Done!")             # WRONG! Must include filenames: "DONE: file.h
             )
             return
 
+        workspace = self.working_directory or WORKING_DIRECTORY
+
         # --- PHASE 3: INTELLIGENCE CORE WIRING ---
         from intelligence_core import IntelligenceCore
-        core = IntelligenceCore(WORKING_DIRECTORY)
+        core = IntelligenceCore(workspace)
         context_prompt = ""
 
-        if WORKING_DIRECTORY:
+        if workspace:
             # Multi-Agent Orchestrator Handling (Phase 4)
             from agent_orchestrator import AgentOrchestrator
             orchestrator = AgentOrchestrator(core)
@@ -816,19 +1093,16 @@ final_answer("Done!")             # WRONG! Must include filenames: "DONE: file.h
 
             # --- LLM Runner Definition (Bridge for simple/complex tasks) ---
             def llm_runner(prompt: str) -> str:
+                token.raise_if_cancelled()
                 try:
                     result = self.agent.run(prompt, stream=False)
                     return str(result) if result else ""
                 except Exception as e:
-                    err_str = str(e).lower()
+                    token.raise_if_cancelled()
                     logger.error(f"[LLM RUNNER ERR] {e}")
 
                     # Runtime fallback: if Ollama is down, swap to Gemini Cloud
-                    is_conn_err = any(kw in err_str for kw in [
-                        "connection refused", "connection error", "connect_tcp",
-                        "ollama", "10061", "timeout", "not found",
-                    ])
-                    if is_conn_err and self.gateway and self.gateway.gemini_key:
+                    if self._is_local_model_failure(e) and self.gateway and self.gateway.gemini_key:
                         logger.warning("⚠️ LLM RUNNER: Model offline. Swapping to Gemini Cloud...")
                         try:
                             cloud_model = self.gateway.get_cloud_model()
@@ -836,15 +1110,17 @@ final_answer("Done!")             # WRONG! Must include filenames: "DONE: file.h
                                 self.agent.model = cloud_model
                                 self.model = cloud_model
                                 logger.info(f"☁️ LLM RUNNER: Swapped to {cloud_model.model_id}")
+                                token.raise_if_cancelled()
                                 result = self.agent.run(prompt, stream=False)
                                 return str(result) if result else ""
                         except Exception as retry_err:
+                            token.raise_if_cancelled()
                             logger.error(f"☁️ LLM RUNNER: Cloud retry also failed: {retry_err}")
                     return ""
 
             # --- PHASE 6: INTENT ROUTING MVP ---
             from intent_router import IntentRouter
-            router = IntentRouter(confidence_threshold=0.8)
+            router = IntentRouter(confidence_threshold=0.8, workspace_dir=workspace)
 
             # Skip routing for explicit slash commands to preserve legacy UX
             if not task.startswith("/"):
@@ -866,7 +1142,8 @@ final_answer("Done!")             # WRONG! Must include filenames: "DONE: file.h
                     "payload": {
                         "label": exec_path,
                         "confidence": routing_result.get("confidence", 0.0),
-                        "explanation": routing_result.get("reason", "No explanation provided.")
+                        "explanation": routing_result.get("reason", "No explanation provided."),
+                        "event_id": routing_result.get("event_id")
                     }
                 }
 
@@ -876,7 +1153,11 @@ final_answer("Done!")             # WRONG! Must include filenames: "DONE: file.h
                     source="router",
                     reason_code="intent_classification",
                     summary=f"Classified as '{exec_path}' based on request structure.",
-                    context={"confidence": routing_result.get("confidence", 0.0), "intent": exec_path}
+                    context={
+                        "confidence": routing_result.get("confidence", 0.0),
+                        "intent": exec_path,
+                        "event_id": routing_result.get("event_id"),
+                    }
                 )
 
                 # Templates are used ONLY as a silent fallback when LLM is unavailable.
@@ -896,16 +1177,24 @@ final_answer("Done!")             # WRONG! Must include filenames: "DONE: file.h
 
                         context_ext = {
                             "task": task,
-                            "workspace": core.get_workspace_context(max_files=5),
+                            "workspace": core.get_relevant_context(task, max_chunks=6, max_chars=8000),
                             "runner": llm_runner
                         }
 
                         # Phase 6 Sprint 4: Stream dag_update events for Timeline UI
                         completed_count = 0
                         has_failed = False
-                        for dag_event in planner.execute_graph_stream(graph, context_ext):
-                            # Yield the dag_event dict directly — WebSocket handler will detect and forward
-                            yield {"__dag_event__": True, **dag_event}
+                        # Nodes run llm_runner synchronously: step the graph off this thread so
+                        # terminal progress streams while a node works, not only between nodes
+                        # Yield the dag_event dict directly — WebSocket handler will detect and forward
+                        dag_events = (
+                            {"__dag_event__": True, **event}
+                            for event in planner.execute_graph_stream(graph, context_ext, cancel_token=token)
+                        )
+                        for dag_event in self._iterate_with_progress(dag_events):
+                            yield dag_event
+                            if not dag_event.get("__dag_event__"):
+                                continue  # terminal progress from the running node
                             # Track final state
                             all_done = all(n["status"] == "COMPLETED" for n in dag_event.get("nodes", []))
                             any_fail = any(n["status"] == "FAILED" for n in dag_event.get("nodes", []))
@@ -914,17 +1203,20 @@ final_answer("Done!")             # WRONG! Must include filenames: "DONE: file.h
                             if any_fail:
                                 has_failed = True
 
+                        token.raise_if_cancelled()
                         if has_failed:
                             yield f"❌ **Task Graph Execution Halted.**\nCheck the Timeline panel for details."
                         else:
                             yield f"✅ **Task Graph Execution Complete.**\nSuccessfully processed {completed_count} chained objectives."
+                    except OperationCancelled:
+                        raise
                     except Exception as pe:
+                        token.raise_if_cancelled()
                         logger.error(f"Planner Error: {pe}")
-                        pe_str = str(pe)
-                        if "402" in pe_str or "Payment" in pe_str or "Credit" in pe_str:
+                        if classify_error(pe) in ("rate_limit", "circuit_open"):
                             # --- GRACEFUL FALLBACK: Use Instant Generation templates ---
                             from offline_engine import execute_offline
-                            fallback_result = execute_offline(task, safe_write)
+                            fallback_result = execute_offline(task, self.tools["safe_write"])
                             if fallback_result:
                                 yield f"⚡ *Generating code...*\n\n"
                                 yield fallback_result
@@ -943,15 +1235,19 @@ final_answer("Done!")             # WRONG! Must include filenames: "DONE: file.h
                 # Let user know the agent is thinking (streaming UX)
                 yield f"⚙️ *{agent_name} is analyzing the workspace...*\n\n"
 
-                returned_agent, final_text = orchestrator.route_and_execute(cmd_prefix, user_task, llm_runner)
+                returned_agent, final_text = yield from self._run_with_progress(
+                    orchestrator.route_and_execute, cmd_prefix, user_task, llm_runner
+                )
                 yield final_text
                 return
 
             # Legacy Phase 3 Command Palette Handling
             if task.startswith("/explain"):
-                context_prompt = f"{core.get_workspace_context(max_files=10)}\n\n[USER COMMAND: /explain]\nExplain the architecture or the specific file requested: {task.replace('/explain', '').strip()}"
+                target = task.replace('/explain', '').strip()
+                context_prompt = f"{core.get_relevant_context(target, request_summaries=True)}\n\n[USER COMMAND: /explain]\nExplain the architecture or the specific file requested: {target}"
             elif task.startswith("/refactor"):
-                context_prompt = f"{core.get_workspace_context(max_files=10)}\n\n[USER COMMAND: /refactor]\nSuggest refactoring improvements for: {task.replace('/refactor', '').strip()}"
+                target = task.replace('/refactor', '').strip()
+                context_prompt = f"{core.get_relevant_context(target)}\n\n[USER COMMAND: /refactor]\nSuggest refactoring improvements for: {target}"
             elif task.startswith("/generate-tasks"):
                 context_prompt = core.generate_task_prompt(task.replace('/generate-tasks', '').strip())
             elif task.startswith("/health"):
@@ -959,7 +1255,7 @@ final_answer("Done!")             # WRONG! Must include filenames: "DONE: file.h
             elif task.startswith("/insights"):
                 # Phase 6: Background Insights — Manual Trigger
                 from insights_engine import InsightsEngine
-                engine = InsightsEngine(WORKING_DIRECTORY)
+                engine = InsightsEngine(workspace)
                 insights = engine.run_scan()
 
                 # Phase 7 Sprint 1: Emit Insights to Copilot UI
@@ -989,7 +1285,7 @@ final_answer("Done!")             # WRONG! Must include filenames: "DONE: file.h
                 # --- PHASE 6: PROJECT MEMORY MVP ---
                 try:
                     from memory import ProjectMemory
-                    pmemory = ProjectMemory(WORKING_DIRECTORY)
+                    pmemory = ProjectMemory(workspace)
                     memory_context = pmemory.safe_memory_read(task)
                 except Exception as e:
                     logger.error(f"Project Memory injection failed: {e}")
@@ -997,14 +1293,19 @@ final_answer("Done!")             # WRONG! Must include filenames: "DONE: file.h
 
                 proj_memory_block = f"### PROJECT MEMORY ###\n{memory_context}\n" if memory_context else ""
 
-                memory = core.load_memory()
-                recent_notes = "\n".join(memory.get("notes", []))
+                # Only the notes are needed here; load_memory() would build the whole document
+                try:
+                    store = core.memory_store()
+                    recent_notes = "\n".join(store.items("notes")) if store else ""
+                except Exception as e:
+                    logger.error(f"Workspace memory read failed: {e}")
+                    recent_notes = ""
                 context_prompt = f"""
 {proj_memory_block}
 [WORKSPACE MEMORY]
 {recent_notes}
 
-{core.get_workspace_context(max_files=15, max_chars_per_file=1000)}
+{core.get_relevant_context(task)}
 
 [USER PROMPT]
 {task}
@@ -1018,10 +1319,11 @@ final_answer("Done!")             # WRONG! Must include filenames: "DONE: file.h
 
         logger.info(f"Context-Aware Task Length: {len(task_to_run)} chars")
 
+        token.raise_if_cancelled()
         try:
             # Use stream=False to avoid Python 3.14 + litellm coroutine bug
             # (litellm's Gemini streaming handler returns a coroutine instead of sync iterator)
-            result = self.agent.run(task_to_run, stream=False)
+            result = yield from self._run_agent_streaming(task_to_run)
             final_answer = str(result) if result else None
 
             if final_answer:
@@ -1033,16 +1335,12 @@ final_answer("Done!")             # WRONG! Must include filenames: "DONE: file.h
             logger.info("Client disconnected.")
             return
         except Exception as e:
+            # An interrupted CodeAgent surfaces as a generic agent error
+            token.raise_if_cancelled()
             logger.error(f"Execution Error: {e}")
-            err_str = str(e).lower()
 
             # ── RUNTIME FALLBACK: Local model failed → Swap to Gemini Cloud ──
-            is_model_error = any(kw in err_str for kw in [
-                "not found", "connection refused", "connection error",
-                "timeout", "connect_tcp", "ollama", "404",
-            ])
-
-            if is_model_error and self.gateway and self.gateway.gemini_key:
+            if self._is_local_model_failure(e) and self.gateway and self.gateway.gemini_key:
                 logger.warning("⚠️ LOCAL MODEL FAILED AT RUNTIME. Swapping to Gemini Cloud...")
                 yield "⚠️ *Local model unavailable. Switching to Gemini Cloud...*\n\n"
 
@@ -1053,9 +1351,10 @@ final_answer("Done!")             # WRONG! Must include filenames: "DONE: file.h
                         self.agent.model = cloud_model
                         self.model = cloud_model
                         logger.info(f"☁️ RUNTIME SWAP: Now using {cloud_model.model_id}")
+                        token.raise_if_cancelled()
 
                         # Retry the task with the cloud model (non-streaming for Python 3.14 compat)
-                        result = self.agent.run(task_to_run, stream=False)
+                        result = yield from self._run_agent_streaming(task_to_run)
                         final_answer = str(result) if result else None
 
                         if final_answer:
@@ -1065,15 +1364,18 @@ final_answer("Done!")             # WRONG! Must include filenames: "DONE: file.h
                         return
                     else:
                         logger.error("☁️ Cloud model also unavailable.")
+                except OperationCancelled:
+                    raise
                 except Exception as cloud_err:
+                    token.raise_if_cancelled()
                     logger.error(f"☁️ Cloud retry failed: {cloud_err}")
                     yield f"Error: Cloud fallback also failed: {cloud_err}"
                     return
 
-            if "402" in err_str or "payment required" in err_str or "credit balance" in err_str:
+            if classify_error(e) in ("rate_limit", "circuit_open"):
                 # --- GRACEFUL FALLBACK: Use Instant Generation templates ---
                 from offline_engine import execute_offline
-                fallback_result = execute_offline(task, safe_write)
+                fallback_result = execute_offline(task, self.tools["safe_write"])
                 if fallback_result:
                     yield f"⚡ *Generating code...*\n\n"
                     yield fallback_result
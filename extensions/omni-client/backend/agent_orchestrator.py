@@ -153,26 +153,18 @@ class AgentOrchestrator:
 
     def _update_agent_memory(self, agent_name: str, run_data: Any):
         """Append the structured outputs of agents to the extended memory state."""
-        mem = self.core.load_memory()
-        
-        # Ensure memory arrays exist
-        if "planner_runs" not in mem: mem["planner_runs"] = []
-        if "debug_sessions" not in mem: mem["debug_sessions"] = []
-        if "reviews" not in mem: mem["reviews"] = []
-        
+        store = self.core.memory_store()
+        if store is None:
+            return
+
         if agent_name == "PlannerAgent":
-            mem["planner_runs"].append(run_data)
-            mem["planner_runs"] = mem["planner_runs"][-5:]
+            store.append("planner_runs", run_data, cap=5, defer=True)
         elif agent_name == "DebugAgent":
-             # Only save summaries for debug to save space
-             summary = str(run_data)[:200] + "..." if len(str(run_data)) > 200 else str(run_data)
-             mem["debug_sessions"].append(summary)
-             mem["debug_sessions"] = mem["debug_sessions"][-5:]
+            # Only save summaries for debug to save space
+            summary = str(run_data)[:200] + "..." if len(str(run_data)) > 200 else str(run_data)
+            store.append("debug_sessions", summary, cap=5, defer=True)
         elif agent_name == "ReviewAgent":
-             mem["reviews"].append(run_data)
-             mem["reviews"] = mem["reviews"][-5:]
-             
-        self.core.save_memory(mem)
+            store.append("reviews", run_data, cap=5, defer=True)
 
     def route_and_execute(self, command: str, user_task: str, llm_runner: Callable[[str], str]) -> Tuple[str, str]:
         """
@@ -185,9 +177,32 @@ class AgentOrchestrator:
 
         start_time = time.time()
         logger.info(f"[ROUTER] -> {agent.name} Activated.")
-        
-        # 1. Assemble tight Context limit for agents (12k chars target)
-        context = self.core.get_workspace_context(max_files=10, max_chars_per_file=1200)
+
+        # 0. Repeated errors: reuse the stored fix unless the user asked for a fresh run
+        fix_cache = None
+        if command == "/debug":
+            from fix_cache import FixCache, split_fresh_flag
+            fix_cache = FixCache(self.core)
+            user_task, fresh = split_fresh_flag(user_task)
+            if fresh:
+                fix_cache.reject(user_task)
+            else:
+                cached = fix_cache.lookup(user_task)
+                if cached:
+                    fingerprint, entry = cached
+                    logger.info(f"[EXECUTION TIME - {agent.name}] {(time.time() - start_time) * 1000:.1f}ms (cached fix)")
+                    return agent.name, (
+                        f"♻️ *Cached fix for a previously seen error* (`{fingerprint['label']}`, reused {entry['hits']}x)\n\n"
+                        f"{entry['fix']}\n\n"
+                        f"_Not right? Run `/debug --fresh` with the same error for a new analysis._"
+                    )
+
+        # 1. Assemble tight Context limit for agents (12k chars target), ranked by relevance to the task;
+        #    /debug gets the code its stack trace points at instead
+        if command == "/debug":
+            context = self.core.get_debug_context(user_task, max_chars=12000)
+        else:
+            context = self.core.get_relevant_context(user_task, max_chars=12000)
         logger.info(f"[PROMPT SIZE] {len(context)} chars")
 
         # 2. Run the agent natively
@@ -203,6 +218,8 @@ class AgentOrchestrator:
             elif agent.name == "DebugAgent":
                 self._update_agent_memory(agent.name, result_data)
                 final_text = str(result_data.get("raw_response", ""))
+                if fix_cache is not None:
+                    fix_cache.record(user_task, final_text)
             else:
                 # Successfully parsed JSON structured output
                 self._update_agent_memory(agent.name, result_data)
@@ -0,0 +1,181 @@
+# ══════════════════════════════════════════════════════════════════
+# 🧩 Omni-IDE — Agent Pool
+# ══════════════════════════════════════════════════════════════════
+#
+#  One OmniAgent per (session, workspace) instead of a single global
+#  instance. Each agent owns its CodeAgent memory, model swap state and
+#  workspace binding, so concurrent chats in different sessions or
+#  folders run in parallel without cross-talk.
+#
+#  The pool is capped; the least recently used idle agent is evicted.
+#  An agent whose run_lock is held is never evicted mid-run; checkout()
+#  hands agents out with that lock already held, so one can't be evicted
+#  between the hand-out and the start of its run. Agents
+#  dropped while busy (replace/clear) are retired and closed as soon as
+#  their run ends; close_all() releases everything at shutdown.
+#
+# ══════════════════════════════════════════════════════════════════
+
+import os
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_AGENTS = 4
+DEFAULT_SESSION = "default"
+
+
+def pool_key(session_id: Optional[str], workspace: Optional[str]) -> Tuple[str, str]:
+    ws = os.path.normcase(os.path.abspath(workspace)) if workspace else ""
+    return (session_id or DEFAULT_SESSION, ws)
+
+
+class AgentPool:
+    def __init__(self, factory: Callable[[Optional[str]], Any], max_agents: int = DEFAULT_MAX_AGENTS):
+        self.factory = factory
+        self.max_agents = max_agents
+        self._lock = threading.Lock()
+        self._agents: "OrderedDict[Tuple[str, str], Any]" = OrderedDict()
+        self._created = 0
+        self._evicted = 0
+        self._retired: list = []  # dropped while busy; closed once their run ends
+
+    def get(self, session_id: Optional[str] = None, workspace: Optional[str] = None):
+        """Return the agent for (session, workspace), creating it on first use."""
+        key = pool_key(session_id, workspace)
+        self._close_retired()
+        with self._lock:
+            agent = self._agents.get(key)
+            if agent is not None:
+                self._agents.move_to_end(key)
+                return agent
+        # Construct outside the lock: building a model can take seconds
+        agent = self.factory(workspace)
+        with self._lock:
+            existing = self._agents.get(key)
+            if existing is not None:
+                self._agents.move_to_end(key)
+                return existing
+            self._agents[key] = agent
+            self._created += 1
+            self._evict_idle(keep=key)
+        logger.info(f"🧩 AGENT POOL: Created agent for session={key[0]} workspace={workspace or '-'} "
+                    f"({len(self._agents)}/{self.max_agents})")
+        return agent
+
+    def _evict_idle(self, keep: Tuple[str, str]):
+        for key in list(self._agents):
+            if len(self._agents) <= self.max_agents:
+                return
+            if key == keep or self._is_busy(self._agents[key]):
+                continue  # the agent being handed out, or one mid-run
+            self._close(self._agents.pop(key))
+            self._evicted += 1
+            logger.info(f"🧩 AGENT POOL: Evicted idle agent session={key[0]}")
+
+    @staticmethod
+    def _close(agent):
+        """Release per-agent resources (e.g. a persistent shell)."""
+        close = getattr(agent, "close", None)
+        if close is not None:
+            try:
+                close()
+            except Exception as e:
+                logger.warning(f"🧩 AGENT POOL: Closing agent failed: {e}")
+
+    @staticmethod
+    def _is_busy(agent) -> bool:
+        lock = getattr(agent, "run_lock", None)
+        return lock is not None and lock.locked()
+
+    def _retire(self, agents: list):
+        """Close idle agents now; busy ones once their run ends (see run_finished)."""
+        with self._lock:
+            idle = [a for a in agents if not self._is_busy(a)]
+            self._retired.extend(a for a in agents if self._is_busy(a))
+        for agent in idle:
+            self._close(agent)
+
+    def _close_retired(self):
+        with self._lock:
+            if not self._retired:
+                return
+            done = [a for a in self._retired if not self._is_busy(a)]
+            self._retired = [a for a in self._retired if self._is_busy(a)]
+        for agent in done:
+            self._close(agent)
+
+    def run_finished(self, agent):
+        """Call after an agent's run_lock is released: closes it if it was retired meanwhile."""
+        with self._lock:
+            if self._is_busy(agent) or not any(a is agent for a in self._retired):
+                return
+            self._retired = [a for a in self._retired if a is not agent]
+        self._close(agent)
+
+    def checkout(self, session_id: Optional[str] = None, workspace: Optional[str] = None,
+                 blocking: bool = True):
+        """
+        The agent for (session, workspace) with its run_lock held, or None when
+        `blocking` is False and it is busy. Pair with checkin().
+        """
+        while True:
+            agent = self.get(session_id, workspace)
+            if not agent.run_lock.acquire(blocking=blocking):
+                return None
+            with self._lock:
+                pooled = any(a is agent for a in self._agents.values())
+            if pooled:
+                return agent
+            # Evicted or replaced between get() and acquire(): take the current one
+            self.checkin(agent)
+
+    def checkin(self, agent):
+        """Release an agent taken with checkout() (closing it if it was retired meanwhile)."""
+        agent.run_lock.release()
+        self.run_finished(agent)
+
+    def replace(self, agent, new_agent):
+        """Swap one pooled instance for another (e.g. re-created after a key change) and close the old one."""
+        with self._lock:
+            for key, value in self._agents.items():
+                if value is agent:
+                    self._agents[key] = new_agent
+                    break
+            else:
+                return
+        self._retire([agent])
+
+    def agents(self) -> list:
+        with self._lock:
+            return list(self._agents.values())
+
+    def clear(self):
+        """Forget every agent (config changed). Runs in flight finish; their agents are closed afterwards."""
+        with self._lock:
+            agents, self._agents = list(self._agents.values()), OrderedDict()
+        self._retire(agents)
+
+    def close_all(self):
+        """Close every pooled and retired agent, busy or not (server shutdown)."""
+        with self._lock:
+            agents = list(self._agents.values()) + self._retired
+            self._agents, self._retired = OrderedDict(), []
+        for agent in agents:
+            self._close(agent)
+        if agents:
+            logger.info(f"🧩 AGENT POOL: Closed {len(agents)} agent(s)")
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._agents),
+                "max_agents": self.max_agents,
+                "busy": sum(1 for a in self._agents.values() if self._is_busy(a)),
+                "retired": len(self._retired),
+                "created": self._created,
+                "evicted": self._evicted,
+            }
@@ -0,0 +1,139 @@
+# ══════════════════════════════════════════════════════════════════
+# 🛑 Omni-IDE — Cooperative Cancellation
+# ══════════════════════════════════════════════════════════════════
+#
+#  A CancellationToken is created per agent run and threaded through
+#  OmniAgent.execute_stream → planner → llm_runner → TerminalTool.
+#  Timeouts, HTTP and WebSocket disconnects and POST /api/chat/cancel end
+#  in token.cancel(): the CodeAgent stops before its next LLM step and
+#  running shell commands are killed with their whole process group.
+#
+# ══════════════════════════════════════════════════════════════════
+
+import os
+import sys
+import signal
+import logging
+import threading
+import subprocess
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class OperationCancelled(Exception):
+    """Raised at a checkpoint once the run's token has been cancelled."""
+
+    def __init__(self, reason: str = "cancelled"):
+        super().__init__(f"Run cancelled ({reason})")
+        self.reason = reason
+
+
+class CancellationToken:
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks: List[Callable[[], None]] = []
+        self.reason: Optional[str] = None
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self, reason: str = "cancelled"):
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason = reason
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        logger.info(f"🛑 CANCEL: Run cancelled ({reason})")
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.warning(f"🛑 CANCEL: Callback failed: {e}")
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise OperationCancelled(self.reason or "cancelled")
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._event.wait(timeout)
+
+    def add_callback(self, callback: Callable[[], None]):
+        """Run `callback` on cancel (immediately if already cancelled)."""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def remove_callback(self, callback: Callable[[], None]):
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+
+# ----------------------------------------------------------
+# PROCESS GROUPS
+# ----------------------------------------------------------
+
+def new_process_group_kwargs() -> dict:
+    """Popen kwargs that put the child (and its children) in their own group."""
+    if sys.platform == "win32":
+        return {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+    return {"start_new_session": True}
+
+
+def kill_process_tree(proc: subprocess.Popen):
+    """Kill a Popen started with new_process_group_kwargs() together with its descendants."""
+    if proc.poll() is not None:
+        return
+    try:
+        if sys.platform == "win32":
+            subprocess.run(["taskkill", "/F", "/T", "/PID", str(proc.pid)], capture_output=True)
+        else:
+            os.killpg(proc.pid, signal.SIGKILL)
+    except (OSError, ProcessLookupError):
+        pass
+    try:
+        proc.kill()
+    except OSError:
+        pass
+
+
+# ----------------------------------------------------------
+# ACTIVE RUNS (for /api/chat/cancel)
+# ----------------------------------------------------------
+
+class RunRegistry:
+    """Tokens of in-flight runs, grouped by chat session."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._runs: Dict[str, List[CancellationToken]] = {}
+
+    def register(self, session_id: Optional[str], token: CancellationToken):
+        with self._lock:
+            self._runs.setdefault(session_id or "default", []).append(token)
+
+    def unregister(self, session_id: Optional[str], token: CancellationToken):
+        key = session_id or "default"
+        with self._lock:
+            tokens = self._runs.get(key, [])
+            if token in tokens:
+                tokens.remove(token)
+            if not tokens:
+                self._runs.pop(key, None)
+
+    def cancel(self, session_id: Optional[str], reason: str = "user") -> int:
+        with self._lock:
+            tokens = list(self._runs.get(session_id or "default", []))
+        for token in tokens:
+            token.cancel(reason)
+        return len(tokens)
+
+
+# Singleton instance for the backend
+active_runs = RunRegistry()
@@ -0,0 +1,293 @@
+# ══════════════════════════════════════════════════════════════════
+# ⛔ Omni-IDE — Per-Model Circuit Breakers
+# ══════════════════════════════════════════════════════════════════
+#
+#  CLOSED     →  requests flow normally.
+#  OPEN       →  model is skipped instantly until its cooldown expires.
+#                Rate limits (429/402) open the circuit immediately;
+#                other failures after FAILURE_THRESHOLD in a row.
+#  HALF_OPEN  →  cooldown expired, a single probe request is let through.
+#                Success closes the circuit, failure re-opens it.
+#
+#  Cooldowns come from the provider's retry hints (Retry-After header,
+#  Gemini "retryDelay") and otherwise back off exponentially.
+#
+# ══════════════════════════════════════════════════════════════════
+
+import re
+import time
+import logging
+import threading
+from enum import Enum
+from email.utils import parsedate_to_datetime
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+FAILURE_THRESHOLD = 3           # consecutive non-quota failures before opening
+BASE_COOLDOWN_S = 15.0          # first cooldown without a retry hint
+MAX_COOLDOWN_S = 15 * 60.0      # cap for backoff and provider hints
+PROBE_TIMEOUT_S = 60.0          # a half-open probe that never reports back is released
+
+
+class CircuitState(Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised when every model of a chain is currently behind an open circuit."""
+
+    def __init__(self, models: List[str], retry_in_s: float):
+        self.models = models
+        self.retry_in_s = retry_in_s
+        super().__init__(
+            f"All models are temporarily unavailable (circuit open): {', '.join(models)}. "
+            f"Retry in {retry_in_s:.0f}s."
+        )
+
+
+# ----------------------------------------------------------
+# ERROR CLASSIFICATION
+# ----------------------------------------------------------
+
+def _error_chain(error: BaseException):
+    """Yield the error and its causes (smolagents wraps provider errors)."""
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        yield error
+        error = error.__cause__ or error.__context__
+
+
+def classify_error(error: Optional[BaseException]) -> str:
+    """
+    Classify a model-call failure.
+
+    Returns one of: "rate_limit", "connection", "not_found", "auth",
+    "circuit_open" or "other". Typed exceptions/status codes are checked
+    first; message matching is only a last resort.
+    """
+    if error is None:
+        return "other"
+    for err in _error_chain(error):
+        if isinstance(err, CircuitOpenError):
+            return "circuit_open"
+        status = getattr(err, "status_code", None)
+        name = type(err).__name__
+        if status in (402, 429) or name == "RateLimitError":
+            return "rate_limit"
+        if status in (401, 403) or name in ("AuthenticationError", "PermissionDeniedError"):
+            return "auth"
+        if status == 404 or name == "NotFoundError":
+            return "not_found"
+        if name in ("APIConnectionError", "Timeout", "ServiceUnavailableError", "ConnectionError",
+                    "ConnectTimeout", "ReadTimeout", "TimeoutError", "ConnectionRefusedError"):
+            return "connection"
+
+    msg = str(error).lower()
+    if any(kw in msg for kw in ("429", "402", "rate limit", "quota", "resource_exhausted",
+                                "payment required", "credit balance")):
+        return "rate_limit"
+    if any(kw in msg for kw in ("connection refused", "connection error", "connect_tcp",
+                                "10061", "timeout", "timed out", "ollama")):
+        return "connection"
+    if "not found" in msg or "404" in msg:
+        return "not_found"
+    if "401" in msg or "api key not valid" in msg or "invalid api key" in msg:
+        return "auth"
+    return "other"
+
+
+_RETRY_DELAY_PATTERNS = (
+    re.compile(r'"?retryDelay"?\s*:\s*"(\d+(?:\.\d+)?)s"', re.IGNORECASE),
+    re.compile(r"retry (?:in|after) (\d+(?:\.\d+)?)\s*s", re.IGNORECASE),
+)
+
+
+def _parse_retry_after(value) -> Optional[float]:
+    if value is None:
+        return None
+    value = str(value).strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except Exception:
+        return None
+
+
+def retry_after_seconds(error: Optional[BaseException]) -> Optional[float]:
+    """Extract the provider's retry hint (headers first, then error body) in seconds."""
+    if error is None:
+        return None
+    for err in _error_chain(error):
+        header_sources = [
+            getattr(err, "litellm_response_headers", None),
+            getattr(err, "headers", None),
+            getattr(getattr(err, "response", None), "headers", None),
+        ]
+        for headers in header_sources:
+            if not headers:
+                continue
+            try:
+                value = headers.get("retry-after") or headers.get("Retry-After")
+            except Exception:
+                continue
+            seconds = _parse_retry_after(value)
+            if seconds is not None:
+                return seconds
+    text = str(error)
+    for pattern in _RETRY_DELAY_PATTERNS:
+        match = pattern.search(text)
+        if match:
+            return float(match.group(1))
+    return None
+
+
+# ----------------------------------------------------------
+# BREAKER
+# ----------------------------------------------------------
+
+class CircuitBreaker:
+    def __init__(self, model_id: str):
+        self.model_id = model_id
+        self.state = CircuitState.CLOSED
+        self.consecutive_failures = 0
+        self.trips = 0
+        self.open_until = 0.0
+        self.probe_started_at: Optional[float] = None
+        self.last_error_kind: Optional[str] = None
+
+    def _refresh(self, now: float):
+        if self.state == CircuitState.OPEN and now >= self.open_until:
+            self.state = CircuitState.HALF_OPEN
+            self.probe_started_at = None
+        if self.probe_started_at is not None and now - self.probe_started_at > PROBE_TIMEOUT_S:
+            self.probe_started_at = None
+
+    def is_available(self, now: float) -> bool:
+        self._refresh(now)
+        if self.state == CircuitState.OPEN:
+            return False
+        if self.state == CircuitState.HALF_OPEN:
+            return self.probe_started_at is None
+        return True
+
+    def begin_probe(self, now: float):
+        if self.state == CircuitState.HALF_OPEN and self.probe_started_at is None:
+            self.probe_started_at = now
+            logger.info(f"🟡 BREAKER: {self.model_id} half-open — sending probe.")
+
+    def release_probe(self):
+        """Give back a probe slot that was claimed but never used."""
+        if self.state == CircuitState.HALF_OPEN:
+            self.probe_started_at = None
+
+    def record_success(self):
+        if self.state != CircuitState.CLOSED:
+            logger.info(f"🟢 BREAKER: {self.model_id} recovered — circuit closed.")
+        self.state = CircuitState.CLOSED
+        self.consecutive_failures = 0
+        self.trips = 0
+        self.probe_started_at = None
+        self.last_error_kind = None
+
+    def record_failure(self, error: Optional[BaseException], now: float):
+        kind = classify_error(error)
+        self.last_error_kind = kind
+        self.consecutive_failures += 1
+        should_open = (
+            kind == "rate_limit"
+            or self.state == CircuitState.HALF_OPEN
+            or self.consecutive_failures >= FAILURE_THRESHOLD
+        )
+        if not should_open:
+            return
+        hint = retry_after_seconds(error) if kind == "rate_limit" else None
+        self.trips += 1
+        cooldown = hint if hint is not None else BASE_COOLDOWN_S * (2 ** (self.trips - 1))
+        cooldown = min(max(cooldown, 1.0), MAX_COOLDOWN_S)
+        self.state = CircuitState.OPEN
+        self.open_until = now + cooldown
+        self.probe_started_at = None
+        logger.warning(
+            f"🔴 BREAKER: {self.model_id} OPEN for {cooldown:.0f}s "
+            f"({kind}{', retry hint' if hint is not None else ''})."
+        )
+
+    def snapshot(self, now: float) -> dict:
+        self._refresh(now)
+        return {
+            "model": self.model_id,
+            "state": self.state.value,
+            "consecutive_failures": self.consecutive_failures,
+            "trips": self.trips,
+            "retry_in_s": round(max(0.0, self.open_until - now), 1) if self.state == CircuitState.OPEN else 0.0,
+            "last_error": self.last_error_kind,
+        }
+
+
+class CircuitBreakerRegistry:
+    """Thread-safe collection of per-model breakers."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def _get(self, model_id: str) -> CircuitBreaker:
+        breaker = self._breakers.get(model_id)
+        if breaker is None:
+            breaker = self._breakers[model_id] = CircuitBreaker(model_id)
+        return breaker
+
+    def record(self, model_id: str, error: Optional[BaseException] = None):
+        with self._lock:
+            breaker = self._get(model_id)
+            if error is None:
+                breaker.record_success()
+            else:
+                breaker.record_failure(error, time.time())
+
+    def available(self, models: List[str]) -> List[str]:
+        """Filter out models behind an open circuit (order preserved, no side effects)."""
+        now = time.time()
+        with self._lock:
+            return [m for m in models if self._get(m).is_available(now)]
+
+    def acquire(self, models: List[str]) -> List[str]:
+        """
+        Like available(), but claims the probe slot of the first model, the one
+        about to be called. Half-open fallbacks are not claimed: they are only
+        tried when everything before them fails, and a fallback that answers
+        closes its circuit through record().
+        """
+        now = time.time()
+        with self._lock:
+            chain = [m for m in models if self._get(m).is_available(now)]
+            if chain:
+                self._get(chain[0]).begin_probe(now)
+        if not chain and models:
+            raise CircuitOpenError(models, self.retry_in(models))
+        return chain
+
+    def release(self, models: List[str]):
+        """Release probe slots claimed by acquire() for a call that was never made."""
+        with self._lock:
+            for m in models:
+                if m in self._breakers:
+                    self._breakers[m].release_probe()
+
+    def retry_in(self, models: List[str]) -> float:
+        now = time.time()
+        with self._lock:
+            waits = [max(0.0, self._get(m).open_until - now) for m in models]
+        return min(waits) if waits else 0.0
+
+    def snapshot(self) -> List[dict]:
+        now = time.time()
+        with self._lock:
+            return [b.snapshot(now) for b in self._breakers.values()]
@@ -0,0 +1,290 @@
+# ══════════════════════════════════════════════════════════════════
+# 🔎 Omni-IDE — Query-Relevant Context (BM25 Chunk Index)
+# ══════════════════════════════════════════════════════════════════
+#
+#  get_workspace_context() includes whichever files os.walk yields
+#  first. This index ranks file chunks against the task text instead, so
+#  the file the user asked about makes it into the prompt and unrelated
+#  files don't eat the budget.
+#
+#  • Chunks: CHUNK_LINES-line windows per text file.
+#  • Tokens: identifiers split on camelCase / snake_case, plus the whole
+#    identifier ("getUserName" → getusername, get, user, name).
+#  • Incremental: only files whose (mtime_ns, size) changed are
+#    re-chunked, and nothing is re-checked while the IntelligenceCore
+#    workspace generation is unchanged.
+#  • Lean: the index keeps postings and each chunk's byte range, not
+#    file bodies; chunk_text() reads a selected chunk back from disk.
+#  • The first build runs on a background thread (ensure_ready); until
+#    it finishes, callers fall back to the plain head-of-file context.
+#
+#  Self-benchmark: python context_index.py [workspace] ["query"]
+#
+# ══════════════════════════════════════════════════════════════════
+
+import os
+import re
+import math
+import logging
+import threading
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+CHUNK_LINES = 40
+MAX_FILE_BYTES = 512 * 1024
+MAX_INDEXED_FILES = 5000
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+_IDENT_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_]*|\d+")
+_PART_RE = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+")
+_STOPWORDS = frozenset({
+    "the", "and", "for", "with", "this", "that", "from", "into", "are", "was", "not", "but",
+    "you", "your", "can", "please", "should", "would", "could", "make", "file", "code",
+    "self", "none", "true", "false", "return", "def", "import", "if", "in", "is", "it",
+    "of", "on", "or", "to", "an", "as", "at", "be", "by", "do", "me", "my", "we",
+})
+
+
+def tokenize(text: str) -> List[str]:
+    """Code-aware tokens: whole identifiers plus their camelCase/snake_case parts."""
+    tokens = []
+    for ident in _IDENT_RE.findall(text):
+        lowered = ident.lower().strip("_")
+        parts = [p.lower() for p in _PART_RE.findall(ident)]
+        if len(lowered) > 1 and lowered not in _STOPWORDS:
+            tokens.append(lowered)
+        if len(parts) > 1:
+            tokens.extend(p for p in parts if len(p) > 1 and p not in _STOPWORDS and p != lowered)
+    return tokens
+
+
+class _Chunk:
+    __slots__ = ("rel_path", "start", "end", "offset", "size", "stamp", "terms", "length")
+
+    def __init__(self, rel_path: str, start: int, end: int, offset: int, size: int, stamp: Tuple[int, int]):
+        self.rel_path = rel_path
+        self.start = start      # first / last line (1-based, inclusive)
+        self.end = end
+        self.offset = offset    # byte range in the file, read back by chunk_text()
+        self.size = size
+        self.stamp = stamp      # (mtime_ns, size) of the file when it was chunked
+        self.terms: Tuple[str, ...] = ()
+        self.length = 0
+
+
+class ContextIndex:
+    def __init__(self, workspace_dir: str):
+        self.workspace_dir = workspace_dir
+        self._lock = threading.Lock()
+        self._files: Dict[str, Tuple[int, int]] = {}       # rel_path → (mtime_ns, size)
+        self._file_chunks: Dict[str, List[_Chunk]] = {}
+        self._postings: Dict[str, Dict[_Chunk, int]] = {}  # token → {chunk: tf}
+        self._total_length = 0
+        self._chunk_count = 0
+        self._generation: Optional[int] = None
+        self._build_thread: Optional[threading.Thread] = None
+
+    # ----------------------------------------------------------
+    # INDEXING (incremental)
+    # ----------------------------------------------------------
+
+    def _remove_file(self, rel_path: str):
+        for chunk in self._file_chunks.pop(rel_path, []):
+            for token in chunk.terms:
+                postings = self._postings.get(token)
+                if postings is not None:
+                    postings.pop(chunk, None)
+                    if not postings:
+                        del self._postings[token]
+            self._total_length -= chunk.length
+            self._chunk_count -= 1
+        self._files.pop(rel_path, None)
+
+    def _add_file(self, rel_path: str, path: str, stamp: Tuple[int, int]):
+        self._files[rel_path] = stamp
+        try:
+            with open(path, "rb") as f:
+                raw = f.read()
+            raw.decode("utf-8")
+        except (UnicodeDecodeError, OSError):
+            self._file_chunks[rel_path] = []
+            return
+        lines = raw.splitlines(keepends=True)
+        path_tokens = tokenize(rel_path)
+        chunks = []
+        offset = 0
+        for start in range(0, max(len(lines), 1), CHUNK_LINES):
+            window = lines[start:start + CHUNK_LINES]
+            size = sum(len(line) for line in window)
+            chunk = _Chunk(rel_path, start + 1, start + len(window), offset, size, stamp)
+            offset += size
+            tf = Counter(path_tokens + tokenize(b"".join(window).decode("utf-8")))
+            chunk.terms = tuple(tf)
+            chunk.length = sum(tf.values())
+            if not chunk.length:
+                continue
+            chunks.append(chunk)
+            for token, count in tf.items():
+                self._postings.setdefault(token, {})[chunk] = count
+            self._total_length += chunk.length
+            self._chunk_count += 1
+        self._file_chunks[rel_path] = chunks
+
+    def chunk_text(self, chunk: _Chunk) -> Optional[str]:
+        """The chunk's lines read back from disk, or None when the file changed since indexing."""
+        path = os.path.join(self.workspace_dir, chunk.rel_path)
+        try:
+            st = os.stat(path)
+            if (st.st_mtime_ns, st.st_size) != chunk.stamp:
+                return None
+            with open(path, "rb") as f:
+                f.seek(chunk.offset)
+                raw = f.read(chunk.size)
+        except OSError:
+            return None
+        return "\n".join(raw.decode("utf-8", errors="replace").splitlines())
+
+    def refresh(self, core=None) -> int:
+        """Bring the index up to date; returns how many files were (re)indexed."""
+        from intelligence_core import IntelligenceCore
+        core = core or IntelligenceCore(self.workspace_dir)
+        generation = core.workspace_generation()
+        with self._lock:
+            if generation == self._generation:
+                return 0
+            seen = set()
+            updated = 0
+            for i, path in enumerate(core.iter_files(core._parse_gitignore())):
+                if i >= MAX_INDEXED_FILES:
+                    break
+                try:
+                    st = path.stat()
+                except OSError:
+                    continue
+                if st.st_size > MAX_FILE_BYTES:
+                    continue
+                rel_path = path.relative_to(core.workspace_dir).as_posix()
+                seen.add(rel_path)
+                stamp = (st.st_mtime_ns, st.st_size)
+                if self._files.get(rel_path) == stamp:
+                    continue
+                self._remove_file(rel_path)
+                self._add_file(rel_path, str(path), stamp)
+                updated += 1
+            for rel_path in [p for p in self._files if p not in seen]:
+                self._remove_file(rel_path)
+                updated += 1
+            self._generation = generation
+        if updated:
+            logger.info(f"🔎 CONTEXT INDEX: Re-indexed {updated} file(s) ({self._chunk_count} chunks)")
+        return updated
+
+    def ensure_ready(self, core=None) -> bool:
+        """
+        Refresh the index if it has been built before and report True. The
+        first build is started on a background thread instead; this returns
+        False until it is done, so the request that triggers it doesn't wait.
+        """
+        with self._lock:
+            built = self._generation is not None
+            if not built and self._build_thread is None:
+                self._build_thread = threading.Thread(target=self._background_build, args=(core,),
+                                                      name="omni-context-index", daemon=True)
+                self._build_thread.start()
+        if not built:
+            return False
+        self.refresh(core)
+        return True
+
+    def _background_build(self, core):
+        try:
+            self.refresh(core)
+        except Exception as e:
+            logger.warning(f"🔎 CONTEXT INDEX: Background build failed: {e}")
+        finally:
+            with self._lock:
+                self._build_thread = None
+
+    # ----------------------------------------------------------
+    # SEARCH
+    # ----------------------------------------------------------
+
+    def search(self, query: str, top_k: int = 8) -> List[Tuple[float, _Chunk]]:
+        terms = set(tokenize(query))
+        with self._lock:
+            n = self._chunk_count
+            if not terms or not n:
+                return []
+            avg_len = self._total_length / n
+            scores: Dict[_Chunk, float] = {}
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+                for chunk, tf in postings.items():
+                    norm = tf + BM25_K1 * (1 - BM25_B + BM25_B * chunk.length / avg_len)
+                    scores[chunk] = scores.get(chunk, 0.0) + idf * tf * (BM25_K1 + 1) / norm
+        ranked = sorted(scores.items(), key=lambda kv: kv[1], reverse=True)[:top_k]
+        return [(score, chunk) for chunk, score in ranked]
+
+    def file_list(self) -> List[str]:
+        with self._lock:
+            return sorted(self._files)
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {"files": len(self._files), "chunks": self._chunk_count, "terms": len(self._postings)}
+
+
+# ── Per-workspace registry ───────────────────────────────────
+_indexes: Dict[str, ContextIndex] = {}
+_registry_lock = threading.Lock()
+
+
+def get_context_index(workspace_dir: str) -> ContextIndex:
+    key = os.path.normcase(os.path.abspath(workspace_dir))
+    with _registry_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = _indexes[key] = ContextIndex(workspace_dir)
+        return index
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from intelligence_core import IntelligenceCore
+    from context_index import get_context_index  # the instance IntelligenceCore uses, not __main__'s
+
+    workspace = sys.argv[1] if len(sys.argv) > 1 else os.path.dirname(os.path.abspath(__file__))
+    query = sys.argv[2] if len(sys.argv) > 2 else "why does the circuit breaker not retry after a rate limit"
+    core = IntelligenceCore(workspace)
+
+    start = time.perf_counter()
+    get_context_index(workspace).refresh(core)
+    build_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    baseline = core.get_workspace_context(max_files=15, max_chars_per_file=1000)
+    baseline_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    relevant = core.get_relevant_context(query)
+    first_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    core.get_relevant_context(query + " backoff")
+    warm_ms = (time.perf_counter() - start) * 1000
+
+    print(f"workspace: {workspace}\nquery: {query}")
+    print(f"index build (background in the server): {build_ms:7.1f} ms")
+    print(f"first-15-files context : {len(baseline):>7} chars  {baseline_ms:7.1f} ms")
+    print(f"BM25 context (first)   : {len(relevant):>7} chars  {first_ms:7.1f} ms")
+    print(f"BM25 context (warm)    : {'':>7}        {warm_ms:7.1f} ms")
+    print(get_context_index(workspace).get_stats())
+    for score, chunk in get_context_index(workspace).search(query, top_k=5):
+        print(f"  {score:6.2f}  {chunk.rel_path}:{chunk.start}-{chunk.end}")
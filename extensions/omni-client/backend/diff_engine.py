@@ -0,0 +1,299 @@
+# ══════════════════════════════════════════════════════════════════
+# 🔀 Omni-IDE — Line Diff Engine
+# ══════════════════════════════════════════════════════════════════
+#
+#  difflib.unified_diff goes super-linear on large or repetitive files,
+#  which is why staging used to refuse anything over 1 MB. This engine
+#  produces the same unified-diff text with:
+#
+#    • line interning: every distinct line becomes an int, so all
+#      comparisons below are int compares;
+#    • common prefix/suffix trimming;
+#    • patience anchoring: lines that occur exactly once on each side are
+#      matched via longest increasing subsequence and split the problem
+#      into independent gaps;
+#    • Myers O(ND) for gaps that have no unique lines.
+#
+#  Budgets (env-tunable): a wall-clock budget for interning and matching
+#  (OMNI_DIFF_TIME_BUDGET_MS, default 500), checked between gaps and
+#  inside both the anchor pass and Myers, and an edit-distance cap per Myers gap
+#  (OMNI_DIFF_MAX_COST, default 500; its trace memory grows with the
+#  square of the cap). A gap that exceeds either one is emitted as a
+#  single replace hunk. The diff stays correct, only coarser.
+#
+#  Splitting, interning and formatting are linear and cannot stop early
+#  (roughly 50-100 ms per MB together), so the total can overrun the
+#  budget on big inputs; callers cap the input size for that reason
+#  (diff_staging_layer.MAX_STAGING_BYTES).
+#
+# ══════════════════════════════════════════════════════════════════
+
+import os
+import time
+import logging
+from bisect import bisect_left
+from collections import Counter
+from typing import Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+TIME_BUDGET_ENV = "OMNI_DIFF_TIME_BUDGET_MS"
+MAX_COST_ENV = "OMNI_DIFF_MAX_COST"
+DEFAULT_TIME_BUDGET_MS = 500
+DEFAULT_MAX_COST = 500
+NO_EOL_MARKER = "\\ No newline at end of file\n"
+
+Opcode = Tuple[str, int, int, int, int]
+Block = Tuple[int, int, int]  # (a start, b start, length) of matching lines
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return max(0, int(os.getenv(name, default)))
+    except ValueError:
+        return default
+
+
+# ----------------------------------------------------------
+# MATCHING
+# ----------------------------------------------------------
+
+def _intern(a_lines: Sequence[str], b_lines: Sequence[str]) -> Tuple[List[int], List[int]]:
+    ids: Dict[str, int] = {}
+    a = [ids.setdefault(line, len(ids)) for line in a_lines]
+    b = [ids.setdefault(line, len(ids)) for line in b_lines]
+    return a, b
+
+
+def _unique_anchors(a: List[int], b: List[int], a0: int, a1: int, b0: int, b1: int,
+                    deadline: float) -> Optional[List[Tuple[int, int]]]:
+    """Patience anchors: lines unique on both sides, longest run in the same order; None when out of time."""
+    count_a = Counter(a[a0:a1])
+    count_b = Counter(b[b0:b1])
+    if time.monotonic() > deadline:
+        return None
+    pos_b = {b[j]: j for j in range(b0, b1) if count_b[b[j]] == 1 and count_a.get(b[j]) == 1}
+    candidates = [(i, pos_b[line]) for i, line in enumerate(a[a0:a1], a0) if line in pos_b]
+    if not candidates:
+        return []
+    if time.monotonic() > deadline:
+        return None
+
+    # Longest increasing subsequence over b positions (patience sorting)
+    tails: List[int] = []      # b position ending the best run of each length
+    tail_index: List[int] = []  # candidate index of that tail
+    back: List[int] = [-1] * len(candidates)
+    for n, (_, j) in enumerate(candidates):
+        if not n & 4095 and time.monotonic() > deadline:
+            return None
+        pile = bisect_left(tails, j)
+        if pile == len(tails):
+            tails.append(j)
+            tail_index.append(n)
+        else:
+            tails[pile] = j
+            tail_index[pile] = n
+        back[n] = tail_index[pile - 1] if pile else -1
+    anchors = []
+    n = tail_index[-1]
+    while n >= 0:
+        anchors.append(candidates[n])
+        n = back[n]
+    anchors.reverse()
+    return anchors
+
+
+def _myers(a: List[int], b: List[int], a0: int, a1: int, b0: int, b1: int,
+           max_cost: int, deadline: float) -> Optional[List[Block]]:
+    """Matching blocks of a shortest edit script, or None when over the cost or time budget."""
+    n, m = a1 - a0, b1 - b0
+    max_d = min(n + m, max_cost)
+    offset = max_d + 1
+    v = [0] * (2 * max_d + 3)
+    trace: List[List[int]] = []  # v[k - d - 1 .. k + d + 1] as it was before step d
+    for d in range(max_d + 1):
+        if not d & 31 and time.monotonic() > deadline:
+            return None
+        trace.append(v[offset - d - 1:offset + d + 2])
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and v[offset + k - 1] < v[offset + k + 1]):
+                x = v[offset + k + 1]
+            else:
+                x = v[offset + k - 1] + 1
+            y = x - k
+            while x < n and y < m and a[a0 + x] == b[b0 + y]:
+                x += 1
+                y += 1
+            v[offset + k] = x
+            if x >= n and y >= m:
+                return _myers_backtrack(trace, n, m, a0, b0)
+    return None
+
+
+def _myers_backtrack(trace: List[List[int]], x: int, y: int, a0: int, b0: int) -> List[Block]:
+    blocks = []
+    for d in range(len(trace) - 1, -1, -1):
+        v = trace[d]  # v[0] is diagonal -d - 1
+        k = x - y
+        if k == -d or (k != d and v[k + d] < v[k + d + 2]):
+            prev_k = k + 1
+        else:
+            prev_k = k - 1
+        prev_x = v[prev_k + d + 1] if d else 0
+        prev_y = prev_x - prev_k if d else 0
+        snake = min(x - prev_x, y - prev_y)
+        if snake > 0:
+            blocks.append((a0 + x - snake, b0 + y - snake, snake))
+        x, y = prev_x, prev_y
+    return blocks
+
+
+def _match(a: List[int], b: List[int], deadline: float, max_cost: int) -> Tuple[List[Block], int]:
+    """Matching blocks in order, plus how many gaps fell back to a coarse replace."""
+    blocks: List[Block] = []
+    coarse = 0
+    stack = [(0, len(a), 0, len(b))]
+    while stack:
+        a0, a1, b0, b1 = stack.pop()
+        start = a0
+        while a0 < a1 and b0 < b1 and a[a0] == b[b0]:
+            a0 += 1
+            b0 += 1
+        if a0 > start:
+            blocks.append((start, b0 - (a0 - start), a0 - start))
+        end = a1
+        while a0 < a1 and b0 < b1 and a[a1 - 1] == b[b1 - 1]:
+            a1 -= 1
+            b1 -= 1
+        if a1 < end:
+            blocks.append((a1, b1, end - a1))
+        if a0 == a1 or b0 == b1:
+            continue  # pure insert or delete
+        if time.monotonic() > deadline:
+            coarse += 1
+            continue
+
+        anchors = _unique_anchors(a, b, a0, a1, b0, b1, deadline)
+        if anchors is None:
+            coarse += 1
+            continue
+        if anchors:
+            prev_a, prev_b = a0, b0
+            for i, j in anchors:
+                if i == prev_a and j == prev_b and blocks and blocks[-1][0] + blocks[-1][2] == i \
+                        and blocks[-1][1] + blocks[-1][2] == j:
+                    blocks[-1] = (blocks[-1][0], blocks[-1][1], blocks[-1][2] + 1)  # extends the previous anchor run
+                else:
+                    if i > prev_a or j > prev_b:
+                        stack.append((prev_a, i, prev_b, j))
+                    blocks.append((i, j, 1))
+                prev_a, prev_b = i + 1, j + 1
+            stack.append((prev_a, a1, prev_b, b1))
+            continue
+
+        found = _myers(a, b, a0, a1, b0, b1, max_cost, deadline)
+        if found is None:
+            coarse += 1
+        else:
+            blocks.extend(found)
+    blocks.sort()
+    return blocks, coarse
+
+
+# ----------------------------------------------------------
+# OPCODES & FORMATTING
+# ----------------------------------------------------------
+
+def get_opcodes(a_lines: Sequence[str], b_lines: Sequence[str],
+                time_budget_ms: Optional[int] = None, max_cost: Optional[int] = None) -> Tuple[List[Opcode], bool]:
+    """difflib-style opcodes for two line lists, plus whether the result is exact (no budget fallback)."""
+    if time_budget_ms is None:
+        time_budget_ms = _env_int(TIME_BUDGET_ENV, DEFAULT_TIME_BUDGET_MS)
+    if max_cost is None:
+        max_cost = _env_int(MAX_COST_ENV, DEFAULT_MAX_COST)
+    deadline = time.monotonic() + time_budget_ms / 1000.0  # interning counts against the budget too
+    a, b = _intern(a_lines, b_lines)
+    blocks, coarse = _match(a, b, deadline, max_cost)
+
+    opcodes: List[Opcode] = []
+    i = j = 0
+    for bi, bj, size in blocks + [(len(a), len(b), 0)]:
+        if bi > i and bj > j:
+            opcodes.append(("replace", i, bi, j, bj))
+        elif bi > i:
+            opcodes.append(("delete", i, bi, j, j))
+        elif bj > j:
+            opcodes.append(("insert", i, i, j, bj))
+        if size:
+            if opcodes and opcodes[-1][0] == "equal" and opcodes[-1][2] == bi:
+                opcodes[-1] = ("equal", opcodes[-1][1], bi + size, opcodes[-1][3], bj + size)
+            else:
+                opcodes.append(("equal", bi, bi + size, bj, bj + size))
+        i, j = bi + size, bj + size
+    return opcodes, coarse == 0
+
+
+def _grouped_opcodes(opcodes: List[Opcode], n: int) -> List[List[Opcode]]:
+    """Hunks with up to n lines of context (same grouping as difflib.SequenceMatcher)."""
+    codes = list(opcodes) or [("equal", 0, 1, 0, 1)]
+    if codes[0][0] == "equal":
+        tag, i1, i2, j1, j2 = codes[0]
+        codes[0] = tag, max(i1, i2 - n), i2, max(j1, j2 - n), j2
+    if codes[-1][0] == "equal":
+        tag, i1, i2, j1, j2 = codes[-1]
+        codes[-1] = tag, i1, min(i2, i1 + n), j1, min(j2, j1 + n)
+    groups, group = [], []
+    for tag, i1, i2, j1, j2 in codes:
+        if tag == "equal" and i2 - i1 > 2 * n:
+            group.append((tag, i1, min(i2, i1 + n), j1, min(j2, j1 + n)))
+            groups.append(group)
+            group = []
+            i1, j1 = max(i1, i2 - n), max(j1, j2 - n)
+        group.append((tag, i1, i2, j1, j2))
+    if group and not (len(group) == 1 and group[0][0] == "equal"):
+        groups.append(group)
+    return groups
+
+
+def _format_range(start: int, stop: int) -> str:
+    beginning, length = start + 1, stop - start
+    if length == 1:
+        return str(beginning)
+    if not length:
+        beginning -= 1
+    return f"{beginning},{length}"
+
+
+def _emit(out: List[str], prefix: str, lines: Sequence[str]):
+    out.extend([prefix + line for line in lines])
+    # Only a file's last line can lack its newline
+    if lines and not lines[-1].endswith("\n"):
+        out[-1] += "\n" + NO_EOL_MARKER
+
+
+def unified_diff(a_text: str, b_text: str, fromfile: str = "", tofile: str = "", n: int = 3,
+                 time_budget_ms: Optional[int] = None, max_cost: Optional[int] = None) -> str:
+    """Unified diff text of two strings, or "" when they are identical."""
+    if a_text == b_text:
+        return ""
+    a_lines = a_text.splitlines(keepends=True)
+    b_lines = b_text.splitlines(keepends=True)
+    started = time.perf_counter()
+    opcodes, exact = get_opcodes(a_lines, b_lines, time_budget_ms, max_cost)
+
+    out = [f"--- {fromfile}\n", f"+++ {tofile}\n"]
+    for group in _grouped_opcodes(opcodes, n):
+        first, last = group[0], group[-1]
+        out.append(f"@@ -{_format_range(first[1], last[2])} +{_format_range(first[3], last[4])} @@\n")
+        for tag, i1, i2, j1, j2 in group:
+            if tag == "equal":
+                _emit(out, " ", a_lines[i1:i2])
+                continue
+            _emit(out, "-", a_lines[i1:i2])
+            _emit(out, "+", b_lines[j1:j2])
+
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    if not exact:
+        logger.info(f"🔀 DIFF: Budget reached on {len(a_lines)}→{len(b_lines)} lines; "
+                    f"emitted coarser hunks ({elapsed_ms:.0f} ms)")
+    return "".join(out)
@@ -2,15 +2,31 @@ import os
 import json
 import uuid
 import time
+import zlib
 import hashlib
-import difflib
 import logging
 import tempfile
+import threading
 from typing import Dict, Any, Optional
 from pathlib import Path
 
+import diff_engine
+
 logger = logging.getLogger(__name__)
 
+# Staging store layout (under the workspace):
+#   .omni_staging/index.jsonl     append-only session events (metadata only)
+#   .omni_staging/blobs/<sha256>  zlib-compressed proposed contents and diffs, content-addressed
+STAGING_DIR = ".omni_staging"
+INDEX_FILE = "index.jsonl"
+BLOB_DIR = "blobs"
+LEGACY_FILE = ".omni_staging.json"
+COMPACT_MIN_EVENTS = 64  # rewrite the index once it holds this many events and mostly dead ones
+# Largest file diff_engine turns around within its default 500 ms budget
+# (~0.4 s worst case for 4 MB of source); its unbudgeted linear passes
+# would overrun the budget on bigger files.
+MAX_STAGING_BYTES = 4 * 1024 * 1024
+
 class DiffStagingLayer:
     """
     Safely intercepts file writes generated by AI agents.
@@ -20,31 +36,168 @@ class DiffStagingLayer:
     def __init__(self, workspace_dir: str):
         self.workspace_dir = Path(workspace_dir).resolve() if workspace_dir else None
         # Sessions map: { session_id (str): SessionData (dict) }
+        # Proposed content and diff live in blobs; sessions only hold their hashes.
         self.sessions: Dict[str, Dict[str, Any]] = {}
-        
-        # Optional persistence layer for staging data
-        self.persist_file = self.workspace_dir / ".omni_staging.json" if self.workspace_dir else None
+        self._lock = threading.RLock()
+        self._index_events = 0
+
+        self.staging_dir = self.workspace_dir / STAGING_DIR if self.workspace_dir else None
+        self.index_file = self.staging_dir / INDEX_FILE if self.staging_dir else None
+        self.blob_dir = self.staging_dir / BLOB_DIR if self.staging_dir else None
         self._load_sessions()
 
+    # ----------------------------------------------------------
+    # PERSISTENCE: append-only index + content-addressed blobs
+    # ----------------------------------------------------------
+
     def _load_sessions(self):
-        """Loads persistent session data if it exists."""
-        if self.persist_file and self.persist_file.exists():
-            try:
-                with open(self.persist_file, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                    if isinstance(data, dict):
-                        self.sessions = data
-            except Exception as e:
-                logger.warning(f"Failed to load staging persistence: {e}")
+        """Replays the session index, migrating a legacy .omni_staging.json on first use."""
+        if not self.index_file:
+            return
+        legacy_file = self.workspace_dir / LEGACY_FILE
+        if not self.index_file.exists() and legacy_file.exists():
+            self._migrate_legacy(legacy_file)
+            return
+        try:
+            with open(self.index_file, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        event = json.loads(line)
+                    except ValueError:
+                        continue  # torn final line from an interrupted append
+                    self._apply_event(event)
+                    self._index_events += 1
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"Failed to load staging persistence: {e}")
 
-    def _save_sessions(self):
-        """Saves session data to disk."""
-        if self.persist_file:
-            try:
-                with open(self.persist_file, "w", encoding="utf-8") as f:
-                    json.dump(self.sessions, f, indent=2)
-            except Exception as e:
-                logger.warning(f"Failed to save staging persistence: {e}")
+    def _apply_event(self, event: Dict[str, Any]):
+        op = event.get("op")
+        if op == "stage" and isinstance(event.get("session"), dict):
+            session = event["session"]
+            self.sessions[session["session_id"]] = session
+        elif op == "status" and event.get("session_id") in self.sessions:
+            session = self.sessions[event["session_id"]]
+            session["status"] = event.get("status")
+            if event.get("release"):
+                session["content_blob"] = session["diff_blob"] = None
+        elif op == "drop":
+            for sid in event.get("session_ids", []):
+                self.sessions.pop(sid, None)
+
+    def _append_event(self, event: Dict[str, Any]):
+        """Applies an event in memory and appends it to the index as one JSON line."""
+        self._apply_event(event)
+        if not self.index_file:
+            return
+        try:
+            self.staging_dir.mkdir(exist_ok=True)
+            with open(self.index_file, "a", encoding="utf-8") as f:
+                f.write(json.dumps(event, separators=(",", ":")) + "\n")
+            self._index_events += 1
+        except Exception as e:
+            logger.warning(f"Failed to save staging persistence: {e}")
+            return
+        if self._index_events >= COMPACT_MIN_EVENTS and self._index_events > 2 * len(self.sessions):
+            self._compact_index()
+
+    def _compact_index(self):
+        """Rewrites the index as one `stage` event per live session and drops unreferenced blobs."""
+        tmp_path = self.index_file.with_suffix(".tmp")
+        try:
+            self.staging_dir.mkdir(exist_ok=True)
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for session in self.sessions.values():
+                    f.write(json.dumps({"op": "stage", "session": session}, separators=(",", ":")) + "\n")
+            os.replace(tmp_path, self.index_file)
+            self._index_events = len(self.sessions)
+        except Exception as e:
+            logger.warning(f"Failed to compact staging index: {e}")
+            return
+        self._collect_blobs()
+
+    def _collect_blobs(self, candidates: Optional[list] = None):
+        """Deletes blobs no session references (only among `candidates` when given)."""
+        if not self.blob_dir:
+            return
+        live = {h for s in self.sessions.values() for h in (s.get("content_blob"), s.get("diff_blob")) if h}
+        try:
+            names = candidates if candidates is not None else os.listdir(self.blob_dir)
+        except OSError:
+            return
+        for name in names:
+            if name not in live:
+                try:
+                    os.remove(self.blob_dir / name)
+                except OSError:
+                    pass
+
+    def _migrate_legacy(self, legacy_file: Path):
+        try:
+            with open(legacy_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception as e:
+            logger.warning(f"Failed to load staging persistence: {e}")
+            return
+        if not isinstance(data, dict):
+            return
+        for sid, session in data.items():
+            if not isinstance(session, dict):
+                continue
+            meta = {k: v for k, v in session.items() if k not in ("proposed_content", "diff")}
+            meta["session_id"] = sid
+            released = session.get("status") == "DISCARDED"
+            meta["content_blob"] = None if released else self._put_blob(session.get("proposed_content", ""))
+            meta["diff_blob"] = None if released else self._put_blob(session.get("diff", ""))
+            self.sessions[sid] = meta
+        self._compact_index()
+        try:
+            os.remove(legacy_file)
+        except OSError:
+            pass
+        logger.info(f"[STAGING] Migrated {len(self.sessions)} session(s) from {LEGACY_FILE}")
+
+    def _put_blob(self, text: str) -> Optional[str]:
+        """Stores text as a compressed blob named by its sha256; identical text is written once."""
+        if not self.blob_dir:
+            return None
+        data = text.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        blob_path = self.blob_dir / digest
+        if blob_path.exists():
+            return digest
+        self.blob_dir.mkdir(parents=True, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=str(self.blob_dir), prefix=".blob_tmp_")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(zlib.compress(data))
+            os.replace(temp_path, blob_path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return digest
+
+    def _get_blob(self, digest: Optional[str]) -> Optional[str]:
+        if not digest or not self.blob_dir:
+            return None
+        try:
+            with open(self.blob_dir / digest, "rb") as f:
+                return zlib.decompress(f.read()).decode("utf-8")
+        except (OSError, zlib.error, UnicodeDecodeError) as e:
+            logger.warning(f"[STAGING] Missing or unreadable blob {digest[:12]}: {e}")
+            return None
+
+    def _session_view(self, session: Dict[str, Any]) -> Dict[str, Any]:
+        """Session dict in its public shape: metadata plus proposed_content and diff."""
+        view = {k: v for k, v in session.items() if k not in ("content_blob", "diff_blob")}
+        if session.get("status") == "DISCARDED":
+            view["proposed_content"], view["diff"] = "", "Discarded."
+        else:
+            view["proposed_content"] = self._get_blob(session.get("content_blob")) or ""
+            view["diff"] = self._get_blob(session.get("diff_blob")) or ""
+        return view
 
     def _is_safe_path(self, filepath: Path) -> bool:
         if not self.workspace_dir:
@@ -83,10 +236,9 @@ class DiffStagingLayer:
         
         if path_obj.exists() and path_obj.is_file():
             try:
-                # 1MB limit for diffing
                 file_size = path_obj.stat().st_size
-                if file_size > 1024 * 1024:
-                    return {"error": "FULL_REPLACE_REQUIRED: File exceeds 1MB diffing limit."}
+                if file_size > MAX_STAGING_BYTES:
+                    return {"error": f"FULL_REPLACE_REQUIRED: File exceeds {MAX_STAGING_BYTES // (1024 * 1024)}MB staging limit."}
                     
                 original_content = path_obj.read_text(encoding='utf-8')
                 original_hash = self._compute_hash(original_content)
@@ -94,15 +246,14 @@ class DiffStagingLayer:
             except UnicodeDecodeError:
                 return {"error": "Cannot propose patches for binary files."}
 
-        # Generate Unified Diff
-        diff_lines = list(difflib.unified_diff(
-            original_content.splitlines(keepends=True),
-            new_content.splitlines(keepends=True),
+        # Generate Unified Diff (time-budgeted; see diff_engine)
+        unified_diff = diff_engine.unified_diff(
+            original_content,
+            new_content,
             fromfile=f"a/{path_obj.name}",
             tofile=f"b/{path_obj.name}",
             n=3
-        ))
-        unified_diff = "".join(diff_lines)
+        )
 
         if not unified_diff.strip():
             return {"status": "unchanged", "message": "The proposed content exactly matches the existing file."}
@@ -110,20 +261,24 @@ class DiffStagingLayer:
         # Generate secure session ID
         session_id = str(uuid.uuid4())
 
-        # Stage it into memory
-        session_data = {
-            "session_id": session_id,
-            "file_path": abs_path_str,
-            "original_hash": original_hash,
-            "original_mtime": original_mtime,
-            "proposed_content": new_content,
-            "diff": unified_diff,
-            "status": "PENDING",
-            "created_at": time.time()
-        }
-        
-        self.sessions[session_id] = session_data
-        self._save_sessions()
+        # Stage it: content and diff go to blobs, metadata to one appended index line
+        with self._lock:
+            try:
+                content_blob = self._put_blob(new_content)
+                diff_blob = self._put_blob(unified_diff)
+            except Exception as e:
+                logger.error(f"[STAGING] Failed to store patch blobs: {e}")
+                return {"error": f"Failed to stage patch: {e}"}
+            self._append_event({"op": "stage", "session": {
+                "session_id": session_id,
+                "file_path": abs_path_str,
+                "original_hash": original_hash,
+                "original_mtime": original_mtime,
+                "content_blob": content_blob,
+                "diff_blob": diff_blob,
+                "status": "PENDING",
+                "created_at": time.time()
+            }})
         
         logger.info(f"[STAGING] Generated patch for {path_obj.name} ({len(unified_diff)} bytes of diff). Session: {session_id}")
 
@@ -139,7 +294,9 @@ class DiffStagingLayer:
     def get_active_sessions(self) -> list:
         """Returns a list of all PENDING sessions with core metadata."""
         active = []
-        for sid, session in self.sessions.items():
+        with self._lock:
+            sessions = list(self.sessions.items())
+        for sid, session in sessions:
             if session.get("status") == "PENDING":
                 active.append({
                     "session_id": sid,
@@ -153,13 +310,21 @@ class DiffStagingLayer:
 
     def get_patch(self, session_id: str) -> Dict[str, Any]:
         """Returns session metadata and diff payload."""
-        return self.sessions.get(session_id, {"error": "Session not found."})
+        with self._lock:
+            session = self.sessions.get(session_id)
+            if not session:
+                return {"error": "Session not found."}
+            return self._session_view(session)
 
     def apply_patch(self, session_id: str) -> Dict[str, Any]:
         """
         Atomically applies a staged patch to the filesystem.
         Validates hash and mtime to detect collision race conditions.
         """
+        with self._lock:
+            return self._apply_patch_locked(session_id)
+
+    def _apply_patch_locked(self, session_id: str) -> Dict[str, Any]:
         session = self.sessions.get(session_id)
         if not session:
             return {"error": f"Session {session_id} not found."}
@@ -169,7 +334,9 @@ class DiffStagingLayer:
 
         absolute_path = session["file_path"]
         path_obj = Path(absolute_path)
-        new_content = session["proposed_content"]
+        new_content = self._get_blob(session.get("content_blob"))
+        if new_content is None:
+            return {"error": f"Staged content for session {session_id} is missing."}
         
         # Collision Detection
         if path_obj.exists():
@@ -196,8 +363,7 @@ class DiffStagingLayer:
             os.replace(temp_path, absolute_path)
             
             # Mark Session as Applied
-            session["status"] = "APPLIED"
-            self._save_sessions()
+            self._append_event({"op": "status", "session_id": session_id, "status": "APPLIED"})
             
             logger.info(f"[APPLIED] Patch applied atomically to {path_obj.name}")
             return {"status": "success", "file": absolute_path}
@@ -214,19 +380,18 @@ class DiffStagingLayer:
 
     def discard_patch(self, session_id: str) -> Dict[str, str]:
         """Discards a staged patch from memory and marks it rejected."""
-        session = self.sessions.get(session_id)
-        if not session:
-            return {"error": f"Session {session_id} not found."}
-            
-        if session["status"] != "PENDING":
-            return {"error": f"Cannot discard session. Current status is {session['status']}."}
-            
-        session["status"] = "DISCARDED"
-        # Release heavy memory buffers
-        session["proposed_content"] = ""
-        session["diff"] = "Discarded."
-        
-        self._save_sessions()
+        with self._lock:
+            session = self.sessions.get(session_id)
+            if not session:
+                return {"error": f"Session {session_id} not found."}
+
+            if session["status"] != "PENDING":
+                return {"error": f"Cannot discard session. Current status is {session['status']}."}
+
+            # Release heavy blobs (unless another session staged identical text)
+            released = [h for h in (session.get("content_blob"), session.get("diff_blob")) if h]
+            self._append_event({"op": "status", "session_id": session_id, "status": "DISCARDED", "release": True})
+            self._collect_blobs(released)
         logger.info(f"[STAGING] Session {session_id} discarded.")
         return {"status": "discarded", "message": "Patch rejected successfully."}
 
@@ -234,17 +399,36 @@ class DiffStagingLayer:
         """Removes pending sessions older than TTL, and flushes applied/discarded states."""
         current_time = time.time()
         to_delete = []
-        
-        for sid, session in self.sessions.items():
-            age = current_time - session.get("created_at", 0)
-            
-            # Delete if stale pending map, or if already resolved
-            if (session["status"] == "PENDING" and age > ttl_seconds) or session["status"] in ["APPLIED", "DISCARDED"]:
-                to_delete.append(sid)
-                
-        for sid in to_delete:
-            del self.sessions[sid]
-            
-        if to_delete:
-            self._save_sessions()
-            logger.info(f"[CLEANUP] Deleted {len(to_delete)} expired/resolved staging sessions.")
+
+        with self._lock:
+            for sid, session in self.sessions.items():
+                age = current_time - session.get("created_at", 0)
+
+                # Delete if stale pending map, or if already resolved
+                if (session["status"] == "PENDING" and age > ttl_seconds) or session["status"] in ["APPLIED", "DISCARDED"]:
+                    to_delete.append(sid)
+
+            if not to_delete:
+                return
+            self._append_event({"op": "drop", "session_ids": to_delete})
+            if self.index_file:
+                self._compact_index()
+        logger.info(f"[CLEANUP] Deleted {len(to_delete)} expired/resolved staging sessions.")
+
+
+# ── Per-workspace registry ───────────────────────────────────
+# One layer per workspace, so safe_write and the patch endpoints share the
+# in-memory session index instead of replaying it on every call.
+_layers: Dict[str, DiffStagingLayer] = {}
+_registry_lock = threading.Lock()
+
+
+def get_staging_layer(workspace_dir: str) -> DiffStagingLayer:
+    if not workspace_dir:
+        return DiffStagingLayer(workspace_dir)
+    key = os.path.normcase(os.path.abspath(workspace_dir))
+    with _registry_lock:
+        layer = _layers.get(key)
+        if layer is None:
+            layer = _layers[key] = DiffStagingLayer(workspace_dir)
+        return layer
@@ -0,0 +1,281 @@
+# ══════════════════════════════════════════════════════════════════
+# 📝 Omni-IDE — Cached File Summaries
+# ══════════════════════════════════════════════════════════════════
+#
+#  /explain, /health and the planner re-send the same unchanged files on
+#  every request. This store keeps a short LLM-written summary per file so
+#  context builders can show summaries for cold files and raw text only
+#  for hot or query-relevant ones.
+#
+#  • Keyed by the sha256 of the file's content, so a summary is reused
+#    until the content itself changes (touching or renaming is free).
+#  • Persisted to <workspace>/.omni_summaries.json (ignored by the
+#    workspace walk like every other .omni* file).
+#  • Lazy: request() only queues missing summaries on a small worker
+#    pool; callers never wait for the LLM. Only /explain and /health
+#    request summaries; every other context build just reads the cache.
+#  • Nothing is queued without a cloud key, and a file whose summary
+#    failed is retried with exponential backoff, not on every request.
+#  • Bounded spend: a daily token budget (OMNI_SUMMARY_DAILY_TOKENS,
+#    default 200k; 0 disables summarisation) persisted with the cache.
+#
+# ══════════════════════════════════════════════════════════════════
+
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_FILE = ".omni_summaries.json"
+DAILY_TOKENS_ENV = "OMNI_SUMMARY_DAILY_TOKENS"
+DEFAULT_DAILY_TOKENS = 200_000
+MAX_WORKERS = 2
+MAX_PENDING = 64
+MAX_ENTRIES = 5000
+MAX_INPUT_CHARS = 12_000
+MAX_SUMMARY_TOKENS = 160
+MIN_FILE_BYTES = 200          # tiny files are cheaper to show verbatim
+MAX_FILE_BYTES = 512 * 1024
+FAILURE_BACKOFF_SECONDS = 60      # doubled per consecutive failure of the same content
+MAX_FAILURE_BACKOFF_SECONDS = 6 * 3600
+
+SUMMARY_PROMPT = (
+    "Summarise this source file for another engineer in at most 3 sentences: "
+    "its purpose, the main classes/functions it defines, and what it depends on. "
+    "No preamble.\n\nFile: {path}\n```\n{content}\n```"
+)
+
+
+def daily_token_budget() -> int:
+    try:
+        return max(0, int(os.getenv(DAILY_TOKENS_ENV, DEFAULT_DAILY_TOKENS)))
+    except ValueError:
+        return DEFAULT_DAILY_TOKENS
+
+
+def _cloud_key_configured() -> bool:
+    from gateway import get_gateway
+    return bool(get_gateway().gemini_key)
+
+
+def _default_summarize(rel_path: str, content: str) -> Tuple[str, int]:
+    """One cloud completion; returns (summary, tokens used)."""
+    from gateway import get_gateway
+    from request_coalescer import coalesced_completion
+    gateway = get_gateway()
+    if not gateway.gemini_key:
+        raise RuntimeError("no cloud key configured")
+    response = coalesced_completion(
+        **gateway.cloud_completion_kwargs(),
+        messages=[{"role": "user", "content": SUMMARY_PROMPT.format(path=rel_path, content=content)}],
+        max_tokens=MAX_SUMMARY_TOKENS,
+        timeout=60,
+    )
+    summary = (response.choices[0].message.content or "").strip()
+    usage = getattr(response, "usage", None)
+    tokens = getattr(usage, "total_tokens", None) or (len(content) + len(summary)) // 4
+    return summary, int(tokens)
+
+
+class SummaryStore:
+    def __init__(self, workspace_dir: str,
+                 summarize: Optional[Callable[[str, str], Tuple[str, int]]] = None):
+        self.workspace_dir = workspace_dir
+        self.path = os.path.join(workspace_dir, SUMMARY_FILE)
+        self._summarize = summarize or _default_summarize
+        self._lock = threading.Lock()
+        self._entries: Dict[str, dict] = {}          # content hash → {"path", "summary", "created"}
+        self._budget = {"day": "", "tokens": 0}
+        self._hashes: Dict[str, Tuple[Tuple[int, int], str]] = {}  # rel_path → ((mtime_ns, size), hash)
+        self._pending: set = set()
+        self._failures: Dict[str, Tuple[int, float]] = {}  # content hash → (failures, retry after)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._stats = {"hits": 0, "misses": 0, "generated": 0, "failed": 0, "skipped_budget": 0, "skipped_backoff": 0}
+        self._load()
+
+    # ----------------------------------------------------------
+    # PERSISTENCE
+    # ----------------------------------------------------------
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self._entries = dict(data.get("entries") or {})
+            self._budget = dict(data.get("budget") or self._budget)
+        except (OSError, ValueError, AttributeError):
+            pass  # missing or corrupt → start empty
+
+    def _save_locked(self):
+        if len(self._entries) > MAX_ENTRIES:
+            oldest = sorted(self._entries, key=lambda h: self._entries[h].get("created", 0))
+            for content_hash in oldest[:len(self._entries) - MAX_ENTRIES]:
+                del self._entries[content_hash]
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"entries": self._entries, "budget": self._budget}, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"📝 SUMMARIES: Could not persist cache: {e}")
+
+    # ----------------------------------------------------------
+    # LOOKUP
+    # ----------------------------------------------------------
+
+    def _content_hash(self, rel_path: str) -> Optional[str]:
+        """sha256 of the file, recomputed only when (mtime_ns, size) changes."""
+        full_path = os.path.join(self.workspace_dir, rel_path)
+        try:
+            st = os.stat(full_path)
+        except OSError:
+            return None
+        stamp = (st.st_mtime_ns, st.st_size)
+        with self._lock:
+            cached = self._hashes.get(rel_path)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+        try:
+            with open(full_path, "rb") as f:
+                content_hash = hashlib.sha256(f.read()).hexdigest()
+        except OSError:
+            return None
+        with self._lock:
+            self._hashes[rel_path] = (stamp, content_hash)
+        return content_hash
+
+    def get(self, rel_path: str) -> Optional[str]:
+        """Cached summary for the file's current content, or None."""
+        content_hash = self._content_hash(rel_path)
+        with self._lock:
+            entry = self._entries.get(content_hash) if content_hash else None
+            self._stats["hits" if entry else "misses"] += 1
+        return entry["summary"] if entry else None
+
+    # ----------------------------------------------------------
+    # BACKGROUND GENERATION
+    # ----------------------------------------------------------
+
+    def _remaining_budget_locked(self) -> int:
+        today = time.strftime("%Y-%m-%d")
+        if self._budget.get("day") != today:
+            self._budget = {"day": today, "tokens": 0}
+        return daily_token_budget() - self._budget["tokens"]
+
+    def request(self, rel_paths: Iterable[str]) -> int:
+        """Queue summaries for files that lack one; returns how many were queued."""
+        if self._summarize is _default_summarize and not _cloud_key_configured():
+            return 0
+        queued = 0
+        now = time.time()
+        for rel_path in rel_paths:
+            full_path = os.path.join(self.workspace_dir, rel_path)
+            try:
+                size = os.path.getsize(full_path)
+            except OSError:
+                continue
+            if not MIN_FILE_BYTES <= size <= MAX_FILE_BYTES:
+                continue
+            content_hash = self._content_hash(rel_path)
+            with self._lock:
+                if not content_hash or content_hash in self._entries or content_hash in self._pending:
+                    continue
+                failure = self._failures.get(content_hash)
+                if failure and failure[1] > now:
+                    self._stats["skipped_backoff"] += 1
+                    continue
+                if len(self._pending) >= MAX_PENDING:
+                    break
+                if self._remaining_budget_locked() <= 0:
+                    self._stats["skipped_budget"] += 1
+                    break
+                self._pending.add(content_hash)
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="omni-summary")
+                self._executor.submit(self._generate, rel_path, content_hash)
+            queued += 1
+        return queued
+
+    def _generate(self, rel_path: str, content_hash: str):
+        try:
+            with open(os.path.join(self.workspace_dir, rel_path), "rb") as f:
+                raw = f.read()
+            if hashlib.sha256(raw).hexdigest() != content_hash:
+                return  # edited since it was queued; the next request() picks up the new content
+            content = raw.decode("utf-8", errors="replace")[:MAX_INPUT_CHARS]
+            estimate = len(content) // 4 + MAX_SUMMARY_TOKENS
+            with self._lock:
+                if self._remaining_budget_locked() < estimate:
+                    self._stats["skipped_budget"] += 1
+                    return
+                self._budget["tokens"] += estimate  # reserve, settle below
+            try:
+                summary, tokens = self._summarize(rel_path, content)
+            except Exception as e:
+                with self._lock:
+                    self._budget["tokens"] -= estimate
+                    self._stats["failed"] += 1
+                    failures = self._failures.get(content_hash, (0, 0.0))[0] + 1
+                    delay = min(MAX_FAILURE_BACKOFF_SECONDS, FAILURE_BACKOFF_SECONDS * 2 ** (failures - 1))
+                    self._failures[content_hash] = (failures, time.time() + delay)
+                logger.warning(f"📝 SUMMARIES: {rel_path} failed: {e}")
+                return
+            with self._lock:
+                self._budget["tokens"] += tokens - estimate
+                self._failures.pop(content_hash, None)
+                if summary:
+                    # One summary per path: drop the entry for its previous content
+                    for stale in [h for h, e in self._entries.items() if e.get("path") == rel_path]:
+                        del self._entries[stale]
+                    self._entries[content_hash] = {"path": rel_path, "summary": summary, "created": time.time()}
+                    self._stats["generated"] += 1
+                self._save_locked()
+            logger.info(f"📝 SUMMARIES: Summarised {rel_path} ({tokens} tokens)")
+        except OSError:
+            pass
+        finally:
+            with self._lock:
+                self._pending.discard(content_hash)
+
+    def close(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {
+                **self._stats,
+                "entries": len(self._entries),
+                "pending": len(self._pending),
+                "backing_off": len(self._failures),
+                "tokens_today": self._budget.get("tokens", 0) if self._budget.get("day") == time.strftime("%Y-%m-%d") else 0,
+                "daily_budget": daily_token_budget(),
+            }
+
+
+# ── Per-workspace registry ───────────────────────────────────
+_stores: Dict[str, SummaryStore] = {}
+_registry_lock = threading.Lock()
+
+
+def get_summary_store(workspace_dir: str) -> SummaryStore:
+    key = os.path.normcase(os.path.abspath(workspace_dir))
+    with _registry_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = _stores[key] = SummaryStore(workspace_dir)
+        return store
+
+
+def get_summary_stats() -> dict:
+    with _registry_lock:
+        stores = list(_stores.items())
+    return {key: store.get_stats() for key, store in stores}
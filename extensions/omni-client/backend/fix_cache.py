@@ -0,0 +1,171 @@
+# ══════════════════════════════════════════════════════════════════
+# ♻️ Omni-IDE — Error-Fingerprint Fix Cache
+# ══════════════════════════════════════════════════════════════════
+#
+#  The same ModuleNotFoundError, port-in-use or syntax error comes back
+#  again and again, and every /debug paid a full LLM run for it. Errors
+#  are reduced to a fingerprint:
+#
+#    exception type + message with literals stripped + top workspace frame
+#
+#  The frame is file + function; for module-level code, which has no
+#  function, it is file + the offending source line (whitespace
+#  normalized), or the line number when the file can't be read.
+#  Fingerprints with neither a frame nor a quoted identifier are too
+#  generic to trust ("SyntaxError: invalid syntax") and are never cached.
+#
+#  DebugAgent answers are stored against the fingerprint as
+#  `recent_fixes` rows of the workspace memory store. A later /debug with the same
+#  fingerprint gets the stored fix instantly; `/debug --fresh ...` drops
+#  it and asks the LLM.
+#
+#  Literal stripping removes numbers, addresses, paths and free-text
+#  strings, but keeps short identifier-like quoted names ('requests',
+#  'user_id'), since those decide what the fix is.
+#
+# ══════════════════════════════════════════════════════════════════
+
+import os
+import re
+import time
+import hashlib
+import logging
+from typing import Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+MAX_FIXES = 25
+MAX_FIX_CHARS = 6000
+FRESH_FLAG = "--fresh"
+
+# "ModuleNotFoundError: No module named 'x'", "node:events.Error: ...", "SyntaxError: invalid syntax"
+_EXC_LINE_RE = re.compile(
+    r"^\s*(?:Uncaught\s+)?([A-Za-z_][\w.]*(?:Error|Exception|Warning|Exit|Interrupt|Fault)|Error)(?::\s*(.*))?$"
+)
+_QUOTED_RE = re.compile(r"""(['"`])(.*?)\1""")
+_IDENTIFIER_RE = re.compile(r"^[\w.@/-]{1,60}$")
+_PATH_RE = re.compile(r"(?:[A-Za-z]:)?(?:[\\/][\w.@-]+){2,}[\\/]?")
+_ADDR_RE = re.compile(r"\b0x[0-9a-fA-F]+\b")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_KEPT_QUOTE_RE = re.compile(r"'[^']+'")
+
+
+def _normalize_message(message: str) -> str:
+    def _quoted(match):
+        body = match.group(2)
+        if _IDENTIFIER_RE.match(body) and not _PATH_RE.search(body):
+            return f"'{body}'"
+        return "<str>"
+
+    message = _QUOTED_RE.sub(_quoted, message)
+    message = _PATH_RE.sub("<path>", message)
+    message = _ADDR_RE.sub("<addr>", message)
+    message = _NUMBER_RE.sub("<n>", message)
+    return " ".join(message.split())[:300]
+
+
+def _source_line(workspace_dir: str, rel_path: str, line: int) -> Optional[str]:
+    try:
+        with open(os.path.join(workspace_dir, rel_path), "r", encoding="utf-8", errors="replace") as f:
+            for number, text in enumerate(f, 1):
+                if number == line:
+                    return " ".join(text.split())[:200] or None
+    except OSError:
+        pass
+    return None
+
+
+def fingerprint_error(error_text: str, workspace_dir: Optional[str] = None) -> Optional[dict]:
+    """
+    {"id", "type", "message", "frame", "label", "cacheable"} for an error text,
+    or None when no exception line is found.
+    """
+    lines = [line for line in (error_text or "").splitlines() if line.strip()]
+    matches = [m for m in (_EXC_LINE_RE.match(line) for line in lines) if m]
+    if not matches:
+        return None
+    # Python prints the raised exception last; Node prints it above its stack
+    python_style = "Traceback (most recent call last)" in error_text or 'File "' in error_text
+    match = matches[-1] if python_style else matches[0]
+    exc_type = match.group(1).rsplit(".", 1)[-1] if "." in match.group(1) and python_style else match.group(1)
+    message = _normalize_message(match.group(2) or "")
+
+    frame = ""
+    if workspace_dir:
+        from traceback_context import parse_frames
+        frames = parse_frames(error_text, workspace_dir)
+        if frames:
+            # Line numbers shift with unrelated edits; file + function are stable
+            rel_path, line, function = frames[0]
+            if function:
+                frame = f"{rel_path}:{function}"
+            else:
+                source = _source_line(workspace_dir, rel_path, line)
+                frame = f"{rel_path}:{source}" if source else f"{rel_path}:{line}"
+
+    key = f"{exc_type}|{message}|{frame}"
+    return {
+        "id": hashlib.sha1(key.encode("utf-8")).hexdigest()[:16],
+        "type": exc_type,
+        "message": message,
+        "frame": frame,
+        "label": f"{exc_type}: {message}" + (f" @ {frame}" if frame else ""),
+        "cacheable": bool(frame or _KEPT_QUOTE_RE.search(message)),
+    }
+
+
+def split_fresh_flag(user_task: str) -> Tuple[str, bool]:
+    """Strip a leading `--fresh` from a /debug argument."""
+    stripped = user_task.lstrip()
+    if stripped == FRESH_FLAG or stripped.startswith(FRESH_FLAG + " ") or stripped.startswith(FRESH_FLAG + "\n"):
+        return stripped[len(FRESH_FLAG):].strip(), True
+    return user_task, False
+
+
+class FixCache:
+    """Fixes keyed by error fingerprint, stored as `recent_fixes` rows of the workspace memory store."""
+
+    KIND = "recent_fixes"
+
+    def __init__(self, core):
+        self.core = core
+        self.workspace_dir = str(core.workspace_dir) if core.workspace_dir else None
+        self.store = core.memory_store()
+
+    def lookup(self, error_text: str) -> Optional[Tuple[dict, dict]]:
+        """(fingerprint, stored fix) for a previously fixed error, or None."""
+        fp = fingerprint_error(error_text, self.workspace_dir)
+        if fp is None or not fp["cacheable"] or self.store is None:
+            return None
+        entry = self.store.get(self.KIND, fp["id"])
+        if not isinstance(entry, dict):
+            return None
+        entry["hits"] = entry.get("hits", 0) + 1
+        entry["last_used"] = time.time()
+        self.store.upsert(self.KIND, fp["id"], entry, defer=True)
+        logger.info(f"♻️ FIX CACHE: Hit for {fp['label']} ({entry['hits']} reuse(s))")
+        return fp, entry
+
+    def record(self, error_text: str, fix: str) -> Optional[dict]:
+        """Store `fix` for the error's fingerprint, replacing an older fix for the same fingerprint."""
+        fp = fingerprint_error(error_text, self.workspace_dir)
+        if fp is None or not fp["cacheable"] or self.store is None or not fix.strip():
+            return None
+        self.store.upsert(self.KIND, fp["id"], {
+            "fingerprint": fp["id"],
+            "error": fp["label"],
+            "fix": fix[:MAX_FIX_CHARS],
+            "created": time.time(),
+            "last_used": time.time(),
+            "hits": 0,
+        }, cap=MAX_FIXES)
+        logger.info(f"♻️ FIX CACHE: Stored fix for {fp['label']}")
+        return fp
+
+    def reject(self, error_text: str) -> bool:
+        """Forget the stored fix for this error (the user asked for a fresh analysis)."""
+        fp = fingerprint_error(error_text, self.workspace_dir)
+        if fp is None or self.store is None or not self.store.delete(self.KIND, fp["id"]):
+            return False
+        logger.info(f"♻️ FIX CACHE: Rejected cached fix for {fp['label']}")
+        return True
@@ -15,13 +15,19 @@
 import os
 import re
 import time
+import hashlib
 import logging
+import threading
+from collections import deque
 from enum import Enum
 from dataclasses import dataclass, field
-from typing import Optional
+from typing import Any, Callable, Optional, Tuple
 
 from dotenv import load_dotenv
 
+from circuit_breaker import CircuitBreakerRegistry, classify_error
+from latency_stats import LatencySketch
+
 logger = logging.getLogger(__name__)
 
 # ── Load environment ─────────────────────────────────────────
@@ -51,6 +57,59 @@ class RoutingDecision:
     latency_ms: float = 0.0
 
 
+@dataclass
+class ModelSample:
+    timestamp: float
+    latency_ms: float
+    ok: bool
+    rate_limited: bool = False
+
+
+def _is_rate_limit_error(error: Optional[BaseException]) -> bool:
+    """True for 429/402 style quota errors (typed first, message as last resort)."""
+    return error is not None and classify_error(error) == "rate_limit"
+
+
+def _key_fingerprint(api_key: Optional[str]) -> Optional[str]:
+    """Short, non-reversible id of an API key for pool keys and logs."""
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:12] if api_key else None
+
+
+_TRACKED_MODEL_CLASS = None
+
+def _tracked_model_class():
+    """LiteLLMModel subclass that reports per-call latency/outcome to the gateway (lazy import)."""
+    global _TRACKED_MODEL_CLASS
+    if _TRACKED_MODEL_CLASS is None:
+        from smolagents import LiteLLMModel
+
+        class TrackedLiteLLMModel(LiteLLMModel):
+            # Cloud models re-resolve their chain on every call so models
+            # behind an open circuit are skipped without a round trip.
+            cloud_chain = False
+
+            def generate(self, *args, **kwargs):
+                gw = get_gateway()
+                if not self.cloud_chain:
+                    gw.acquire_models([self.model_id])
+                    return gw.call_model_chain(
+                        [self.model_id], lambda _: super(TrackedLiteLLMModel, self).generate(*args, **kwargs))
+                chain = gw.acquire_cloud_chain()
+                try:
+                    first = gw.get_cloud_chain_model(chain[0])
+                except Exception:
+                    gw.release_models(chain[:1])
+                    raise
+
+                def _call(model_id):
+                    target = first if model_id == chain[0] else gw.get_cloud_chain_model(model_id)
+                    return super(TrackedLiteLLMModel, target).generate(*args, **kwargs)
+                return gw.call_model_chain(chain, _call)
+
+        _TRACKED_MODEL_CLASS = TrackedLiteLLMModel
+    return _TRACKED_MODEL_CLASS
+
+
 # Trigger words that indicate a complex, reasoning-heavy task.
 COMPLEXITY_TRIGGERS = frozenset({
     "refactor", "architect", "design", "explain", "debug",
@@ -83,6 +142,40 @@ OLLAMA_PREFERRED_MODELS = [
 ]
 OLLAMA_FALLBACK_MODEL = "ollama/qwen2.5-coder:3b"
 
+# Capability tiers (0 = strongest), consistent with the static orders above.
+# Live latency only reorders models inside one tier; a faster but weaker
+# model never overtakes a healthy stronger one. Unlisted models rank last.
+MODEL_CAPABILITY_TIERS = {
+    "gemini/gemini-3.1-flash-lite-preview": 0,
+    "gemini/gemini-3-flash-preview": 0,
+    "gemini/gemini-2.5-flash-lite": 1,
+    "gemini/gemini-flash-lite-latest": 1,
+    "ollama/qwen2.5-coder:7b": 0,
+    "ollama/qwen2.5-coder:3b": 1,
+    "ollama/qwen2.5-coder:1.5b": 2,
+    "ollama/qwen2.5:7b": 3,
+    "ollama/qwen2.5:3b": 3,
+    "ollama/llama3:latest": 3,
+    "ollama/codellama:latest": 3,
+}
+UNLISTED_CAPABILITY_TIER = 99
+
+# Adaptive fallback ordering — rolling health window per model.
+# Within a tier, models are ranked by (avg success latency + error/rate-limit
+# penalties); ties keep the static order above. A model failing at least
+# UNHEALTHY_FAILURE_RATE of its recent calls drops below every healthy model.
+MODEL_HEALTH_WINDOW = 50            # samples kept per model
+MODEL_HEALTH_MAX_AGE_S = 600.0      # samples older than this are ignored
+ADAPTIVE_PRIOR_LATENCY_MS = 3000.0  # assumed latency for models without samples
+ERROR_PENALTY_MS = 20000.0          # an always-failing model ranks like a 20s model
+RATE_LIMIT_PENALTY_MS = 40000.0     # rate limits are worse than transient errors
+UNHEALTHY_FAILURE_RATE = 0.5        # errors + rate limits share that demotes across tiers
+UNHEALTHY_MIN_SAMPLES = 3           # ...once there are at least this many samples
+
+# Recent routing decisions kept for inspection; totals and percentiles
+# are maintained incrementally so memory stays constant.
+ROUTING_HISTORY_SIZE = 200
+
 # Environment keys
 GEMINI_API_KEY_ENV = "GEMINI_API_KEY"
 OLLAMA_BASE_URL_ENV = "OLLAMA_BASE_URL"
@@ -134,17 +227,26 @@ class ModelGateway:
         # Strip surrounding quotes that dotenv.set_key() may have added
         self.gemini_key = raw_key.strip("'").strip('"').strip() or None
         self.local_url = os.getenv(OLLAMA_BASE_URL_ENV, OLLAMA_DEFAULT_URL)
-        self._routing_history: list[RoutingDecision] = []
+        self._routing_history: deque = deque(maxlen=ROUTING_HISTORY_SIZE)
+        self._routes_by_tier = {tier: 0 for tier in ModelTier}
+        self._tier_latency = {tier: LatencySketch() for tier in ModelTier}
+        self._model_latency: dict[str, LatencySketch] = {}
+        self._routing_lock = threading.Lock()
+        self._model_health: dict[str, deque] = {}
+        self._health_lock = threading.Lock()
+        self._breakers = CircuitBreakerRegistry()
+        self._model_pool: dict[tuple, object] = {}
+        self._pool_lock = threading.Lock()
+        self._pool_hits = 0
+        self._pool_misses = 0
         self._local_available: Optional[bool] = None
         self._last_health_check: float = 0.0
         self._health_check_ttl: float = 30.0
+        self.local_models_installed: list[str] = []
 
         # ── AUTO-DETECT LOCAL MODEL ───────────────────────────────
         self.local_model_id = self._detect_local_model()
 
-        # ── Pre-build cloud model for runtime fallback ────────────
-        self._cloud_model = None
-
         # Boot-time diagnostics
         print(f"🔑 GATEWAY DEBUG: Gemini Key Present? {bool(self.gemini_key)}")
         logger.info("🧠 GATEWAY: Hybrid Intelligence Engine v3.0 initialized.")
@@ -166,6 +268,7 @@ class ModelGateway:
                 data = json.loads(resp.read())
                 installed = [m["name"] for m in data.get("models", [])]
                 logger.info(f"   ├─ Ollama installed models: {installed}")
+                self.local_models_installed = [f"ollama/{m}" for m in OLLAMA_PREFERRED_MODELS if m in installed]
 
                 for preferred in OLLAMA_PREFERRED_MODELS:
                     if preferred in installed:
@@ -188,19 +291,211 @@ class ModelGateway:
             return None
 
     def get_cloud_model(self):
-        """Get or create a Gemini cloud model (for runtime fallback)."""
-        if self._cloud_model is None and self.gemini_key:
+        """Get the pooled Gemini cloud model (for runtime fallback)."""
+        if not self.gemini_key:
+            return None
+        try:
+            return self._build_cloud_model()
+        except Exception as e:
+            logger.error(f"❌ GATEWAY: Cloud fallback init failed: {e}")
+            return None
+
+    # ----------------------------------------------------------
+    # MODEL POOL
+    # ----------------------------------------------------------
+
+    def get_pooled_model(self, model_id: str, api_base: Optional[str] = None,
+                         api_key: Optional[str] = None, cloud_chain: bool = False):
+        """
+        Shared model instance keyed on (model_id, api_base, key fingerprint).
+
+        Cloud-chain models pick their fallbacks per call (see call_model_chain),
+        so the fallback list is not part of the key and one instance serves
+        every ranking.
+        """
+        key = (model_id, api_base, _key_fingerprint(api_key), cloud_chain)
+        with self._pool_lock:
+            model = self._model_pool.get(key)
+            if model is not None:
+                self._pool_hits += 1
+                return model
+            self._pool_misses += 1
+            model = _tracked_model_class()(model_id=model_id, api_base=api_base, api_key=api_key)
+            model.cloud_chain = cloud_chain
+            self._model_pool[key] = model
+            return model
+
+    def invalidate_model_pool(self):
+        """Drop every pooled model (keys or endpoints changed)."""
+        with self._pool_lock:
+            dropped = len(self._model_pool)
+            self._model_pool.clear()
+        if dropped:
+            logger.info(f"♻️  GATEWAY: Model pool invalidated ({dropped} instances).")
+
+    def get_pool_stats(self) -> dict:
+        with self._pool_lock:
+            return {"size": len(self._model_pool), "hits": self._pool_hits, "misses": self._pool_misses}
+
+    # ----------------------------------------------------------
+    # ADAPTIVE FALLBACK ORDERING
+    # ----------------------------------------------------------
+
+    def record_model_result(self, model_id: str, latency_ms: float, error: Optional[BaseException] = None):
+        """Record one call outcome into the model's rolling health window and circuit breaker."""
+        sample = ModelSample(
+            timestamp=time.time(),
+            latency_ms=latency_ms,
+            ok=error is None,
+            rate_limited=_is_rate_limit_error(error),
+        )
+        with self._health_lock:
+            window = self._model_health.get(model_id)
+            if window is None:
+                window = self._model_health[model_id] = deque(maxlen=MODEL_HEALTH_WINDOW)
+            window.append(sample)
+        self._breakers.record(model_id, error)
+
+    def call_model_chain(self, chain: list[str], call: Callable[[str], Any]):
+        """
+        Call chain[0], then each later model in turn until one answers.
+
+        The chain is walked here instead of through LiteLLM's `fallbacks=`, so
+        every hop is charged its own outcome: a 429 on the primary reaches its
+        breaker as the real exception (opening it at once, honouring
+        Retry-After) rather than as an opaque "fell back" failure. Fallbacks
+        whose circuit opened meanwhile are skipped; the last error is raised.
+        """
+        last_error: Optional[BaseException] = None
+        for n, model_id in enumerate(chain):
+            if n and not self._breakers.available([model_id]):
+                continue
+            start = time.perf_counter()
             try:
-                from smolagents import LiteLLMModel
-                self._cloud_model = LiteLLMModel(
-                    model_id=GEMINI_PRIMARY_MODEL,
-                    api_key=self.gemini_key,
-                    fallbacks=[{"model": m, "api_key": self.gemini_key} for m in GEMINI_FALLBACK_CHAIN]
-                )
-                logger.info(f"☁️  GATEWAY: Cloud fallback ready → {GEMINI_PRIMARY_MODEL} (Chain: {len(GEMINI_FALLBACK_CHAIN)} fallbacks)")
+                result = call(model_id)
             except Exception as e:
-                logger.error(f"❌ GATEWAY: Cloud fallback init failed: {e}")
-        return self._cloud_model
+                self.record_model_result(model_id, (time.perf_counter() - start) * 1000, e)
+                last_error = e
+                if n + 1 < len(chain):
+                    logger.warning(f"⚠️  GATEWAY: {model_id} failed ({classify_error(e)}) → trying next model")
+                continue
+            if result is None:
+                self.record_model_result(model_id, (time.perf_counter() - start) * 1000, RuntimeError("empty response"))
+                last_error = RuntimeError(f"{model_id} returned an empty response")
+                continue
+            self.record_model_result(model_id, (time.perf_counter() - start) * 1000)
+            return result
+        raise last_error
+
+    def completion_chain(self, kwargs: dict) -> Tuple[list[str], Callable[[str], dict]]:
+        """
+        Split litellm kwargs built by cloud/local_completion_kwargs() into the
+        model chain and a function giving each hop's kwargs (without `fallbacks`).
+        """
+        base = {k: v for k, v in kwargs.items() if k != "fallbacks"}
+        overrides = {f["model"]: f for f in kwargs.get("fallbacks") or [] if isinstance(f, dict) and f.get("model")}
+        chain = [kwargs.get("model"), *overrides]
+        return chain, lambda model_id: {**base, **overrides.get(model_id, {}), "model": model_id}
+
+    def _model_health_summary(self, model_id: str) -> dict:
+        cutoff = time.time() - MODEL_HEALTH_MAX_AGE_S
+        with self._health_lock:
+            samples = [x for x in self._model_health.get(model_id, ()) if x.timestamp >= cutoff]
+        n = len(samples)
+        ok_latencies = [x.latency_ms for x in samples if x.ok]
+        rate_limited = sum(1 for x in samples if x.rate_limited)
+        errors = sum(1 for x in samples if not x.ok and not x.rate_limited)
+        avg_latency = sum(ok_latencies) / len(ok_latencies) if ok_latencies else None
+        error_rate = errors / n if n else 0.0
+        rate_limit_rate = rate_limited / n if n else 0.0
+        score = (
+            (avg_latency if avg_latency is not None else ADAPTIVE_PRIOR_LATENCY_MS)
+            + error_rate * ERROR_PENALTY_MS
+            + rate_limit_rate * RATE_LIMIT_PENALTY_MS
+        )
+        return {
+            "model": model_id,
+            "score": round(score, 1),
+            "tier": MODEL_CAPABILITY_TIERS.get(model_id, UNLISTED_CAPABILITY_TIER),
+            "healthy": n < UNHEALTHY_MIN_SAMPLES or error_rate + rate_limit_rate < UNHEALTHY_FAILURE_RATE,
+            "samples": n,
+            "avg_latency_ms": round(avg_latency, 1) if avg_latency is not None else None,
+            "error_rate": round(error_rate, 3),
+            "rate_limit_rate": round(rate_limit_rate, 3),
+        }
+
+    def rank_models(self, models: list[str]) -> list[str]:
+        """
+        Order models healthy-first, then by capability tier, then by live
+        health score; ties keep the static order.
+        """
+        ranked = []
+        for i, m in enumerate(models):
+            health = self._model_health_summary(m)
+            ranked.append((not health["healthy"], health["tier"], health["score"], i, m))
+        return [entry[-1] for entry in sorted(ranked)]
+
+    def get_cloud_chain(self) -> list[str]:
+        """Gemini primary + fallbacks, re-ordered by recent health, open circuits skipped."""
+        return self._breakers.available(self.rank_models([GEMINI_PRIMARY_MODEL, *GEMINI_FALLBACK_CHAIN]))
+
+    def get_local_chain(self) -> list[str]:
+        """Installed preferred Ollama models, re-ordered by recent health, open circuits skipped."""
+        return self._breakers.available(self.rank_models(self.local_models_installed))
+
+    # ----------------------------------------------------------
+    # CIRCUIT BREAKERS
+    # ----------------------------------------------------------
+
+    def acquire_models(self, models: list[str]) -> list[str]:
+        """
+        Drop models behind an open circuit right before a call and claim the
+        first model's half-open probe slot. Raises CircuitOpenError when none are left.
+        """
+        return self._breakers.acquire(models)
+
+    def release_models(self, models: list[str]):
+        """Hand back probe slots of an acquired chain whose call was never made."""
+        self._breakers.release(models)
+
+    def acquire_cloud_chain(self) -> list[str]:
+        return self.acquire_models(self.rank_models([GEMINI_PRIMARY_MODEL, *GEMINI_FALLBACK_CHAIN]))
+
+    def get_cloud_chain_model(self, primary: str):
+        """Cloud model instance whose primary is `primary` (fallbacks are passed per call)."""
+        return self.get_pooled_model(primary, api_key=self.gemini_key)
+
+    def cloud_completion_kwargs(self, api_key: Optional[str] = None) -> dict:
+        """
+        model + fallbacks kwargs for a direct litellm call using the live cloud
+        ranking. Raises CircuitOpenError when every cloud circuit is open.
+        """
+        api_key = api_key or self.gemini_key
+        chain = self.acquire_cloud_chain()
+        return {
+            "model": chain[0],
+            "api_key": api_key,
+            "fallbacks": [{"model": m, "api_key": api_key} for m in chain[1:]],
+        }
+
+    def local_completion_kwargs(self) -> dict:
+        """
+        model + fallbacks kwargs for a direct litellm call to Ollama using the
+        live local ranking (OLLAMA_FALLBACK_MODEL when no preferred model was
+        detected). Raises CircuitOpenError when every local circuit is open.
+        """
+        ranked = self.rank_models(self.local_models_installed) or [OLLAMA_FALLBACK_MODEL]
+        chain = self.acquire_models(ranked)
+        return {
+            "model": chain[0],
+            "api_base": self.local_url,
+            "fallbacks": [{"model": m, "api_base": self.local_url} for m in chain[1:]],
+        }
+
+    def _build_cloud_model(self):
+        # The chain model is a pooled front: every call re-resolves the ranked
+        # chain and delegates to the pooled instance of its current primary.
+        return self.get_pooled_model(GEMINI_PRIMARY_MODEL, api_key=self.gemini_key, cloud_chain=True)
 
     # ----------------------------------------------------------
     # CORE ROUTING: get_brain()
@@ -240,7 +535,7 @@ class ModelGateway:
             )
 
         decision.latency_ms = (time.perf_counter() - start) * 1000
-        self._routing_history.append(decision)
+        self._record_decision(decision)
         self._log_decision(decision)
 
         return self._build_model(decision)
@@ -295,9 +590,10 @@ class ModelGateway:
                     trigger = keyword
                     break
 
+            chain = self.get_cloud_chain()
             return RoutingDecision(
                 tier=ModelTier.CLOUD,
-                model_id=GEMINI_PRIMARY_MODEL,
+                model_id=chain[0] if chain else GEMINI_PRIMARY_MODEL,
                 reason=f"Complex task: '{trigger}'" if trigger else f"Large context ({context_size} tokens)",
                 trigger_keyword=trigger,
                 context_size=context_size,
@@ -319,18 +615,13 @@ class ModelGateway:
 
     def _build_model(self, decision: RoutingDecision):
         """Build the actual LiteLLMModel instance with automatic fallback."""
-        from smolagents import LiteLLMModel
-
         # ── Cloud (Gemini) ────────────────────────────────────────
         if decision.tier == ModelTier.CLOUD:
             try:
                 print("🔀 ROUTING: Attempting Gemini Cloud (Multi-Model Chain)...")
-                model = LiteLLMModel(
-                    model_id=GEMINI_PRIMARY_MODEL,
-                    api_key=self.gemini_key,
-                    fallbacks=[{"model": m, "api_key": self.gemini_key} for m in GEMINI_FALLBACK_CHAIN]
-                )
-                logger.info(f"☁️  GATEWAY: Gemini ready → {GEMINI_PRIMARY_MODEL} (Chain: {len(GEMINI_FALLBACK_CHAIN)} fallbacks)")
+                chain = self.get_cloud_chain()
+                model = self._build_cloud_model()
+                logger.info(f"☁️  GATEWAY: Gemini ready → {chain[0] if chain else 'all circuits open'} (Chain: {max(len(chain) - 1, 0)} fallbacks)")
                 return model
             except Exception as e:
                 print(f"⚠️ CLOUD FAIL: {e}. Switching to Local...")
@@ -338,17 +629,15 @@ class ModelGateway:
                 # Fall through to local
 
         # ── Local (auto-detected model via Ollama) ────────────────
-        local_model = self.local_model_id
+        local_chain = self.get_local_chain()
+        local_model = local_chain[0] if local_chain else self.local_model_id
         if not local_model:
             if self.gemini_key and decision.tier != ModelTier.CLOUD:
                 print("⚠️ No local model. Trying Gemini Cloud...")
                 try:
-                    model = LiteLLMModel(
-                        model_id=GEMINI_PRIMARY_MODEL,
-                        api_key=self.gemini_key,
-                        fallbacks=[{"model": m, "api_key": self.gemini_key} for m in GEMINI_FALLBACK_CHAIN]
-                    )
-                    logger.info(f"☁️  GATEWAY: No local model → using Gemini (Chain: {len(GEMINI_FALLBACK_CHAIN)} fallbacks)")
+                    chain = self.get_cloud_chain()
+                    model = self._build_cloud_model()
+                    logger.info(f"☁️  GATEWAY: No local model → using Gemini (Chain: {len(chain) - 1} fallbacks)")
                     return model
                 except Exception as e:
                     logger.error(f"❌ Cloud fallback also failed: {e}")
@@ -361,10 +650,7 @@ class ModelGateway:
 
         print(f"🔀 ROUTING: Using Local {local_model}...")
         try:
-            model = LiteLLMModel(
-                model_id=local_model,
-                api_base=self.local_url,
-            )
+            model = self.get_pooled_model(local_model, api_base=self.local_url)
             logger.info(f"⚡ GATEWAY: Local model ready → {local_model}")
             return model
         except Exception as e:
@@ -372,12 +658,9 @@ class ModelGateway:
             if self.gemini_key:
                 print("⚠️ Local failed. Falling back to Gemini Cloud...")
                 try:
-                    model = LiteLLMModel(
-                        model_id=GEMINI_PRIMARY_MODEL,
-                        api_key=self.gemini_key,
-                        fallbacks=[{"model": m, "api_key": self.gemini_key} for m in GEMINI_FALLBACK_CHAIN]
-                    )
-                    logger.info(f"☁️  GATEWAY: Local failed → using Gemini (Chain: {len(GEMINI_FALLBACK_CHAIN)} fallbacks)")
+                    chain = self.get_cloud_chain()
+                    model = self._build_cloud_model()
+                    logger.info(f"☁️  GATEWAY: Local failed → using Gemini (Chain: {len(chain) - 1} fallbacks)")
                     return model
                 except Exception as cloud_err:
                     logger.error(f"❌ Cloud fallback also failed: {cloud_err}")
@@ -412,6 +695,17 @@ class ModelGateway:
     # OBSERVABILITY
     # ----------------------------------------------------------
 
+    def _record_decision(self, d: RoutingDecision):
+        """Append to the ring buffer and update counters/sketches in O(1)."""
+        with self._routing_lock:
+            self._routing_history.append(d)
+            self._routes_by_tier[d.tier] += 1
+            sketch = self._model_latency.get(d.model_id)
+            if sketch is None:
+                sketch = self._model_latency[d.model_id] = LatencySketch()
+        self._tier_latency[d.tier].add(d.latency_ms)
+        sketch.add(d.latency_ms)
+
     def _log_decision(self, d: RoutingDecision):
         """Log a routing decision for observability."""
         icon = "☁️ " if d.tier == ModelTier.CLOUD else "⚡"
@@ -422,11 +716,16 @@ class ModelGateway:
 
     def get_routing_stats(self) -> dict:
         """Return routing statistics for the /health endpoint."""
-        total = len(self._routing_history)
-        cloud = sum(1 for d in self._routing_history if d.tier == ModelTier.CLOUD)
-        local = total - cloud
+        from request_coalescer import request_coalescer
+        from hedged_chat import hedged_chat
+        with self._routing_lock:
+            cloud = self._routes_by_tier[ModelTier.CLOUD]
+            local = self._routes_by_tier[ModelTier.LOCAL]
+            model_sketches = dict(self._model_latency)
+        tier_latency = {tier.value: sketch.snapshot() for tier, sketch in self._tier_latency.items()}
+        total = cloud + local
         avg_latency = (
-            sum(d.latency_ms for d in self._routing_history) / total
+            (tier_latency["cloud"]["avg_ms"] * cloud + tier_latency["local"]["avg_ms"] * local) / total
             if total else 0
         )
         return {
@@ -434,9 +733,22 @@ class ModelGateway:
             "cloud_routes": cloud,
             "local_routes": local,
             "avg_latency_ms": round(avg_latency, 2),
+            "routing_latency": {
+                "tier": tier_latency,
+                "model": {model: sketch.snapshot() for model, sketch in model_sketches.items()},
+            },
             "gemini_key_present": bool(self.gemini_key),
             "local_model": self.local_model_id,
             "ollama_available": self._local_available,
+            "model_ranking": {
+                "cloud": [self._model_health_summary(m)
+                          for m in self.rank_models([GEMINI_PRIMARY_MODEL, *GEMINI_FALLBACK_CHAIN])],
+                "local": [self._model_health_summary(m) for m in self.rank_models(self.local_models_installed)],
+            },
+            "circuit_breakers": self._breakers.snapshot(),
+            "model_pool": self.get_pool_stats(),
+            "coalescing": request_coalescer.get_stats(),
+            "hedging": hedged_chat.get_stats(),
         }
 
     def select_model(self, *args, **kwargs):
@@ -456,6 +768,8 @@ def get_gateway() -> ModelGateway:
 def reinitialize_gateway() -> ModelGateway:
     """Force-recreate the gateway (picks up new .env keys)."""
     global _gateway_instance
+    if _gateway_instance is not None:
+        _gateway_instance.invalidate_model_pool()
     _gateway_instance = None
     return get_gateway()
 
@@ -496,4 +810,19 @@ if __name__ == "__main__":
         print(f"  {'✅' if ok else '❌'} '{query}' → {result} (expected {expected})")
 
     print(f"\n  Score: {correct}/{len(test_cases)}")
+
+    # ── Model pool micro-benchmark: fresh construction vs pooled lookup ──
+    N = 200
+    fallbacks = [{"model": m, "api_key": "bench-key"} for m in GEMINI_FALLBACK_CHAIN]
+    t0 = time.perf_counter()
+    for _ in range(N):
+        _tracked_model_class()(model_id=GEMINI_PRIMARY_MODEL, api_key="bench-key", fallbacks=fallbacks)
+    fresh_us = (time.perf_counter() - t0) / N * 1e6
+    t0 = time.perf_counter()
+    for _ in range(N):
+        gw.get_pooled_model(GEMINI_PRIMARY_MODEL, api_key="bench-key", cloud_chain=True)
+    pooled_us = (time.perf_counter() - t0) / N * 1e6
+    print(f"\n⏱️  Model construction: fresh={fresh_us:.1f}µs/call  pooled={pooled_us:.1f}µs/call "
+          f"({fresh_us / max(pooled_us, 1e-9):.0f}x)")
+
     print(f"  Stats: {gw.get_routing_stats()}")
@@ -0,0 +1,225 @@
+# ══════════════════════════════════════════════════════════════════
+# 🏁 Omni-IDE — Hedged Cloud/Local Racing (Lightweight Chat)
+# ══════════════════════════════════════════════════════════════════
+#
+#  Opt-in (OMNI_HEDGED_CHAT=1). The cloud request starts immediately; if
+#  it has not produced an answer after the hedge delay, the local Ollama
+#  request is launched in parallel. Whichever returns an acceptable answer
+#  first wins. A losing local call is cancelled; a losing cloud call is
+#  left to finish in the background so its latency is still sampled.
+#
+#  Hedge delay:
+#    OMNI_HEDGE_DELAY_MS set  →  fixed delay
+#    otherwise                →  p95 of recent cloud latencies: every
+#                                answered or timed-out cloud call counts,
+#                                won or lost, so slow answers are not
+#                                censored out of the estimate
+#                                (DEFAULT_HEDGE_DELAY_S until enough samples)
+#
+#  NOTE: cancelling the local loser cancels its asyncio task; a blocking
+#  litellm call already running in a worker thread cannot be interrupted
+#  and is simply abandoned (its result is discarded).
+#
+# ══════════════════════════════════════════════════════════════════
+
+import os
+import time
+import asyncio
+import logging
+import threading
+from collections import deque
+from typing import Any, Awaitable, Callable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+HEDGE_ENABLED_ENV = "OMNI_HEDGED_CHAT"
+HEDGE_DELAY_ENV = "OMNI_HEDGE_DELAY_MS"
+
+DEFAULT_HEDGE_DELAY_S = 2.0
+MIN_HEDGE_DELAY_S = 0.25
+MAX_HEDGE_DELAY_S = 30.0
+MIN_LATENCY_SAMPLES = 5
+
+
+class HedgedChatRunner:
+    """Races a cloud completion against a delayed local completion."""
+
+    def __init__(self, latency_window: int = 50):
+        self._lock = threading.Lock()
+        self._cloud_latencies_ms: deque = deque(maxlen=latency_window)
+        self._races = 0
+        self._hedges_launched = 0
+        self._wins = {"cloud": 0, "local": 0}
+        self._no_answer = 0
+        self._latency_saved_ms = 0.0
+        self._background: set = set()  # losing cloud calls still running
+
+    # ----------------------------------------------------------
+    # CONFIGURATION
+    # ----------------------------------------------------------
+
+    @staticmethod
+    def is_enabled() -> bool:
+        return os.getenv(HEDGE_ENABLED_ENV, "").strip().lower() in ("1", "true", "yes", "on")
+
+    def _p95_cloud_latency_s(self) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._cloud_latencies_ms)
+        if len(samples) < MIN_LATENCY_SAMPLES:
+            return None
+        idx = min(len(samples) - 1, int(round(0.95 * (len(samples) - 1))))
+        return samples[idx] / 1000.0
+
+    def hedge_delay_s(self) -> float:
+        """Configured delay, else p95 of recent cloud latency, clamped to sane bounds."""
+        raw = os.getenv(HEDGE_DELAY_ENV, "").strip()
+        delay = None
+        if raw:
+            try:
+                delay = float(raw) / 1000.0
+            except ValueError:
+                logger.warning(f"⚠️ HEDGE: Ignoring invalid {HEDGE_DELAY_ENV}={raw!r}")
+        if delay is None:
+            delay = self._p95_cloud_latency_s() or DEFAULT_HEDGE_DELAY_S
+        return max(MIN_HEDGE_DELAY_S, min(delay, MAX_HEDGE_DELAY_S))
+
+    def record_cloud_latency(self, latency_ms: float):
+        with self._lock:
+            self._cloud_latencies_ms.append(latency_ms)
+
+    @staticmethod
+    def _is_timeout(error: Optional[BaseException]) -> bool:
+        return error is not None and (
+            isinstance(error, asyncio.TimeoutError)
+            or "timeout" in type(error).__name__.lower()
+            or "timed out" in str(error).lower()
+        )
+
+    def _track_cloud(self, task: asyncio.Task, start: float):
+        """Sample the cloud call's latency when it finishes, whether it won, lost or timed out."""
+        def _done(t: asyncio.Task):
+            self._background.discard(t)
+            if t.cancelled():
+                return
+            if self._answer_of(t) is not None or self._is_timeout(t.exception()):
+                self.record_cloud_latency((time.perf_counter() - start) * 1000)
+        task.add_done_callback(_done)
+
+    # ----------------------------------------------------------
+    # RACE
+    # ----------------------------------------------------------
+
+    @staticmethod
+    def _answer_of(task: asyncio.Task) -> Optional[Any]:
+        """Return the response if the task finished with an acceptable answer, else None."""
+        if task.cancelled() or task.exception() is not None:
+            return None
+        resp = task.result()
+        try:
+            content = resp.choices[0].message.content
+        except Exception:
+            return None
+        return resp if content and content.strip() else None
+
+    async def race(
+        self,
+        cloud_call: Callable[[], Awaitable[Any]],
+        local_call: Callable[[], Awaitable[Any]],
+    ) -> Tuple[Optional[str], Any, Optional[BaseException]]:
+        """
+        Run the hedged race.
+
+        Returns (winning_tier, response, cloud_exception). winning_tier is
+        "cloud", "local" or None when neither tier produced an answer.
+        """
+        start = time.perf_counter()
+        delay = self.hedge_delay_s()
+        with self._lock:
+            self._races += 1
+
+        cloud_task = asyncio.ensure_future(cloud_call())
+        self._track_cloud(cloud_task, start)
+        local_task = None
+        local_start = None
+        cloud_end = None
+
+        await asyncio.wait({cloud_task}, timeout=delay)
+
+        if not (cloud_task.done() and self._answer_of(cloud_task) is not None):
+            local_start = time.perf_counter()
+            local_task = asyncio.ensure_future(local_call())
+            with self._lock:
+                self._hedges_launched += 1
+            logger.info(f"🏁 HEDGE: Cloud slower than {delay * 1000:.0f}ms — launching local in parallel.")
+
+        tiers = {cloud_task: "cloud"}
+        if local_task is not None:
+            tiers[local_task] = "local"
+
+        winner, response = None, None
+        pending = set(tiers)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            if cloud_task in done and cloud_end is None:
+                cloud_end = time.perf_counter()
+            for task in done:
+                answer = self._answer_of(task)
+                if answer is not None and winner is None:
+                    winner, response = tiers[task], answer
+            if winner:
+                break
+
+        # The local loser is cancelled. The cloud loser runs on: cancelling it
+        # would lose its latency sample, and it may be a coalesced call that
+        # other requests share.
+        for task in pending:
+            if task is cloud_task:
+                self._background.add(task)
+            else:
+                task.cancel()
+
+        cloud_exc = None
+        if cloud_task.done() and not cloud_task.cancelled():
+            cloud_exc = cloud_task.exception()
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with self._lock:
+            if winner is None:
+                self._no_answer += 1
+            else:
+                self._wins[winner] += 1
+            if winner == "local":
+                # Sequential would have waited for the cloud to finish or fail and
+                # only then started local: everything local did before that is saved.
+                reference = cloud_end if cloud_end is not None else time.perf_counter()
+                self._latency_saved_ms += max(0.0, (reference - local_start) * 1000)
+
+        logger.info(f"🏁 HEDGE: winner={winner or 'none'} in {elapsed_ms:.0f}ms (delay={delay * 1000:.0f}ms)")
+        return winner, response, cloud_exc
+
+    # ----------------------------------------------------------
+    # OBSERVABILITY
+    # ----------------------------------------------------------
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            races = self._races
+            wins = dict(self._wins)
+            saved = self._latency_saved_ms
+            stats = {
+                "enabled": self.is_enabled(),
+                "races": races,
+                "hedges_launched": self._hedges_launched,
+                "wins": wins,
+                "no_answer": self._no_answer,
+                "win_rate": {tier: round(n / races, 3) if races else 0.0 for tier, n in wins.items()},
+                "latency_saved_ms": round(saved, 1),
+                "avg_latency_saved_ms": round(saved / wins["local"], 1) if wins["local"] else 0.0,
+                "cloud_latency_samples": len(self._cloud_latencies_ms),
+                "cloud_in_background": len(self._background),
+            }
+        stats["hedge_delay_ms"] = round(self.hedge_delay_s() * 1000, 1)
+        return stats
+
+
+hedged_chat = HedgedChatRunner()
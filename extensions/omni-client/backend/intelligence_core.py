@@ -1,13 +1,59 @@
 import os
 import json
+import time
+import hashlib
 import fnmatch
-from typing import Dict, List, Optional
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
 from pathlib import Path
 
+# ------------------------------------------------------------------
+# PROCESS-WIDE CONTEXT CACHES
+# ------------------------------------------------------------------
+# IntelligenceCore is constructed per request and get_workspace_context()
+# is called several times per request. File heads are cached by
+# (path, mtime_ns, size, max_chars); rendered contexts are memoized per
+# (workspace, generation, max_files, max_chars_per_file). A workspace's
+# generation changes when invalidate_workspace_context() is called (agent
+# and UI writes) or when a metadata-only stat walk, done at most every
+# SNAPSHOT_TTL_S, sees a different tree.
+
+SNAPSHOT_TTL_S = 2.0
+MAX_HEAD_CACHE_ENTRIES = 4096
+MAX_RENDER_CACHE_ENTRIES = 32
+MAX_SIGNATURE_FILES = 5000
+
+_cache_lock = threading.Lock()
+_head_cache: "OrderedDict[Tuple[str, int, int, int], Tuple[str, Optional[str]]]" = OrderedDict()
+_render_cache: "OrderedDict[tuple, str]" = OrderedDict()
+_snapshots: Dict[str, dict] = {}  # workspace → {"generation", "signature", "checked_at"}
+_cache_stats = {"head_hits": 0, "head_misses": 0, "render_hits": 0, "render_misses": 0}
+
+
+def _workspace_key(workspace_dir) -> str:
+    return os.path.normcase(os.path.abspath(str(workspace_dir)))
+
+
+def invalidate_workspace_context(workspace_dir) -> None:
+    """Force the next context build for this workspace to re-check the tree."""
+    if not workspace_dir:
+        return
+    with _cache_lock:
+        snap = _snapshots.get(_workspace_key(workspace_dir))
+        if snap is not None:
+            snap["generation"] += 1
+            snap["checked_at"] = 0.0
+
+
+def get_context_cache_stats() -> dict:
+    with _cache_lock:
+        return {**_cache_stats, "head_entries": len(_head_cache), "render_entries": len(_render_cache)}
+
+
 class IntelligenceCore:
     def __init__(self, workspace_dir: str):
         self.workspace_dir = Path(workspace_dir) if workspace_dir else None
-        self.memory_file = self.workspace_dir / ".omni_memory.json" if self.workspace_dir else None
         self.tasks_file = self.workspace_dir / ".omni_tasks.json" if self.workspace_dir else None
 
     # ------------------------------------------------------------------
@@ -32,81 +78,280 @@ class IntelligenceCore:
                 pass
         return base_ignores
 
+    def iter_files(self, ignore_patterns: List[str]):
+        """Yield non-ignored files in os.walk order."""
+        for root, dirs, files in os.walk(self.workspace_dir):
+            # Apply ignores to directories
+            dirs[:] = [d for d in dirs if not any(fnmatch.fnmatch(d, pat) for pat in ignore_patterns)]
+            for file in files:
+                if not any(fnmatch.fnmatch(file, pat) for pat in ignore_patterns):
+                    yield Path(root) / file
+
+    def _tree_signature(self) -> str:
+        """Metadata-only fingerprint of the tree (paths, mtimes, sizes) — no file contents read."""
+        digest = hashlib.sha1()
+        gitignore = self.workspace_dir / '.gitignore'
+        try:
+            digest.update(str(gitignore.stat().st_mtime_ns).encode())
+        except OSError:
+            pass
+        for i, path in enumerate(self.iter_files(self._parse_gitignore())):
+            if i >= MAX_SIGNATURE_FILES:
+                break
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            digest.update(f"{path}\0{st.st_mtime_ns}\0{st.st_size}\n".encode("utf-8", "surrogateescape"))
+        return digest.hexdigest()
+
+    def workspace_generation(self) -> int:
+        """Current generation of this workspace; re-validated at most every SNAPSHOT_TTL_S."""
+        key = _workspace_key(self.workspace_dir)
+        now = time.monotonic()
+        with _cache_lock:
+            snap = _snapshots.setdefault(key, {"generation": 0, "signature": None, "checked_at": 0.0})
+            if now - snap["checked_at"] < SNAPSHOT_TTL_S:
+                return snap["generation"]
+        signature = self._tree_signature()
+        with _cache_lock:
+            if signature != snap["signature"]:
+                snap["generation"] += 1
+                snap["signature"] = signature
+            snap["checked_at"] = now
+            return snap["generation"]
+
+    @staticmethod
+    def _read_head(path: Path, max_chars: int) -> Tuple[str, Optional[str]]:
+        """("text", content) / ("binary", None) / ("error", None), cached by (path, mtime, size, max_chars)."""
+        try:
+            st = path.stat()
+        except OSError:
+            return "error", None
+        key = (str(path), st.st_mtime_ns, st.st_size, max_chars)
+        with _cache_lock:
+            cached = _head_cache.get(key)
+            if cached is not None:
+                _head_cache.move_to_end(key)
+                _cache_stats["head_hits"] += 1
+                return cached
+            _cache_stats["head_misses"] += 1
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                result = ("text", f.read(max_chars))
+        except UnicodeDecodeError:
+            result = ("binary", None)
+        except Exception:
+            return "error", None
+        with _cache_lock:
+            _head_cache[key] = result
+            while len(_head_cache) > MAX_HEAD_CACHE_ENTRIES:
+                _head_cache.popitem(last=False)
+        return result
+
     def get_workspace_context(self, max_files: int = 20, max_chars_per_file: int = 1500) -> str:
         """Returns a lightweight map and content snippets of the current workspace."""
         if not self.workspace_dir or not self.workspace_dir.exists():
             return "No workspace folder is currently open."
 
+        memo_key = (_workspace_key(self.workspace_dir), self.workspace_generation(), max_files, max_chars_per_file)
+        with _cache_lock:
+            rendered = _render_cache.get(memo_key)
+            if rendered is not None:
+                _render_cache.move_to_end(memo_key)
+                _cache_stats["render_hits"] += 1
+                return rendered
+            _cache_stats["render_misses"] += 1
+
         ignore_patterns = self._parse_gitignore()
         context_lines = ["--- WORKSPACE CONTEXT ---"]
-        
+
         file_count = 0
-        from pathlib import Path
-        for root, dirs, files in os.walk(self.workspace_dir):
-            # Apply ignores to directories
-            dirs[:] = [d for d in dirs if not any(fnmatch.fnmatch(d, pat) for pat in ignore_patterns)]
-            
-            for file in files:
-                if any(fnmatch.fnmatch(file, pat) for pat in ignore_patterns):
-                    continue
-                
-                if file_count >= max_files:
-                    context_lines.append(f"\n... (Truncated. More than {max_files} files mapped)")
-                    break
-                    
-                path = Path(root) / file
-                rel_path = path.relative_to(self.workspace_dir)
-                
-                try:
-                    with open(path, 'r', encoding='utf-8') as f:
-                        content = f.read(max_chars_per_file)
-                        trunc_mark = "...\n[TRUNCATED]" if len(content) == max_chars_per_file else ""
-                        context_lines.append(f"\n### File: {rel_path}\n```\n{content}{trunc_mark}\n```")
-                        file_count += 1
-                except UnicodeDecodeError:
-                    context_lines.append(f"\n### File: {rel_path}\n[Binary/Non-Text File Ignored]")
-                except Exception:
-                    pass
-            
+        for path in self.iter_files(ignore_patterns):
             if file_count >= max_files:
+                context_lines.append(f"\n... (Truncated. More than {max_files} files mapped)")
                 break
-                
+
+            rel_path = path.relative_to(self.workspace_dir)
+            kind, content = self._read_head(path, max_chars_per_file)
+            if kind == "text":
+                trunc_mark = "...\n[TRUNCATED]" if len(content) == max_chars_per_file else ""
+                context_lines.append(f"\n### File: {rel_path}\n```\n{content}{trunc_mark}\n```")
+                file_count += 1
+            elif kind == "binary":
+                context_lines.append(f"\n### File: {rel_path}\n[Binary/Non-Text File Ignored]")
+
+        rendered = "\n".join(context_lines)
+        with _cache_lock:
+            _render_cache[memo_key] = rendered
+            while len(_render_cache) > MAX_RENDER_CACHE_ENTRIES:
+                _render_cache.popitem(last=False)
+        return rendered
+
+    def get_repo_map(self, max_chars: int = 6000, paths: Optional[List[str]] = None) -> str:
+        """Compact outline (imports, classes, functions, signatures) of the workspace; `paths` first."""
+        if not self.workspace_dir or not self.workspace_dir.exists():
+            return "No workspace folder is currently open."
+        from symbol_index import get_symbol_index
+        index = get_symbol_index(str(self.workspace_dir))
+        index.refresh(self)
+        return index.render_repo_map(max_chars=max_chars, paths=paths)
+
+    def get_relevant_context(self, query: str, max_chunks: int = 8, max_chars: int = 12000,
+                             map_chars: int = 4000, request_summaries: bool = False) -> str:
+        """
+        Repo map plus the chunks that best match `query` (BM25), within `max_chars`.
+        Cached summaries of weaker matches are always shown; missing ones are only
+        queued for generation when `request_summaries` is set (/explain).
+        """
+        if not self.workspace_dir or not self.workspace_dir.exists():
+            return "No workspace folder is currently open."
+
+        from context_index import get_context_index
+        index = get_context_index(str(self.workspace_dir))
+        if not index.ensure_ready(self):
+            # First build still running in the background: plain head-of-file context meanwhile
+            return self.get_workspace_context(max_files=max(1, max_chars // 1500), max_chars_per_file=1200)
+        ranked = index.search(query, top_k=max_chunks * 4)
+        hits = ranked[:max_chunks]
+        if not hits:
+            # Nothing matched (e.g. "hi") — the outline alone is enough to orient the model
+            return f"--- WORKSPACE CONTEXT ---\n\n### Repo map\n```\n{self.get_repo_map(max_chars=map_chars)}\n```"
+
+        # Files that hold a hit lead the map so their outlines survive truncation
+        hit_files = list(dict.fromkeys(chunk.rel_path for _, chunk in hits))
+        repo_map = self.get_repo_map(max_chars=min(map_chars, max_chars // 2), paths=hit_files)
+        context_lines = ["--- WORKSPACE CONTEXT ---", f"\n### Repo map\n```\n{repo_map}\n```"]
+        budget = max_chars - sum(len(line) for line in context_lines)
+
+        # Weaker matches are shown as cached summaries rather than raw text
+        related = [p for p in dict.fromkeys(chunk.rel_path for _, chunk in ranked[max_chunks:])
+                   if p not in hit_files]
+        reserve = max_chars // 8 if related else 0
+
+        # Best chunks first until the budget is spent, then shown in file/line order.
+        # The index holds no file bodies: chosen chunks are read back from disk.
+        selected = []
+        for _, chunk in hits:
+            text = index.chunk_text(chunk)
+            if text is None:
+                continue  # file changed since indexing; the next refresh re-chunks it
+            cost = len(text) + len(chunk.rel_path) + 40
+            if cost > budget - reserve:
+                continue
+            selected.append((chunk, text))
+            budget -= cost
+        for chunk, text in sorted(selected, key=lambda s: (s[0].rel_path, s[0].start)):
+            context_lines.append(
+                f"\n### File: {chunk.rel_path} (lines {chunk.start}-{chunk.end})\n```\n{text}\n```"
+            )
+        summaries = self._summary_lines(related, budget, request_missing=request_summaries)
+        if summaries:
+            context_lines.append("\n### Related files (cached summaries)\n" + "\n".join(summaries))
+        return "\n".join(context_lines)
+
+    def _summary_lines(self, rel_paths: List[str], budget: int, request_missing: bool = False) -> List[str]:
+        """`- path: summary` lines for files with a cached summary; optionally queues the missing ones."""
+        from file_summaries import get_summary_store
+        store = get_summary_store(str(self.workspace_dir))
+        lines, missing = [], []
+        for rel_path in rel_paths:
+            summary = store.get(rel_path)
+            if summary is None:
+                missing.append(rel_path)
+                continue
+            line = f"- {rel_path}: {' '.join(summary.split())}"
+            if len(line) + 1 > budget:
+                continue
+            lines.append(line)
+            budget -= len(line) + 1
+        if request_missing:
+            store.request(missing)
+        return lines
+
+    def get_summarized_context(self, max_raw_files: int = 10, hot_files: int = 3,
+                               max_chars_per_file: int = 1500, summary_chars: int = 6000) -> str:
+        """
+        Whole-workspace view for reviews: raw heads for the most recently
+        modified (hot) files and for files without a summary yet, cached
+        summaries for everything else.
+        """
+        if not self.workspace_dir or not self.workspace_dir.exists():
+            return "No workspace folder is currently open."
+
+        from file_summaries import get_summary_store
+        store = get_summary_store(str(self.workspace_dir))
+        files = []
+        for path in self.iter_files(self._parse_gitignore()):
+            try:
+                files.append((path.stat().st_mtime_ns, path))
+            except OSError:
+                continue
+        hot = {path for _, path in sorted(files, key=lambda f: f[0], reverse=True)[:hot_files]}
+
+        raw_lines, summary_lines, missing = [], [], []
+        summary_budget = summary_chars
+        for _, path in sorted(files, key=lambda f: f[1]):
+            rel_path = path.relative_to(self.workspace_dir).as_posix()
+            summary = None if path in hot else store.get(rel_path)
+            if summary is not None:
+                line = f"- {rel_path}: {' '.join(summary.split())}"
+                if len(line) + 1 <= summary_budget:
+                    summary_lines.append(line)
+                    summary_budget -= len(line) + 1
+                continue
+            if path not in hot:
+                missing.append(rel_path)
+            if len(raw_lines) >= max_raw_files:
+                continue
+            kind, content = self._read_head(path, max_chars_per_file)
+            if kind == "text":
+                trunc_mark = "...\n[TRUNCATED]" if len(content) == max_chars_per_file else ""
+                raw_lines.append(f"\n### File: {rel_path}\n```\n{content}{trunc_mark}\n```")
+        store.request(missing)
+
+        context_lines = ["--- WORKSPACE CONTEXT ---", *raw_lines]
+        if summary_lines:
+            context_lines.append("\n### Other files (cached summaries)\n" + "\n".join(summary_lines))
         return "\n".join(context_lines)
 
     # ------------------------------------------------------------------
     # 2. LIGHTWEIGHT MEMORY SYSTEM (With Compaction)
     # ------------------------------------------------------------------
+    def memory_store(self):
+        """The workspace's SQLite memory store (see memory_store.py), or None without a workspace."""
+        if not self.workspace_dir or not self.workspace_dir.exists():
+            return None
+        from memory_store import get_memory_store
+        return get_memory_store(str(self.workspace_dir))
+
     def load_memory(self) -> dict:
-        if not self.memory_file or not self.memory_file.exists():
-            return {"preferences": "", "notes": [], "recent_fixes": []}
+        """Whole-document read kept for compatibility; prefer the store's row-level methods."""
         try:
-            with open(self.memory_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                # Ensure structure
-                if not isinstance(data, dict): data = {}
-                data.setdefault("preferences", "")
-                data.setdefault("notes", [])
-                data.setdefault("recent_fixes", [])
-                return data 
+            store = self.memory_store()
+            data = store.document() if store else {}
         except Exception:
-            # [RECOVERY] Memory read failure -> safe recreation
-            return {"preferences": "", "notes": [], "recent_fixes": []}
+            # [RECOVERY] Memory read failure -> safe defaults
+            data = {}
+        data.setdefault("preferences", "")
+        data.setdefault("notes", [])
+        data.setdefault("recent_fixes", [])
+        return data
 
     def save_memory(self, memory_data: dict):
-        if not self.memory_file: return
-        with open(self.memory_file, 'w', encoding='utf-8') as f:
-            json.dump(memory_data, f, indent=2)
+        """Whole-document write kept for compatibility; prefer the store's row-level methods."""
+        store = self.memory_store()
+        if store:
+            store.save_document(memory_data)
 
     def add_memory_note(self, note: str):
-        mem = self.load_memory()
-        mem["notes"].append(note)
-        
-        # [MEMORY COMPACTION] Retain only the 10 most recent chronological notes 
-        # to prevent .omni_memory.json ballooning and injecting context window faults.
-        if len(mem["notes"]) > 10:
-            mem["notes"] = mem["notes"][-10:]
-            
-        self.save_memory(mem)
+        store = self.memory_store()
+        if not store:
+            return
+        # [MEMORY COMPACTION] Retain only the 10 most recent chronological notes
+        # to prevent memory ballooning and injecting context window faults.
+        # Deferred: journaled now, written by the store's flusher off the request path.
+        store.append("notes", note, cap=10, defer=True)
 
     # ------------------------------------------------------------------
     # 3. SMART TASK GENERATION
@@ -126,9 +371,14 @@ class IntelligenceCore:
             json.dump(tasks, f, indent=2)
 
     def generate_task_prompt(self, user_request: str) -> str:
-        params = self.get_workspace_context()
+        repo_map = self.get_repo_map(max_chars=8000)
         return f"""
-{params}
+--- WORKSPACE CONTEXT ---
+
+### Repo map
+```
+{repo_map}
+```
 
 The user wants to plan this objective: "{user_request}"
 Analyze the workspace and generate a structured JSON array of tasks. 
@@ -143,8 +393,18 @@ Format:
     # ------------------------------------------------------------------
     # 4. ERROR ANALYZER (Autonomous Debugging)
     # ------------------------------------------------------------------
+    def get_debug_context(self, error_text: str, max_chars: int = 8000) -> str:
+        """Code the traceback points at (frames + enclosing functions); BM25 context when no frame is in the workspace."""
+        if not self.workspace_dir or not self.workspace_dir.exists():
+            return "No workspace folder is currently open."
+        from traceback_context import build_traceback_context
+        frames = build_traceback_context(error_text, str(self.workspace_dir), max_chars=max_chars)
+        if not frames:
+            return self.get_relevant_context(error_text, max_chunks=4, max_chars=max_chars, map_chars=2000)
+        return f"--- WORKSPACE CONTEXT (traceback frames, innermost first) ---\n\n{frames}"
+
     def build_debug_prompt(self, recent_error: str, code_snippet: str = "") -> str:
-        ctx = self.get_workspace_context(max_files=5, max_chars_per_file=1000)
+        ctx = self.get_debug_context(recent_error)
         return f"""
 {ctx}
 
@@ -169,7 +429,7 @@ Provide:
     # 5. CODE HEALTH ANALYZER
     # ------------------------------------------------------------------
     def build_health_prompt(self) -> str:
-        ctx = self.get_workspace_context(max_files=10)
+        ctx = self.get_summarized_context(max_raw_files=10)
         return f"""
 {ctx}
 
@@ -0,0 +1,269 @@
+# ══════════════════════════════════════════════════════════════════
+# 🧮 Omni-IDE — Local Intent Classifier
+# ══════════════════════════════════════════════════════════════════
+#
+#  Multinomial naive Bayes over hashed word uni/bi-grams, trained from:
+#    • routing decisions made by the LLM router   (weight 1)
+#    • /api/feedback ratings for module "router"  (👍 +1, 👎 removes it)
+#
+#  Everything lives in an append-only JSONL log next to the IDE config,
+#  so the model is rebuilt by replaying it at startup and updated
+#  incrementally afterwards — there is no separate training step. Once
+#  the log passes COMPACT_AFTER_RECORDS it is rewritten as one snapshot
+#  of the model plus the tracked decisions. Prediction is a handful of dict
+#  lookups (well under a millisecond); IntentRouter only falls back to
+#  the LLM when the posterior is below its confidence threshold.
+#
+# ══════════════════════════════════════════════════════════════════
+
+import json
+import math
+import os
+import re
+import threading
+import time
+import zlib
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import PORTABLE_ROOT
+
+logger = logging.getLogger(__name__)
+
+LEGACY_SAMPLES_FILE = ".omni_router_samples.jsonl"  # used to be relative to the CWD
+SAMPLES_FILE = str(PORTABLE_ROOT / LEGACY_SAMPLES_FILE)
+
+LABELS = ("Direct Execution", "Task Graph Planner", "Clarification Needed")
+
+HASH_BUCKETS = 1 << 18
+SMOOTHING_ALPHA = 1.0
+MIN_TRAINING_SAMPLES = 30       # total samples before the classifier answers at all
+MIN_CLASS_SAMPLES = 5           # ...and per predicted class
+MAX_TRACKED_DECISIONS = 2000    # recent decisions kept for feedback lookup
+FEEDBACK_MATCH_WINDOW_S = 3600  # label-based feedback matching looks back this far
+COMPACT_AFTER_RECORDS = 5000    # log lines before it is rewritten as a snapshot
+
+_TOKEN_RE = re.compile(r"[a-z0-9_]+")
+
+
+def _features(text: str) -> List[int]:
+    """Hashed word unigrams + bigrams (crc32 is stable across processes)."""
+    tokens = _TOKEN_RE.findall(text.lower())
+    grams = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    return [zlib.crc32(g.encode("utf-8")) % HASH_BUCKETS for g in grams]
+
+
+class IntentClassifier:
+    def __init__(self, filepath: str = SAMPLES_FILE):
+        self.filepath = filepath
+        self._lock = threading.Lock()
+        # label → {feature: weight}, label → total feature weight, label → doc weight
+        self._feature_counts: Dict[str, Dict[int, float]] = {label: {} for label in LABELS}
+        self._feature_totals: Dict[str, float] = {label: 0.0 for label in LABELS}
+        self._doc_counts: Dict[str, float] = {label: 0.0 for label in LABELS}
+        self._vocabulary: set = set()
+        # event_id → decision record (query, label, source, timestamp, weight, rated)
+        self._decisions: "OrderedDict[str, dict]" = OrderedDict()
+        self._records = 0  # lines in the log since the last snapshot
+        if filepath == SAMPLES_FILE and not os.path.exists(filepath) and os.path.exists(LEGACY_SAMPLES_FILE):
+            try:
+                os.replace(LEGACY_SAMPLES_FILE, filepath)
+            except OSError:
+                pass
+        self._load()
+        if self._records > COMPACT_AFTER_RECORDS:
+            with self._lock:
+                self._compact_locked()
+
+    # ----------------------------------------------------------
+    # PERSISTENCE
+    # ----------------------------------------------------------
+
+    def _load(self):
+        if not os.path.exists(self.filepath):
+            return
+        try:
+            with open(self.filepath, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                        if not isinstance(record, dict):
+                            continue
+                        if record.get("type") == "snapshot":
+                            self._apply_snapshot(record)
+                        elif record.get("type") == "decision":
+                            self._apply_decision(record)
+                        elif record.get("type") == "feedback":
+                            self._apply_feedback(record.get("event_id"), record.get("rating"))
+                    except (ValueError, TypeError, KeyError, AttributeError):
+                        continue  # malformed or partial line
+                    self._records += 1
+        except OSError as e:
+            logger.warning(f"⚠️ CLASSIFIER: Could not load {self.filepath}: {e}")
+
+    def _append_locked(self, record: dict):
+        # Called under the lock that applied the record, so a compaction
+        # can never snapshot a record and then see it appended again.
+        try:
+            with open(self.filepath, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record) + "\n")
+        except OSError as e:
+            logger.warning(f"⚠️ CLASSIFIER: Could not persist sample: {e}")
+            return
+        self._records += 1
+        if self._records > COMPACT_AFTER_RECORDS:
+            self._compact_locked()
+
+    def _apply_snapshot(self, record: dict):
+        for label in LABELS:
+            self._feature_counts[label] = {int(k): float(v) for k, v in record["feature_counts"].get(label, {}).items()}
+            self._feature_totals[label] = float(record["feature_totals"].get(label, 0.0))
+            self._doc_counts[label] = float(record["doc_counts"].get(label, 0.0))
+        self._vocabulary = set(record.get("vocabulary", []))
+        self._decisions = OrderedDict((event_id, entry) for event_id, entry in record.get("decisions", []))
+
+    def _compact_locked(self):
+        """Rewrite the log as a single snapshot of the trained model and tracked decisions."""
+        snapshot = {
+            "type": "snapshot",
+            "feature_counts": {label: {str(k): v for k, v in counts.items() if v}
+                               for label, counts in self._feature_counts.items()},
+            "feature_totals": self._feature_totals,
+            "doc_counts": self._doc_counts,
+            "vocabulary": sorted(self._vocabulary),
+            "decisions": list(self._decisions.items()),
+            "timestamp": time.time(),
+        }
+        tmp_path = self.filepath + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(json.dumps(snapshot) + "\n")
+            os.replace(tmp_path, self.filepath)
+            self._records = 1
+        except OSError as e:
+            logger.warning(f"⚠️ CLASSIFIER: Could not compact {self.filepath}: {e}")
+
+    # ----------------------------------------------------------
+    # TRAINING (incremental)
+    # ----------------------------------------------------------
+
+    def _train(self, query: str, label: str, weight: float):
+        counts = self._feature_counts[label]
+        for feature in _features(query):
+            new = max(0.0, counts.get(feature, 0.0) + weight)
+            self._feature_totals[label] += new - counts.get(feature, 0.0)
+            counts[feature] = new
+            self._vocabulary.add(feature)
+        self._doc_counts[label] = max(0.0, self._doc_counts[label] + weight)
+
+    def _apply_decision(self, record: dict):
+        label = record.get("label")
+        event_id = record.get("event_id")
+        if label not in LABELS or not event_id:
+            return
+        weight = 1.0 if record.get("source") == "llm" else 0.0
+        entry = {
+            "query": record.get("query", ""),
+            "label": label,
+            "timestamp": record.get("timestamp", 0.0),
+            "weight": weight,
+            "rated": False,
+        }
+        self._decisions[event_id] = entry
+        while len(self._decisions) > MAX_TRACKED_DECISIONS:
+            self._decisions.popitem(last=False)
+        if weight:
+            self._train(entry["query"], label, weight)
+
+    def _apply_feedback(self, event_id: Optional[str], rating: Optional[str]):
+        entry = self._decisions.get(event_id) if event_id else None
+        if entry is None or entry["rated"]:
+            return
+        entry["rated"] = True
+        # 👍 confirms the label, 👎 withdraws whatever the decision contributed
+        delta = 1.0 if rating == "up" else -entry["weight"]
+        if delta:
+            self._train(entry["query"], entry["label"], delta)
+            entry["weight"] += delta
+
+    def record_decision(self, event_id: str, query: str, label: str, source: str):
+        """Log a routing decision; only LLM decisions train the model directly."""
+        record = {
+            "type": "decision",
+            "event_id": event_id,
+            "query": query,
+            "label": label,
+            "source": source,
+            "timestamp": time.time(),
+        }
+        with self._lock:
+            self._apply_decision(record)
+            self._append_locked(record)
+
+    def _match_feedback(self, event_id: str, context: Dict[str, Any]) -> Optional[str]:
+        """Resolve feedback to a logged decision: exact event id, else latest unrated same-label decision."""
+        if event_id in self._decisions:
+            return event_id
+        hint = f"{context.get('intent') or ''} {context.get('summary') or ''}"
+        cutoff = time.time() - FEEDBACK_MATCH_WINDOW_S
+        for candidate_id in reversed(self._decisions):
+            entry = self._decisions[candidate_id]
+            if entry["timestamp"] < cutoff:
+                break
+            if not entry["rated"] and entry["label"] in hint:
+                return candidate_id
+        return None
+
+    def record_feedback(self, event_id: str, rating: str, context: Optional[Dict[str, Any]] = None) -> Optional[str]:
+        """Apply a router 👍/👎. Returns the matched decision's event id, if any."""
+        with self._lock:
+            matched = self._match_feedback(event_id, context or {})
+            if matched is None:
+                return None
+            self._apply_feedback(matched, rating)
+            self._append_locked({"type": "feedback", "event_id": matched, "rating": rating, "timestamp": time.time()})
+        return matched
+
+    # ----------------------------------------------------------
+    # PREDICTION
+    # ----------------------------------------------------------
+
+    def predict(self, query: str) -> Optional[Tuple[str, float]]:
+        """Return (label, posterior) or None while there is too little training data."""
+        features = _features(query)
+        with self._lock:
+            total_docs = sum(self._doc_counts.values())
+            if total_docs < MIN_TRAINING_SAMPLES or not features:
+                return None
+            vocab = max(len(self._vocabulary), 1)
+            log_scores = {}
+            for label in LABELS:
+                docs = self._doc_counts[label]
+                if docs < MIN_CLASS_SAMPLES:
+                    continue
+                counts = self._feature_counts[label]
+                denom = math.log(self._feature_totals[label] + SMOOTHING_ALPHA * vocab)
+                score = math.log(docs / total_docs)
+                for feature in features:
+                    score += math.log(counts.get(feature, 0.0) + SMOOTHING_ALPHA) - denom
+                log_scores[label] = score
+        if len(log_scores) < 2:
+            return None  # a single trained class would always look certain
+        best = max(log_scores, key=log_scores.get)
+        # Softmax over log scores for a normalised posterior
+        norm = sum(math.exp(s - log_scores[best]) for s in log_scores.values())
+        return best, 1.0 / norm
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {
+                "samples": {label: round(n, 1) for label, n in self._doc_counts.items()},
+                "vocabulary": len(self._vocabulary),
+                "tracked_decisions": len(self._decisions),
+                "ready": sum(self._doc_counts.values()) >= MIN_TRAINING_SAMPLES,
+            }
+
+
+# Singleton instance for the backend
+intent_classifier = IntentClassifier()
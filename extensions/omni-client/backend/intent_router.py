@@ -1,23 +1,31 @@
 # ══════════════════════════════════════════════════════════════════
 # 🧠 Omni-IDE — Intent Router (v2.0 — NO HuggingFace)
 # ══════════════════════════════════════════════════════════════════
-# Uses Gemini via LiteLLM for LLM-powered intent classification.
+# Cached routes (per workspace) and a local classifier answer without a
+# round trip;
+# otherwise Gemini via LiteLLM classifies the intent.
 # Falls back to keyword heuristics if LLM is unavailable.
 # ══════════════════════════════════════════════════════════════════
 
 import os
 import json
+import uuid
 import logging
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
 logger = logging.getLogger(__name__)
 
 from analytics_engine import analytics_engine
+from intent_classifier import intent_classifier
+from route_cache import get_route_cache
 
 
 class IntentRouter:
-    def __init__(self, confidence_threshold: float = 0.8):
+    def __init__(self, confidence_threshold: float = 0.8, classifier_threshold: float = 0.9,
+                 workspace_dir: Optional[str] = None):
         self.confidence_threshold = confidence_threshold
+        self.classifier_threshold = classifier_threshold
+        self.route_cache = get_route_cache(workspace_dir) if workspace_dir else None
         self.gemini_key = os.getenv("GEMINI_API_KEY")
 
         if not self.gemini_key:
@@ -43,8 +51,54 @@ SCHEMA:
     def route_intent(self, query: str) -> Dict[str, Any]:
         """
         Routes the user's query through the Intelligence Layer.
-        Uses Gemini via LiteLLM, falls back to heuristics.
+        Route cache first, then the local classifier, then Gemini via
+        LiteLLM, then heuristics.
+
+        Every result carries an `event_id` so router feedback can be tied
+        back to the decision (and train the local classifier).
         """
+        event_id = uuid.uuid4().hex
+        result = self._lookup_cache(query, event_id)
+        if result is None:
+            result = self._classify_locally(query) or self._route_with_llm(query)
+            # Only confident, model-made decisions are worth replaying
+            if (self.route_cache is not None and result.get("source") in ("llm", "classifier")
+                    and result["execution_path"] != "Clarification Needed"):
+                self.route_cache.put(query, result, event_id)
+        result["event_id"] = event_id
+        intent_classifier.record_decision(event_id, query, result["execution_path"], result.get("source", "llm"))
+        return result
+
+    def _lookup_cache(self, query: str, event_id: str) -> Optional[Dict[str, Any]]:
+        if self.route_cache is None:
+            return None
+        cached = self.route_cache.get(query, event_id)
+        if cached is None:
+            return None
+        cached["reason"] = f"Cached route — {cached.get('reason', '')}"
+        cached["source"] = "cache"
+        return cached
+
+    def _classify_locally(self, query: str) -> Optional[Dict[str, Any]]:
+        """Sub-millisecond answer from the learned classifier, or None when unsure."""
+        prediction = intent_classifier.predict(query)
+        if prediction is None or prediction[1] < self.classifier_threshold:
+            return None
+        label, confidence = prediction
+        analytics_engine.log_event("route_selected", {
+            "execution_path": label,
+            "confidence": confidence,
+            "source": "classifier"
+        })
+        return {
+            "execution_path": label,
+            "reason": f"Local classifier ({confidence:.0%} confident).",
+            "confidence": confidence,
+            "source": "classifier",
+            "raw_data": {"confidence_score": confidence}
+        }
+
+    def _route_with_llm(self, query: str) -> Dict[str, Any]:
         # If no Gemini key, skip LLM and go straight to heuristics
         if not self.gemini_key:
             return self._heuristic_fallback(query)
@@ -52,17 +106,12 @@ SCHEMA:
         messages = self._build_prompt(query)
 
         try:
-            import litellm
-            response = litellm.completion(
-                model="gemini/gemini-3.1-flash-lite-preview",
-                api_key=self.gemini_key,
+            from gateway import get_gateway
+            from request_coalescer import coalesced_completion
+            response = coalesced_completion(
+                **get_gateway().cloud_completion_kwargs(self.gemini_key),
                 messages=messages,
                 max_tokens=300,
-                fallbacks=[
-                    {"model": "gemini/gemini-3-flash-preview", "api_key": self.gemini_key},
-                    {"model": "gemini/gemini-2.5-flash-lite", "api_key": self.gemini_key},
-                    {"model": "gemini/gemini-flash-lite-latest", "api_key": self.gemini_key},
-                ]
             )
             raw_response = response.choices[0].message.content
 
@@ -96,6 +145,8 @@ SCHEMA:
             return {
                 "execution_path": "Clarification Needed",
                 "reason": f"Confidence score {score} falls below threshold {self.confidence_threshold}.",
+                "confidence": score,
+                "source": "llm",
                 "raw_data": parsed_data
             }
 
@@ -110,6 +161,8 @@ SCHEMA:
         result = {
             "execution_path": execution_path,
             "reason": reason,
+            "confidence": score,
+            "source": "llm",
             "raw_data": parsed_data
         }
 
@@ -135,11 +188,13 @@ SCHEMA:
                 "execution_path": "Task Graph Planner",
                 "reason": "Heuristic: Complex keywords detected (LLM unavailable).",
                 "confidence": 0.9,
+                "source": "heuristic",
                 "raw_data": {"confidence_score": 0.9}
             }
         return {
             "execution_path": "Direct Execution",
             "reason": "Heuristic: Simple query detected (LLM unavailable).",
             "confidence": 0.9,
+            "source": "heuristic",
             "raw_data": {"confidence_score": 0.9}
         }
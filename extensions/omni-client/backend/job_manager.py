@@ -0,0 +1,174 @@
+# ══════════════════════════════════════════════════════════════════
+# 🛠️ Omni-IDE — Background Jobs
+# ══════════════════════════════════════════════════════════════════
+#
+#  Dev servers, watchers and other long-running commands cannot go
+#  through `terminal()` (it blocks and kills after 120 s). The agent
+#  starts them with start_job(), checks them with job_output() and ends
+#  them with stop_job(); they keep running across agent steps and runs.
+#
+#  Output is kept in a bounded ring buffer per job, so a chatty server
+#  cannot grow memory without limit.
+#
+# ══════════════════════════════════════════════════════════════════
+
+import os
+import time
+import logging
+import threading
+import subprocess
+from collections import deque
+from typing import Callable, Dict, Optional, Tuple
+
+from cancellation import kill_process_tree, new_process_group_kwargs
+
+logger = logging.getLogger(__name__)
+
+MAX_JOBS = 5            # concurrently running
+MAX_TRACKED_JOBS = 20   # finished jobs are forgotten beyond this
+MAX_BUFFER_LINES = 2000
+MAX_LINE_CHARS = 2000
+DEFAULT_TAIL = 50
+
+
+class Job:
+    def __init__(self, job_id: str, command: str, proc: subprocess.Popen):
+        self.id = job_id
+        self.command = command
+        self.proc = proc
+        self.started_at = time.time()
+        self.lines: deque = deque(maxlen=MAX_BUFFER_LINES)
+        self.total_lines = 0
+        self._lock = threading.Lock()
+
+    def append(self, line: str):
+        with self._lock:
+            self.lines.append(line[:MAX_LINE_CHARS])
+            self.total_lines += 1
+
+    def tail(self, n: int) -> list:
+        with self._lock:
+            return list(self.lines)[-n:] if n > 0 else []
+
+    @property
+    def running(self) -> bool:
+        return self.proc.poll() is None
+
+    def status(self) -> str:
+        code = self.proc.poll()
+        return "running" if code is None else f"exited (code {code})"
+
+
+class JobManager:
+    """Background processes for one agent session (bounded count and output)."""
+
+    def __init__(self, cwd_provider: Callable[[], str],
+                 prepare: Optional[Callable[[str], Tuple[str, Optional[str]]]] = None):
+        self._cwd_provider = cwd_provider
+        # prepare(command) → (command to run, refusal message or None); TerminalTool.prepare
+        self._prepare = prepare
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+        self._counter = 0
+
+    def start_job(self, command: str) -> str:
+        """
+        Start `command` in the background without waiting for it. Returns a
+        message naming the new job id ("✅ Started job-N: ..."), or a "❌ ..."
+        refusal when the command is blocked or too many jobs are running.
+        """
+        if self._prepare is not None:
+            command, refusal = self._prepare(command)
+            if refusal:
+                return refusal
+        with self._lock:
+            running = [j for j in self._jobs.values() if j.running]
+            if len(running) >= MAX_JOBS:
+                return (f"❌ Too many background jobs ({len(running)} running). "
+                        f"Stop one first: {', '.join(j.id for j in running)}")
+            self._counter += 1
+            job_id = f"job-{self._counter}"
+
+        env = os.environ.copy()
+        env["PYTHONIOENCODING"] = "utf-8"
+        env["PYTHONUNBUFFERED"] = "1"
+        try:
+            proc = subprocess.Popen(
+                command,
+                shell=True,
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                text=True,
+                encoding="utf-8",
+                errors="replace",
+                cwd=self._cwd_provider(),
+                env=env,
+                **new_process_group_kwargs(),
+            )
+        except Exception as e:
+            return f"❌ Could not start job: {e}"
+
+        job = Job(job_id, command, proc)
+        with self._lock:
+            self._jobs[job_id] = job
+            finished = [k for k, j in self._jobs.items() if not j.running]
+            for key in finished[:max(0, len(self._jobs) - MAX_TRACKED_JOBS)]:
+                del self._jobs[key]
+        threading.Thread(target=self._pump, args=(job,), daemon=True).start()
+        logger.info(f"🛠️ JOBS: Started {job_id} (pid {proc.pid}) → {command}")
+        return f"✅ Started {job_id}: {command}\nUse job_output(\"{job_id}\") to check on it and stop_job(\"{job_id}\") to stop it."
+
+    @staticmethod
+    def _pump(job: Job):
+        for line in iter(job.proc.stdout.readline, ""):
+            job.append(line.rstrip("\r\n"))
+        job.proc.stdout.close()
+        job.proc.wait()
+
+    def _get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def job_output(self, job_id: str, tail: int = DEFAULT_TAIL) -> str:
+        """Last `tail` output lines of a job, plus its status."""
+        job = self._get(job_id)
+        if job is None:
+            with self._lock:
+                known = list(self._jobs)
+            return f"❌ Unknown job '{job_id}'. Known jobs: {', '.join(known) or 'none'}"
+        lines = job.tail(max(0, int(tail)))
+        dropped = job.total_lines - len(job.lines)
+        header = f"{job.id} [{job.status()}] {job.command}"
+        if dropped > 0:
+            header += f"\n(... {dropped} earlier lines dropped from buffer)"
+        body = "\n".join(lines) if lines else "(no output yet)"
+        return f"{header}\n{body}"
+
+    def stop_job(self, job_id: str) -> str:
+        """Kill a job and its child processes."""
+        job = self._get(job_id)
+        if job is None:
+            return f"❌ Unknown job '{job_id}'."
+        if job.running:
+            kill_process_tree(job.proc)
+            try:
+                job.proc.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                pass
+            logger.info(f"🛠️ JOBS: Stopped {job_id}")
+        return f"🛑 {job.id} {job.status()}"
+
+    def list_jobs(self) -> str:
+        with self._lock:
+            jobs = list(self._jobs.values())
+        if not jobs:
+            return "No background jobs."
+        return "\n".join(f"{j.id} [{j.status()}] {j.command}" for j in jobs)
+
+    def stop_all(self):
+        with self._lock:
+            jobs = list(self._jobs.values())
+        for job in jobs:
+            if job.running:
+                kill_process_tree(job.proc)
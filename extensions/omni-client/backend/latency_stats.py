@@ -0,0 +1,119 @@
+# ══════════════════════════════════════════════════════════════════
+# 📈 Omni-IDE — Streaming Latency Percentiles
+# ══════════════════════════════════════════════════════════════════
+#
+#  Constant-memory p50/p95/p99 estimates using the P² algorithm
+#  (Jain & Chlamtac, 1985): five markers per quantile are nudged toward
+#  their ideal positions on every observation, so no samples are kept
+#  and reading a percentile is O(1).
+#
+# ══════════════════════════════════════════════════════════════════
+
+import threading
+from typing import Optional
+
+DEFAULT_QUANTILES = (0.5, 0.95, 0.99)
+
+
+class P2Quantile:
+    """Single-quantile P² estimator."""
+
+    def __init__(self, p: float):
+        self.p = p
+        self._initial: list[float] = []
+        self._heights: list[float] = []
+        self._positions = [0, 1, 2, 3, 4]
+        self._desired = [0.0, 2 * p, 4 * p, 2 + 2 * p, 4.0]
+        self._increments = [0.0, p / 2, p, (1 + p) / 2, 1.0]
+
+    def add(self, x: float):
+        if not self._heights:
+            self._initial.append(x)
+            if len(self._initial) == 5:
+                self._heights = sorted(self._initial)
+            return
+
+        q, n = self._heights, self._positions
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        else:
+            k = next(i for i in range(4) if q[i] <= x < q[i + 1])
+
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self._desired[i] += self._increments[i]
+
+        # Move the three middle markers toward their desired positions
+        for i in (1, 2, 3):
+            d = self._desired[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                step = 1 if d > 0 else -1
+                candidate = self._parabolic(i, step)
+                if not q[i - 1] < candidate < q[i + 1]:
+                    candidate = self._linear(i, step)
+                q[i] = candidate
+                n[i] += step
+
+    def _parabolic(self, i: int, d: int) -> float:
+        q, n = self._heights, self._positions
+        return q[i] + d / (n[i + 1] - n[i - 1]) * (
+            (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+            + (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1])
+        )
+
+    def _linear(self, i: int, d: int) -> float:
+        q, n = self._heights, self._positions
+        return q[i] + d * (q[i + d] - q[i]) / (n[i + d] - n[i])
+
+    def value(self) -> Optional[float]:
+        if self._heights:
+            return self._heights[2]
+        if not self._initial:
+            return None
+        # Fewer than five samples: exact nearest-rank on what we have
+        ordered = sorted(self._initial)
+        return ordered[min(len(ordered) - 1, int(round(self.p * (len(ordered) - 1))))]
+
+
+class LatencySketch:
+    """Thread-safe count/mean/min/max plus streaming p50/p95/p99."""
+
+    def __init__(self, quantiles=DEFAULT_QUANTILES):
+        self._lock = threading.Lock()
+        self._estimators = {p: P2Quantile(p) for p in quantiles}
+        self.count = 0
+        self.total = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+
+    def add(self, latency_ms: float):
+        with self._lock:
+            self.count += 1
+            self.total += latency_ms
+            self.min = latency_ms if self.min is None else min(self.min, latency_ms)
+            self.max = latency_ms if self.max is None else max(self.max, latency_ms)
+            for estimator in self._estimators.values():
+                estimator.add(latency_ms)
+
+    def quantile(self, p: float) -> Optional[float]:
+        with self._lock:
+            estimator = self._estimators.get(p)
+            return estimator.value() if estimator else None
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            snap = {
+                "count": self.count,
+                "avg_ms": round(self.total / self.count, 2) if self.count else 0.0,
+                "min_ms": round(self.min, 2) if self.min is not None else None,
+                "max_ms": round(self.max, 2) if self.max is not None else None,
+            }
+            for p, estimator in self._estimators.items():
+                value = estimator.value()
+                snap[f"p{round(p * 100):d}_ms"] = round(value, 2) if value is not None else None
+            return snap
@@ -9,7 +9,7 @@ if sys.platform == "win32":
     except Exception:
         pass
 
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Body, Header
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Body, Header, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
@@ -19,6 +19,7 @@ import json
 import os
 import shutil
 from session_manager import session_manager
+from intelligence_core import invalidate_workspace_context
 import subprocess
 import aiofiles
 from pathlib import Path
@@ -129,6 +130,7 @@ class ChatRequest(BaseModel):
     terminalHint: str | None = None
     filePath: str | None = None
     projectPath: str | None = None
+    sessionId: str | None = None  # agent pool key; omitted → shared "default" session
 
 class ChangeDirRequest(BaseModel):
     path: str
@@ -486,6 +488,7 @@ async def save_file(filename: str, request: CodeRequest):
 
         async with aiofiles.open(file_path, mode='w', encoding='utf-8') as f:
             await f.write(request.code)
+        invalidate_workspace_context(WORKING_DIRECTORY)
 
         logger.info(f"Saved: {file_path}")
         return {"status": "saved", "path": str(file_path)}
@@ -515,6 +518,7 @@ async def delete_file(filename: str):
             os.remove(file_path)
         elif file_path.is_dir():
             shutil.rmtree(file_path)
+        invalidate_workspace_context(WORKING_DIRECTORY)
 
         logger.info(f"Deleted: {file_path}")
         return {"status": "deleted", "filename": filename}
@@ -608,8 +612,8 @@ async def get_active_sessions():
     global WORKING_DIRECTORY
     if not WORKING_DIRECTORY:
         return []
-    from diff_staging_layer import DiffStagingLayer
-    layer = DiffStagingLayer(WORKING_DIRECTORY)
+    from diff_staging_layer import get_staging_layer
+    layer = get_staging_layer(WORKING_DIRECTORY)
     return layer.get_active_sessions()
 
 @app.get("/api/patch/{session_id}")
@@ -617,8 +621,8 @@ async def fetch_patch(session_id: str):
     global WORKING_DIRECTORY
     if not WORKING_DIRECTORY:
         raise HTTPException(status_code=400, detail="No folder is open.")
-    from diff_staging_layer import DiffStagingLayer
-    layer = DiffStagingLayer(WORKING_DIRECTORY)
+    from diff_staging_layer import get_staging_layer
+    layer = get_staging_layer(WORKING_DIRECTORY)
     result = layer.get_patch(session_id)
     if "error" in result:
         return {"error": result["error"]}
@@ -629,9 +633,10 @@ async def apply_patch(session_id: str):
     global WORKING_DIRECTORY
     if not WORKING_DIRECTORY:
         raise HTTPException(status_code=400, detail="No folder is open.")
-    from diff_staging_layer import DiffStagingLayer
-    layer = DiffStagingLayer(WORKING_DIRECTORY)
+    from diff_staging_layer import get_staging_layer
+    layer = get_staging_layer(WORKING_DIRECTORY)
     result = layer.apply_patch(session_id)
+    invalidate_workspace_context(WORKING_DIRECTORY)
     if "error" in result:
         return {"error": result["error"]}
     return result
@@ -641,8 +646,8 @@ async def discard_patch(session_id: str):
     global WORKING_DIRECTORY
     if not WORKING_DIRECTORY:
         raise HTTPException(status_code=400, detail="No folder is open.")
-    from diff_staging_layer import DiffStagingLayer
-    layer = DiffStagingLayer(WORKING_DIRECTORY)
+    from diff_staging_layer import get_staging_layer
+    layer = get_staging_layer(WORKING_DIRECTORY)
     result = layer.discard_patch(session_id)
     if "error" in result:
         return {"error": result["error"]}
@@ -978,12 +983,13 @@ async def save_key(request: APIKeyRequest):
 
     # 5. Re-initialize the agent with the new key
     try:
-        global _agent_instance, _agent_module, _OmniAgent_class
+        global _agent_module, _OmniAgent_class
         if _agent_module is not None:
             import importlib
             importlib.reload(_agent_module)
             _OmniAgent_class = _agent_module.OmniAgent
-        _agent_instance = _OmniAgent_class() if _OmniAgent_class else None
+        # Pooled agents were built with the old key — rebuild lazily on next request
+        _agent_pool.clear()
         logger.info("Agent re-initialized with new API key.")
     except Exception as e:
         logger.warning(f"Agent reload after key save failed: {e}")
@@ -996,7 +1002,26 @@ async def save_key(request: APIKeyRequest):
 # On fresh machines, smolagents + litellm take 7+ seconds to import.
 _agent_module = None
 _OmniAgent_class = None
-_agent_instance = None
+
+from agent_pool import AgentPool
+
+def _create_agent(workspace=None):
+    _dbg(
+        hypothesis_id="H0",
+        location="backend/main.py:get_agent",
+        message="Constructing OmniAgent lazily",
+        data={"workspace": workspace},
+    )
+    return _OmniAgent_class(working_directory=workspace)
+
+# One OmniAgent per (session, workspace): concurrent chats no longer share
+# a CodeAgent, its memory or its model swap.
+_agent_pool = AgentPool(_create_agent)
+
+@app.on_event("shutdown")
+def _close_agent_pool():
+    """Stop every pooled agent's persistent shell and background jobs on server exit."""
+    _agent_pool.close_all()
 
 def _ensure_agent_imports():
     """Lazy-load the heavy agent module. Called only when first request arrives."""
@@ -1019,19 +1044,21 @@ def _ensure_agent_imports():
         _set_agent_status("error", f"Agent error: {e}", 0)
         return False
 
-def get_agent():
-    global _agent_instance
-    if _agent_instance is None:
-        if not _ensure_agent_imports():
-            return None
-        _dbg(
-            hypothesis_id="H0",
-            location="backend/main.py:get_agent",
-            message="Constructing OmniAgent lazily",
-            data={},
-        )
-        _agent_instance = _OmniAgent_class()
-    return _agent_instance
+def get_agent(session_id: str | None = None, workspace: str | None = None):
+    """Pooled OmniAgent for this session + workspace (None while the agent module can't load)."""
+    if not _ensure_agent_imports():
+        return None
+    return _agent_pool.get(session_id, workspace)
+
+def checkout_agent(session_id: str | None = None, workspace: str | None = None, blocking: bool = True):
+    """
+    Like get_agent(), but with the agent's run_lock already held (see
+    AgentPool.checkout); None also when not blocking and the agent is busy.
+    Release with _agent_pool.checkin(agent).
+    """
+    if not _ensure_agent_imports():
+        return None
+    return _agent_pool.checkout(session_id, workspace, blocking=blocking)
 
 # Background pre-loader: starts importing agent module right after server boots
 def _background_preload():
@@ -1067,19 +1094,34 @@ def _is_action_task(text: str) -> bool:
     # Check for action keywords (substring match is safer than exact word set)
     return any(keyword in text_lower for keyword in _ACTION_KEYWORDS)
 
+# How often a running agent request checks whether its client is still there
+DISCONNECT_POLL_SECONDS = 1.0
+
 @app.post("/api/chat")
-async def chat_endpoint(request: ChatRequest, x_gemini_key: str | None = Header(default=None, alias="X-Gemini-Key")):
+async def chat_endpoint(request: ChatRequest, raw_request: Request, x_gemini_key: str | None = Header(default=None, alias="X-Gemini-Key")):
     """Smart Chat — lightweight for conversation, full agent for code tasks."""
     global WORKING_DIRECTORY
     user_message = request.text
-    agent = get_agent()
-    if agent is None:
-        # Agent not loaded yet (deps installing or import error)
-        with _agent_status_lock:
-            status_msg = _agent_status.get("message", "Agent is starting up...")
-        return {"response": f"\u23f3 {status_msg} Please try again in a moment."}
+    # Check both the old field names (workspacePath/fileName) and new field names (projectPath/filePath)
+    workspace_path = request.projectPath or request.workspacePath
+    file_path = request.filePath or request.fileName
+    workspace = workspace_path if workspace_path and workspace_path != "No Folder Opened" else WORKING_DIRECTORY
+
+    # ── READ-ONLY FAST PATH (list / show / tree straight from disk) ──
+    # Runs before the agent and the lightweight-chat gate: "file tree" or
+    # "what's in folder src" carry no action keyword but need no LLM either.
+    from readonly_fastpath import try_readonly_fastpath
+    fast_answer = await asyncio.to_thread(try_readonly_fastpath, request.text, workspace)
+    if fast_answer is not None:
+        if workspace_path and workspace_path != "No Folder Opened":
+            WORKING_DIRECTORY = workspace_path
+        return {"response": fast_answer}
+
     try:
-        # Smart gateway refresh — only reinitialize if API key changed
+        # Smart gateway refresh — only reinitialize if API key changed.
+        # The agent is only built further down, on the agent path; this
+        # remembers what it has to pick up from the refresh.
+        gateway_refresh = None
         try:
             from gateway import get_gateway, reinitialize_gateway
             current_gw = get_gateway()
@@ -1097,35 +1139,19 @@ async def chat_endpoint(request: ChatRequest, x_gemini_key: str | None = Header(
                 except Exception as save_err:
                     logger.warning(f"⚠️ Could not save key to .env: {save_err}")
 
-                gw = reinitialize_gateway()
-
-                # Re-create agent if specifically needed (e.g. init error existed)
-                if agent._init_error or agent.agent is None:
-                    global _agent_instance
-                    _agent_instance = _OmniAgent_class() if _OmniAgent_class else None
-                    agent = _agent_instance
-                    logger.info("✅ OmniAgent re-created with valid Gemini key.")
-                else:
-                    # Gateway proxy (imported in agent.py) already points to the new gw instance
-                    # but we update the instance attribute just to be safe
-                    agent.gateway = gw
+                gateway_refresh = ("key_changed", reinitialize_gateway())
             elif new_key and not current_gw.gemini_key:
                 # Key exists in header but gateway missed it — force set
                 os.environ["GEMINI_API_KEY"] = new_key
                 gw = reinitialize_gateway()
                 if _agent_module:
                     _agent_module.model_gateway = gw
-                if hasattr(agent, 'gateway'):
-                    agent.gateway = gw
+                gateway_refresh = ("key_injected", gw)
                 logger.info("🔑 GATEWAY: Key injected from header — agent now uses Gemini.")
         except Exception as gw_err:
             logger.warning(f"Gateway reinit: {gw_err}")
 
         # ── CONTEXT INJECTION ──
-        # Check both the old field names (workspacePath/fileName) and new field names (projectPath/filePath)
-        workspace_path = request.projectPath or request.workspacePath
-        file_path = request.filePath or request.fileName
-
         if request.context or workspace_path or request.terminalHint or file_path:
             context_pieces = []
             if workspace_path and workspace_path != "No Folder Opened":
@@ -1141,8 +1167,10 @@ async def chat_endpoint(request: ChatRequest, x_gemini_key: str | None = Header(
         # ── LIGHTWEIGHT CHAT (greetings, questions, conversation) ──
         if not _is_action_task(request.text):  # check original text for action
             logger.info(f"💬 LIGHTWEIGHT CHAT: {request.text[:50]}")
-            import litellm
             from gateway import get_gateway
+            from circuit_breaker import classify_error
+            from request_coalescer import coalesced_completion_async
+            from hedged_chat import hedged_chat
             gw = get_gateway()
 
             messages = [
@@ -1158,30 +1186,67 @@ async def chat_endpoint(request: ChatRequest, x_gemini_key: str | None = Header(
 
             # 1. ATTEMPT CLOUD (Gemini)
             api_key_to_use = x_gemini_key or os.environ.get("GEMINI_API_KEY")
+            cloud_error = None
             if api_key_to_use:
                 logger.info(f"🔑 GATEWAY: Using key from {'VS Code Header' if x_gemini_key else 'Environment Variable'}")
-                try:
-                    resp = litellm.completion(
-                        model="gemini/gemini-3.1-flash-lite-preview",
-                        api_key=api_key_to_use,
+
+                async def _cloud_call():
+                    # Chain order comes from the gateway's live model health ranking;
+                    # raises CircuitOpenError at once when every cloud circuit is open.
+                    return await coalesced_completion_async(
+                        **gw.cloud_completion_kwargs(api_key_to_use),
                         messages=messages,
                         timeout=30,
                         max_tokens=2048,
-                        fallbacks=[
-                            {"model": "gemini/gemini-3-flash-preview", "api_key": api_key_to_use},
-                            {"model": "gemini/gemini-2.5-flash-lite", "api_key": api_key_to_use},
-                            {"model": "gemini/gemini-flash-lite-latest", "api_key": api_key_to_use},
-                        ]
                     )
-                    return {"response": resp.choices[0].message.content}
-                except litellm.RateLimitError as rate_err:
-                    logger.warning(f"⚠️ Cloud Quota Exceeded: {rate_err}")
-                    cloud_error = "QUOTA_EXCEEDED"
-                except Exception as cloud_err:
-                    logger.warning(f"⚠️ Cloud Failed ({cloud_err}).")
-                    cloud_error = "INVALID_KEY"
-            else:
-                cloud_error = None
+
+                if hedged_chat.is_enabled():
+                    # ── HEDGED MODE: race cloud against a delayed local request ──
+                    async def _local_call():
+                        if not await asyncio.to_thread(is_ollama_running):
+                            raise RuntimeError("Ollama offline")
+                        local_kwargs = gw.local_completion_kwargs()
+                        local_name = local_kwargs["model"].split("/", 1)[-1]
+                        if not await asyncio.to_thread(is_model_installed, local_name):
+                            gw.release_models([local_kwargs["model"]])
+                            raise RuntimeError(f"Model {local_name} missing")
+                        return await coalesced_completion_async(
+                            **local_kwargs,
+                            messages=messages,
+                            max_tokens=2048
+                        )
+
+                    winner, resp, cloud_exc = await hedged_chat.race(_cloud_call, _local_call)
+                    if cloud_exc is not None:
+                        logger.warning(f"⚠️ Cloud Failed during hedge ({cloud_exc}).")
+                        cloud_error = (
+                            "QUOTA_EXCEEDED" if classify_error(cloud_exc) in ("rate_limit", "circuit_open")
+                            else "INVALID_KEY"
+                        )
+                    if winner == "cloud":
+                        return {"response": resp.choices[0].message.content, "served_by": "cloud"}
+                    if winner == "local":
+                        return {
+                            "response": "🤖 [Local Mode] " + resp.choices[0].message.content,
+                            "served_by": "local",
+                            "cloud_status": "error" if cloud_error else "ok",
+                            "cloud_error": cloud_error
+                        }
+                    # Neither tier answered — fall through to local diagnostics below
+                    cloud_error = cloud_error or "INVALID_KEY"
+                else:
+                    try:
+                        cloud_start = time.perf_counter()
+                        resp = await _cloud_call()
+                        hedged_chat.record_cloud_latency((time.perf_counter() - cloud_start) * 1000)
+                        return {"response": resp.choices[0].message.content}
+                    except Exception as cloud_err:
+                        if classify_error(cloud_err) in ("rate_limit", "circuit_open"):
+                            logger.warning(f"⚠️ Cloud Quota Exceeded: {cloud_err}")
+                            cloud_error = "QUOTA_EXCEEDED"
+                        else:
+                            logger.warning(f"⚠️ Cloud Failed ({cloud_err}).")
+                            cloud_error = "INVALID_KEY"
 
             # 2. INSTANT LOCAL FAILOVER (Ollama)
             # CHECK OLLAMA STATUS BEFORE ATTEMPTING
@@ -1194,21 +1259,29 @@ async def chat_endpoint(request: ChatRequest, x_gemini_key: str | None = Header(
                     "cloud_error": cloud_error
                 }
 
-            if not is_model_installed("qwen2.5-coder:3b"):
-                logger.warning("⚠️ GATEWAY: Model qwen2.5-coder:3b is missing.")
+            try:
+                # Best local model by capability tier and live health (not a fixed 3B)
+                local_kwargs = gw.local_completion_kwargs()
+            except Exception as local_err:
+                logger.error(f"Local failover error: {local_err}")
+                return {"response": f"🚨 All engines failed: {str(local_err)}"}
+            local_name = local_kwargs["model"].split("/", 1)[-1]
+
+            if not is_model_installed(local_name):
+                gw.release_models([local_kwargs["model"]])
+                logger.warning(f"⚠️ GATEWAY: Model {local_name} is missing.")
                 return {
                     "error_type": "model_missing",
-                    "response": "🤖 **Model Missing**\n\nThe required local model 'qwen2.5-coder:3b' is not installed.",
-                    "command": "ollama run qwen2.5-coder:3b",
+                    "response": f"🤖 **Model Missing**\n\nThe required local model '{local_name}' is not installed.",
+                    "command": f"ollama run {local_name}",
                     "cloud_status": "error" if cloud_error else "ok",
                     "cloud_error": cloud_error
                 }
 
             try:
-                local_response = litellm.completion(
-                    model="ollama/qwen2.5-coder:3b",
+                local_response = await coalesced_completion_async(
+                    **local_kwargs,
                     messages=messages,
-                    api_base="http://localhost:11434",
                     max_tokens=2048
                 )
                 return {
@@ -1223,53 +1296,104 @@ async def chat_endpoint(request: ChatRequest, x_gemini_key: str | None = Header(
         # ── FULL AGENT (code tasks, file operations, commands) ──
         logger.info(f"🤖 FULL AGENT: {user_message[:50]}")
 
-        # Give the agent writing powers by setting working directory to the injected projectPath
+        # Keep the UI's file APIs on the injected projectPath; the agent itself
+        # is already bound to `workspace` (no module globals are touched).
         if workspace_path and workspace_path != "No Folder Opened":
             WORKING_DIRECTORY = workspace_path
 
-        if not WORKING_DIRECTORY:
+        if not workspace:
             return {"response": "🛑 **Workspace Missing**\n\nPlease click **'Open Folder'** first or open a workspace in VS Code so I can work with your files."}
 
-        _agent_module.WORKING_DIRECTORY = WORKING_DIRECTORY
-        logger.info(f"Agent will write files to: {WORKING_DIRECTORY}")
+        # Build (or fetch) the pooled agent only now, off the event loop:
+        # importing the agent module and constructing an OmniAgent take seconds.
+        agent = await asyncio.to_thread(get_agent, request.sessionId, workspace)
+        if agent is None:
+            # Agent not loaded yet (deps installing or import error)
+            with _agent_status_lock:
+                status_msg = _agent_status.get("message", "Agent is starting up...")
+            return {"response": f"\u23f3 {status_msg} Please try again in a moment."}
+
+        if gateway_refresh is not None:
+            refresh_kind, gw = gateway_refresh
+            if refresh_kind == "key_changed" and (agent._init_error or agent.agent is None):
+                # Re-create agent if specifically needed (e.g. init error existed)
+                new_agent = await asyncio.to_thread(_OmniAgent_class, working_directory=agent.working_directory)
+                _agent_pool.replace(agent, new_agent)
+                agent = new_agent
+                logger.info("✅ OmniAgent re-created with valid Gemini key.")
+            elif hasattr(agent, 'gateway'):
+                # Gateway proxy (imported in agent.py) already points to the new gw instance
+                # but we update the instance attribute just to be safe
+                agent.gateway = gw
+
+        logger.info(f"Agent will write files to: {workspace}")
 
         full_response = ""
+        from cancellation import CancellationToken, active_runs
+        cancel_token = CancellationToken()
+        active_runs.register(request.sessionId, cancel_token)
 
         def _run_agent_sync(message):
             """Run the agent in a sync context (for thread executor)."""
             result = ""
-            current_agent = get_agent()
+            # One run at a time per pooled agent; other sessions proceed in parallel.
+            # Checked out afresh (lock held) in case the pool evicted `agent` meanwhile.
+            run_agent = _agent_pool.checkout(request.sessionId, workspace)
             try:
-                response_generator = current_agent.execute_stream(message)
-                for token in response_generator:
-                    if isinstance(token, dict):
-                        continue
-                    result += str(token)
-            except TypeError:
-                # Fallback for async generators
-                import asyncio
-                loop = asyncio.new_event_loop()
-                async def _collect():
-                    r = ""
-                    current_agent = get_agent()
-                    async for token in current_agent.execute_stream(message):
+                try:
+                    response_generator = run_agent.execute_stream(message, cancel_token=cancel_token)
+                    for token in response_generator:
                         if isinstance(token, dict):
                             continue
-                        r += str(token)
-                    return r
-                result = loop.run_until_complete(_collect())
-                loop.close()
+                        result += str(token)
+                except TypeError:
+                    # Fallback for async generators
+                    import asyncio
+                    loop = asyncio.new_event_loop()
+                    async def _collect():
+                        r = ""
+                        async for token in run_agent.execute_stream(message, cancel_token=cancel_token):
+                            if isinstance(token, dict):
+                                continue
+                            r += str(token)
+                        return r
+                    result = loop.run_until_complete(_collect())
+                    loop.close()
+            finally:
+                # Closes the agent if the pool dropped it while this run was going
+                _agent_pool.checkin(run_agent)
             return result
 
+        # Run agent in a thread so uvicorn event loop stays responsive
+        run = asyncio.ensure_future(asyncio.wait_for(
+            asyncio.to_thread(_run_agent_sync, user_message),
+            timeout=600  # 10-minute hard timeout
+        ))
         try:
-            # Run agent in a thread so uvicorn event loop stays responsive
-            full_response = await asyncio.wait_for(
-                asyncio.to_thread(_run_agent_sync, user_message),
-                timeout=600  # 10-minute hard timeout
-            )
+            # uvicorn doesn't cancel a plain POST handler when the client goes
+            # away, so poll for the disconnect while the agent works.
+            while True:
+                done, _ = await asyncio.wait({run}, timeout=DISCONNECT_POLL_SECONDS)
+                if done:
+                    break
+                if await raw_request.is_disconnected():
+                    logger.info("🔌 Client disconnected — cancelling agent run.")
+                    cancel_token.cancel("client disconnected")
+                    run.cancel()
+                    return {"response": ""}
+            full_response = run.result()
         except asyncio.TimeoutError:
             logger.warning("⏱️ Agent execution timed out after 10 minutes.")
+            # The worker thread can't be killed — tell it to stop at its next checkpoint
+            cancel_token.cancel("timeout")
             full_response = "⏱️ **Request Timed Out (10 min)**\n\nThe task was too complex for the current model. Try:\n- Breaking your request into smaller steps\n- Setting up a Gemini API key for faster cloud processing\n- Simplifying your request"
+        except asyncio.CancelledError:
+            # Client went away mid-request
+            cancel_token.cancel("client disconnected")
+            run.cancel()
+            raise
+        finally:
+            active_runs.unregister(request.sessionId, cancel_token)
 
         return {"response": full_response}
 
@@ -1277,6 +1401,29 @@ async def chat_endpoint(request: ChatRequest, x_gemini_key: str | None = Header(
         logger.error(f"Agent Error: {e}")
         return {"response": f"Agent encountered an error: {str(e)}\n\nPlease try again or simplify your request."}
 
+class CancelChatRequest(BaseModel):
+    sessionId: str | None = None
+
+@app.post("/api/chat/cancel")
+async def cancel_chat(request: CancelChatRequest):
+    """Cancel every in-flight agent run of a session (LLM steps and terminal commands)."""
+    from cancellation import active_runs
+    cancelled = active_runs.cancel(request.sessionId, reason="user")
+    return {"status": "cancelled" if cancelled else "idle", "runs": cancelled}
+
+@app.get("/api/routing/stats")
+async def get_routing_stats():
+    """Expose gateway routing, coalescing, model health, intent classifier, agent pool and file summary statistics."""
+    from gateway import get_gateway
+    from intent_classifier import intent_classifier
+    from file_summaries import get_summary_stats
+    return {
+        **get_gateway().get_routing_stats(),
+        "intent_classifier": intent_classifier.get_stats(),
+        "agent_pool": _agent_pool.get_stats(),
+        "file_summaries": get_summary_stats(),
+    }
+
 # --- Template API (Phase 7 Sprint 4) ---
 from template_runner import template_runner
 from fastapi import BackgroundTasks
@@ -1343,6 +1490,11 @@ async def get_analytics_health():
         "recent_failures": analytics_engine.get_failure_rates()
     }
 
+@app.get("/api/analytics/routing")
+async def get_analytics_routing():
+    from route_cache import get_route_cache_stats
+    return {"route_cache": get_route_cache_stats()}
+
 @app.delete("/api/analytics/reset")
 async def reset_analytics():
     analytics_engine.reset_analytics()
@@ -1367,6 +1519,14 @@ async def submit_feedback(request: FeedbackRequest):
             comment=request.comment,
             context=request.context
         )
+        if request.module == "router":
+            # Router ratings label (or un-label) training samples for the local classifier
+            from intent_classifier import intent_classifier
+            matched_event = intent_classifier.record_feedback(request.event_id, request.rating, request.context)
+            if request.rating == "down":
+                # A rejected route must not be replayed from the cache
+                from route_cache import invalidate_route_event
+                invalidate_route_event(matched_event or request.event_id)
         return {"status": "success", "record_id": record["id"]}
     except Exception as e:
         logger.error(f"Feedback Error: {e}")
@@ -1406,31 +1566,49 @@ async def websocket_endpoint(websocket: WebSocket):
             data = await websocket.receive_json()
             if data.get("type") == "text_input":
                 text = data.get("text")
+                session_id = data.get("sessionId")
+                # Built off the event loop, handed out with its run_lock held; never
+                # wait on another run of the same session's agent
+                current_agent = await asyncio.to_thread(
+                    checkout_agent, session_id, data.get("workspacePath") or WORKING_DIRECTORY, False)
+                if current_agent is None:
+                    await manager.send_json({"type": "error", "message": "Agent is busy or still loading."}, websocket)
+                    continue
                 await manager.send_json({"type": "agent_response_start"}, websocket)
 
                 full_response = ""
-                current_agent = get_agent()
-                # Assuming sync generator for now based on previous code
-                for token in current_agent.execute_stream(text):
-                    # Phase 6/7: Detect dag_update and copilot_event payloads
-                    if isinstance(token, dict):
-                        if token.get("__dag_event__"):
-                            payload = {k: v for k, v in token.items() if k != "__dag_event__"}
-                            await manager.send_json(payload, websocket)
-                        elif token.get("__copilot_event__"):
-                            payload = {
-                                "type": "copilot_event",
-                                "source": token.get("source", "router"),
-                                "event_type": token.get("type", "unknown"),
-                                "payload": token.get("payload", {})
-                            }
-                            await manager.send_json(payload, websocket)
+                from cancellation import CancellationToken, active_runs
+                cancel_token = CancellationToken()
+                active_runs.register(session_id, cancel_token)
+                try:
+                    # Assuming sync generator for now based on previous code
+                    for token in current_agent.execute_stream(text, cancel_token=cancel_token):
+                        # Phase 6/7: Detect dag_update and copilot_event payloads
+                        if isinstance(token, dict):
+                            if token.get("__dag_event__"):
+                                payload = {k: v for k, v in token.items() if k != "__dag_event__"}
+                                await manager.send_json(payload, websocket)
+                            elif token.get("__copilot_event__"):
+                                payload = {
+                                    "type": "copilot_event",
+                                    "source": token.get("source", "router"),
+                                    "event_type": token.get("type", "unknown"),
+                                    "payload": token.get("payload", {})
+                                }
+                                await manager.send_json(payload, websocket)
+                            else:
+                                await manager.send_json({"type": "agent_token", "text": str(token)}, websocket)
+                                full_response += str(token)
                         else:
                             await manager.send_json({"type": "agent_token", "text": str(token)}, websocket)
                             full_response += str(token)
-                    else:
-                        await manager.send_json({"type": "agent_token", "text": str(token)}, websocket)
-                        full_response += str(token)
+                except BaseException:
+                    # Disconnect (or any failure) mid-run: stop LLM steps and kill subprocesses
+                    cancel_token.cancel("websocket closed")
+                    raise
+                finally:
+                    active_runs.unregister(session_id, cancel_token)
+                    _agent_pool.checkin(current_agent)
 
                 await manager.send_json({"type": "agent_response_end"}, websocket)
 
@@ -0,0 +1,564 @@
+# ══════════════════════════════════════════════════════════════════
+# 🗄️ Omni-IDE — Workspace Memory Store (SQLite WAL + FTS5)
+# ══════════════════════════════════════════════════════════════════
+#
+#  One store behind everything that used to load-modify-dump
+#  .omni_memory.json: IntelligenceCore notes and recent fixes, the
+#  orchestrator's planner/debug/review runs, and ProjectMemory knowledge
+#  items.
+#
+#  • <workspace>/.omni_memory.db in WAL mode: readers never block the
+#    writer; writers serialise on BEGIN IMMEDIATE with a busy timeout.
+#    Connections are per thread (agent thread, request handlers); those
+#    of threads that have exited are closed when a new one is opened.
+#  • Every list in the old JSON document is a `kind` of row in `entries`
+#    (notes, recent_fixes, planner_runs, knowledge_items, ...); scalars
+#    (preferences, version) live in `meta`. Rows may carry a unique
+#    per-kind `key` (e.g. an error fingerprint) for in-place updates.
+#  • entries_fts (FTS5: title, body, hints) indexes every row for search.
+#  • .omni_memory.json is kept as a debounced export for compatibility,
+#    and imported when the database is first created.
+#  • Write-behind: append/upsert(..., defer=True) only journal the write
+#    (.omni_memory.journal, one JSON line) and buffer it; a background
+#    thread applies the buffer in one transaction every FLUSH_INTERVAL_S,
+#    at MAX_BUFFERED writes, before any read or immediate write, and at
+#    exit. Unflushed journal lines are replayed on the next start; the last
+#    applied sequence number is committed with the rows, so a replay never
+#    applies a write twice.
+#
+# ══════════════════════════════════════════════════════════════════
+
+import os
+import re
+import json
+import time
+import atexit
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DB_FILE = ".omni_memory.db"
+JSON_EXPORT = ".omni_memory.json"
+JOURNAL_FILE = ".omni_memory.journal"
+FLUSH_INTERVAL_S = 1.0
+MAX_BUFFERED = 100
+SCHEMA_VERSION = 1
+EXPORT_DELAY_S = 2.0
+BUSY_TIMEOUT_MS = 5000
+MAX_QUERY_TERMS = 32
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    name  TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS entries (
+    id      INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind    TEXT NOT NULL,
+    key     TEXT,
+    data    TEXT NOT NULL,
+    created REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_by_kind ON entries(kind, updated);
+CREATE UNIQUE INDEX IF NOT EXISTS entries_by_key ON entries(kind, key) WHERE key IS NOT NULL;
+"""
+_FTS_SCHEMA = "CREATE VIRTUAL TABLE IF NOT EXISTS entries_fts USING fts5(title, body, hints)"
+_TERM_RE = re.compile(r"\w+", re.UNICODE)
+_TITLE_FIELDS = ("title", "error", "goal", "summary_title")
+_MAX_BODY_CHARS = 4000
+
+
+def _fts_fields(item: Any) -> Tuple[str, str, str]:
+    """(title, body, hints) text of a stored item for the FTS index."""
+    if isinstance(item, str):
+        return "", item, ""
+    if not isinstance(item, dict):
+        return "", json.dumps(item, ensure_ascii=False)[:_MAX_BODY_CHARS], ""
+    title = next((str(item[f]) for f in _TITLE_FIELDS if isinstance(item.get(f), str)), "")
+    hints = item.get("relevance_hint") or []
+    body_parts = []
+    for name, value in item.items():
+        if name in _TITLE_FIELDS or name == "relevance_hint":
+            continue
+        if isinstance(value, str):
+            body_parts.append(value)
+        elif isinstance(value, (list, dict)):
+            body_parts.append(json.dumps(value, ensure_ascii=False))
+    hint_text = " ".join(str(h) for h in hints) if isinstance(hints, list) else str(hints)
+    return title, " ".join(body_parts)[:_MAX_BODY_CHARS], hint_text
+
+
+def fts_query(text: str) -> str:
+    """OR-query of the distinct terms in `text`, quoted so FTS5 syntax in user text is inert."""
+    terms = list(dict.fromkeys(t for t in _TERM_RE.findall(text.lower()) if len(t) > 1))[:MAX_QUERY_TERMS]
+    return " OR ".join(f'"{t}"' for t in terms)
+
+
+class MemoryStore:
+    def __init__(self, workspace_dir: str):
+        self.workspace_dir = workspace_dir
+        self.db_path = os.path.join(workspace_dir, DB_FILE)
+        self.json_path = os.path.join(workspace_dir, JSON_EXPORT)
+        self._local = threading.local()
+        self._connections: List[Tuple[threading.Thread, sqlite3.Connection]] = []
+        self._conn_lock = threading.Lock()
+        self._export_timer: Optional[threading.Timer] = None
+        self._export_lock = threading.Lock()
+        self.fts = True
+        self.journal_path = os.path.join(workspace_dir, JOURNAL_FILE)
+        self._buffer: List[dict] = []
+        self._buffer_lock = threading.Lock()   # guards _buffer and the journal file
+        self._flush_lock = threading.RLock()   # one flush at a time
+        self._seq = 0
+        self._wake = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+        self._closed = False
+        self._flush_stats = {"deferred": 0, "flushes": 0, "coalesced": 0}
+        self._init_db()
+        self._replay_journal()
+
+    # ----------------------------------------------------------
+    # CONNECTIONS & TRANSACTIONS
+    # ----------------------------------------------------------
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT_MS / 1000,
+                               isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+        return conn
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+            with self._conn_lock:
+                # Request handler threads come and go; don't keep their connections open
+                dead = [c for t, c in self._connections if not t.is_alive()]
+                self._connections = [(t, c) for t, c in self._connections if t.is_alive()]
+                self._connections.append((threading.current_thread(), conn))
+            for stale in dead:
+                try:
+                    stale.close()
+                except sqlite3.Error:
+                    pass
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        self._schedule_export()
+
+    @contextmanager
+    def _write(self):
+        # Buffered writes go first so rows land in submission order
+        self.flush()
+        with self._transaction() as conn:
+            yield conn
+
+    def _init_db(self):
+        created = not os.path.exists(self.db_path)
+        conn = self._conn()
+        conn.executescript(_SCHEMA)
+        try:
+            conn.execute(_FTS_SCHEMA)
+        except sqlite3.OperationalError as e:
+            self.fts = False
+            logger.warning(f"🗄️ MEMORY: FTS5 unavailable ({e}); search falls back to a scan")
+        row = conn.execute("SELECT value FROM meta WHERE name = 'schema_version'").fetchone()
+        if row is None:
+            with self._transaction() as c:
+                c.execute("INSERT OR REPLACE INTO meta(name, value) VALUES ('schema_version', ?)",
+                          (json.dumps(SCHEMA_VERSION),))
+                if created:
+                    self._import_legacy(c)
+
+    def _import_legacy(self, conn: sqlite3.Connection):
+        """Seed a new database from .omni_memory.json."""
+        imported = 0
+        try:
+            with open(self.json_path, "r", encoding="utf-8") as f:
+                doc = json.load(f)
+            if isinstance(doc, dict):
+                self._write_document(conn, doc)
+                imported += sum(len(v) for v in doc.values() if isinstance(v, list))
+        except (OSError, ValueError):
+            pass
+        if imported:
+            logger.info(f"🗄️ MEMORY: Imported {imported} legacy memory entries into {DB_FILE}")
+
+    # ----------------------------------------------------------
+    # ROW HELPERS (inside a write transaction)
+    # ----------------------------------------------------------
+
+    def _insert(self, conn, kind: str, item: Any, key: Optional[str] = None, now: Optional[float] = None) -> int:
+        now = now or time.time()
+        cur = conn.execute(
+            "INSERT INTO entries(kind, key, data, created, updated) VALUES (?, ?, ?, ?, ?)",
+            (kind, key, json.dumps(item, ensure_ascii=False), now, now),
+        )
+        if self.fts:
+            conn.execute("INSERT INTO entries_fts(rowid, title, body, hints) VALUES (?, ?, ?, ?)",
+                         (cur.lastrowid, *_fts_fields(item)))
+        return cur.lastrowid
+
+    def _delete_ids(self, conn, ids: Iterable[int]):
+        ids = list(ids)
+        if not ids:
+            return
+        marks = ",".join("?" * len(ids))
+        conn.execute(f"DELETE FROM entries WHERE id IN ({marks})", ids)
+        if self.fts:
+            conn.execute(f"DELETE FROM entries_fts WHERE rowid IN ({marks})", ids)
+
+    def _prune(self, conn, kind: str, cap: int):
+        """Keep the `cap` most recently updated rows of a kind."""
+        rows = conn.execute(
+            "SELECT id FROM entries WHERE kind = ? ORDER BY updated DESC, id DESC LIMIT -1 OFFSET ?",
+            (kind, cap),
+        ).fetchall()
+        self._delete_ids(conn, [r[0] for r in rows])
+
+    def _write_document(self, conn, doc: Dict[str, Any]):
+        for name, value in doc.items():
+            if isinstance(value, list):
+                self._delete_ids(conn, [r[0] for r in conn.execute("SELECT id FROM entries WHERE kind = ?", (name,))])
+                now = time.time()
+                for i, item in enumerate(value):
+                    key = item.get("fingerprint") if isinstance(item, dict) and name == "recent_fixes" else None
+                    self._insert(conn, name, item, key=key, now=now + i * 1e-6)  # keep list order
+            else:
+                conn.execute("INSERT OR REPLACE INTO meta(name, value) VALUES (?, ?)",
+                             (name, json.dumps(value, ensure_ascii=False)))
+
+    def _upsert(self, conn, kind: str, key: str, item: Any, now: Optional[float] = None):
+        now = now or time.time()
+        row = conn.execute("SELECT id FROM entries WHERE kind = ? AND key = ?", (kind, key)).fetchone()
+        if row is None:
+            self._insert(conn, kind, item, key=key, now=now)
+            return
+        conn.execute("UPDATE entries SET data = ?, updated = ? WHERE id = ?",
+                     (json.dumps(item, ensure_ascii=False), now, row[0]))
+        if self.fts:
+            conn.execute("DELETE FROM entries_fts WHERE rowid = ?", (row[0],))
+            conn.execute("INSERT INTO entries_fts(rowid, title, body, hints) VALUES (?, ?, ?, ?)",
+                         (row[0], *_fts_fields(item)))
+
+    # ----------------------------------------------------------
+    # PUBLIC API
+    # ----------------------------------------------------------
+
+    def append(self, kind: str, item: Any, cap: Optional[int] = None, defer: bool = False) -> Optional[int]:
+        """Add a row of `kind`; with `cap`, drop the oldest rows beyond it. Deferred writes return None."""
+        if defer:
+            self._defer({"op": "append", "kind": kind, "item": item, "cap": cap})
+            return None
+        with self._write() as conn:
+            row_id = self._insert(conn, kind, item)
+            if cap is not None:
+                self._prune(conn, kind, cap)
+        return row_id
+
+    def upsert(self, kind: str, key: str, item: Any, cap: Optional[int] = None, defer: bool = False):
+        """Insert or replace the row of `kind` identified by `key`."""
+        if defer:
+            self._defer({"op": "upsert", "kind": kind, "key": key, "item": item, "cap": cap})
+            return
+        with self._write() as conn:
+            self._upsert(conn, kind, key, item)
+            if cap is not None:
+                self._prune(conn, kind, cap)
+
+    def get(self, kind: str, key: str) -> Optional[Any]:
+        self.flush()
+        row = self._conn().execute("SELECT data FROM entries WHERE kind = ? AND key = ?", (kind, key)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def delete(self, kind: str, key: str) -> bool:
+        with self._write() as conn:
+            ids = [r[0] for r in conn.execute("SELECT id FROM entries WHERE kind = ? AND key = ?", (kind, key))]
+            self._delete_ids(conn, ids)
+        return bool(ids)
+
+    def items(self, kind: str, limit: Optional[int] = None) -> List[Any]:
+        """Rows of `kind`, oldest first (the newest `limit` when given)."""
+        self.flush()
+        rows = self._conn().execute(
+            "SELECT data FROM entries WHERE kind = ? ORDER BY updated DESC, id DESC LIMIT ?",
+            (kind, -1 if limit is None else limit),
+        ).fetchall()
+        return [json.loads(r[0]) for r in reversed(rows)]
+
+    def get_value(self, name: str, default: Any = None) -> Any:
+        self.flush()
+        row = self._conn().execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set_value(self, name: str, value: Any):
+        with self._write() as conn:
+            conn.execute("INSERT OR REPLACE INTO meta(name, value) VALUES (?, ?)",
+                         (name, json.dumps(value, ensure_ascii=False)))
+
+    def search(self, query: str, kinds: Optional[List[str]] = None, limit: int = 10) -> List[Tuple[float, str, Any]]:
+        """(score, kind, item) best first; FTS5 bm25 with title and hints weighted over body."""
+        match = fts_query(query)
+        if not match:
+            return []
+        self.flush()
+        kind_filter, params = "", [match]
+        if kinds:
+            kind_filter = f" AND e.kind IN ({','.join('?' * len(kinds))})"
+            params.extend(kinds)
+        params.append(limit)
+        conn = self._conn()
+        if self.fts:
+            rows = conn.execute(
+                "SELECT bm25(entries_fts, 2.0, 1.0, 4.0) AS rank, e.kind, e.data "
+                "FROM entries_fts JOIN entries e ON e.id = entries_fts.rowid "
+                f"WHERE entries_fts MATCH ?{kind_filter} ORDER BY rank LIMIT ?",
+                params,
+            ).fetchall()
+            return [(-rank, kind, json.loads(data)) for rank, kind, data in rows]
+        # No FTS5 in this SQLite build: term-overlap scan
+        terms = set(match.replace('"', "").split(" OR "))
+        sql = "SELECT e.kind, e.data FROM entries e WHERE 1=1" + kind_filter
+        scored = []
+        for kind, data in conn.execute(sql, params[1:-1]):
+            words = set(_TERM_RE.findall(data.lower()))
+            score = len(terms & words)
+            if score:
+                scored.append((float(score), kind, json.loads(data)))
+        scored.sort(key=lambda r: r[0], reverse=True)
+        return scored[:limit]
+
+    def document(self) -> Dict[str, Any]:
+        """The whole store in the legacy .omni_memory.json shape."""
+        self.flush()
+        return self._read_document(self._conn())
+
+    @staticmethod
+    def _read_document(conn: sqlite3.Connection) -> Dict[str, Any]:
+        doc: Dict[str, Any] = {}
+        for name, value in conn.execute("SELECT name, value FROM meta WHERE name != 'schema_version'"):
+            doc[name] = json.loads(value)
+        for kind, data in conn.execute("SELECT kind, data FROM entries ORDER BY kind, updated, id"):
+            doc.setdefault(kind, []).append(json.loads(data))
+        return doc
+
+    def save_document(self, doc: Dict[str, Any]):
+        """Compatibility write of a whole document; only kinds whose contents changed are rewritten."""
+        current = self.document()
+        changed = {k: v for k, v in doc.items() if current.get(k) != v}
+        if changed:
+            with self._write() as conn:
+                self._write_document(conn, changed)
+
+    # ----------------------------------------------------------
+    # WRITE-BEHIND BUFFER
+    # ----------------------------------------------------------
+
+    def _defer(self, op: dict):
+        with self._buffer_lock:
+            self._seq += 1
+            op = {**op, "seq": self._seq, "ts": time.time()}
+            with open(self.journal_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(op, ensure_ascii=False) + "\n")
+            self._buffer.append(op)
+            self._flush_stats["deferred"] += 1
+            full = len(self._buffer) >= MAX_BUFFERED
+            if self._flusher is None or not self._flusher.is_alive():
+                self._flusher = threading.Thread(target=self._flush_loop, name="omni-memory-flush", daemon=True)
+                self._flusher.start()
+        if full:
+            self._wake.set()
+
+    def _flush_loop(self):
+        while not self._closed:
+            self._wake.wait(FLUSH_INTERVAL_S)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.warning(f"🗄️ MEMORY: Background flush failed: {e}")
+
+    def flush(self):
+        """Apply buffered writes in one transaction and trim the journal."""
+        if not self._buffer:
+            return
+        with self._flush_lock:
+            with self._buffer_lock:
+                ops, self._buffer = self._buffer, []
+            if not ops:
+                return
+            try:
+                self._apply_ops(ops)
+            except Exception as e:
+                with self._buffer_lock:
+                    self._buffer[:0] = ops  # keep them (and their journal lines) for the next attempt
+                logger.warning(f"🗄️ MEMORY: Flush of {len(ops)} buffered write(s) failed: {e}")
+                return
+            with self._buffer_lock:
+                # Keep journal lines only for writes deferred while this flush ran
+                with open(self.journal_path, "w", encoding="utf-8") as f:
+                    f.writelines(json.dumps(op, ensure_ascii=False) + "\n" for op in self._buffer)
+            self._flush_stats["flushes"] += 1
+
+    def _apply_ops(self, ops: List[dict]):
+        # Coalesce: only the last upsert per key matters, and appends that a
+        # cap would prune right away are never written
+        last_upsert = {(op["kind"], op["key"]): op["seq"] for op in ops if op["op"] == "upsert"}
+        appends_left: Dict[str, int] = {}
+        caps: Dict[str, int] = {}
+        for op in ops:
+            if op.get("cap") is not None:
+                caps[op["kind"]] = op["cap"]
+            if op["op"] == "append":
+                appends_left[op["kind"]] = appends_left.get(op["kind"], 0) + 1
+        skipped = 0
+        with self._transaction() as conn:
+            for op in ops:
+                kind = op["kind"]
+                if op["op"] == "upsert":
+                    if last_upsert[(kind, op["key"])] != op["seq"]:
+                        skipped += 1
+                        continue
+                    self._upsert(conn, kind, op["key"], op["item"], now=op["ts"])
+                else:
+                    appends_left[kind] -= 1
+                    if kind in caps and appends_left[kind] >= caps[kind]:
+                        skipped += 1
+                        continue
+                    self._insert(conn, kind, op["item"], now=op["ts"])
+            for kind, cap in caps.items():
+                self._prune(conn, kind, cap)
+            conn.execute("INSERT OR REPLACE INTO meta(name, value) VALUES ('journal_seq', ?)",
+                         (json.dumps(max(op["seq"] for op in ops)),))
+        self._flush_stats["coalesced"] += skipped
+
+    def _replay_journal(self):
+        """Apply journal lines a crash left unflushed (skipping any already committed)."""
+        row = self._conn().execute("SELECT value FROM meta WHERE name = 'journal_seq'").fetchone()
+        applied = json.loads(row[0]) if row else 0
+        self._seq = applied
+        try:
+            with open(self.journal_path, "r", encoding="utf-8") as f:
+                raw_lines = f.read().split("\n")[:-1]  # a torn final line has no newline
+        except OSError:
+            return
+        ops = []
+        for line in raw_lines:
+            try:
+                op = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(op, dict) and op.get("seq", 0) > applied:
+                ops.append(op)
+        if ops:
+            try:
+                self._apply_ops(ops)
+            except sqlite3.Error as e:
+                logger.warning(f"🗄️ MEMORY: Journal replay failed, keeping {JOURNAL_FILE}: {e}")
+                self._seq = max(applied, max(op["seq"] for op in ops))
+                return
+            self._seq = max(op["seq"] for op in ops)
+            logger.info(f"🗄️ MEMORY: Replayed {len(ops)} unflushed write(s) from {JOURNAL_FILE}")
+        try:
+            os.remove(self.journal_path)
+        except OSError:
+            pass
+
+    def get_stats(self) -> dict:
+        with self._buffer_lock:
+            return {**self._flush_stats, "buffered": len(self._buffer)}
+
+    # ----------------------------------------------------------
+    # JSON EXPORT
+    # ----------------------------------------------------------
+
+    def _schedule_export(self):
+        with self._export_lock:
+            if self._export_timer is not None:
+                return
+            self._export_timer = threading.Timer(EXPORT_DELAY_S, self.export_json)
+            self._export_timer.daemon = True
+            self._export_timer.start()
+
+    def export_json(self):
+        """Write .omni_memory.json from the database (atomic replace)."""
+        with self._export_lock:
+            self._export_timer = None
+        # Runs on a short-lived timer thread: use a connection of its own and
+        # close it, rather than leaving a thread-local one behind. Buffered
+        # writes are not flushed here; their flush commits and schedules
+        # another export.
+        conn = None
+        try:
+            conn = self._connect()
+            doc = self._read_document(conn)
+            tmp_path = self.json_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(doc, f, indent=2, ensure_ascii=False)
+            os.replace(tmp_path, self.json_path)
+        except (OSError, sqlite3.Error) as e:
+            logger.warning(f"🗄️ MEMORY: JSON export failed: {e}")
+        finally:
+            if conn is not None:
+                conn.close()
+
+    def close(self):
+        self._closed = True
+        self._wake.set()
+        self.flush()
+        with self._export_lock:
+            timer, self._export_timer = self._export_timer, None
+        if timer is not None:
+            timer.cancel()
+            self.export_json()
+        with self._conn_lock:
+            connections, self._connections = [c for _, c in self._connections], []
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+        self._local = threading.local()
+
+
+# ── Per-workspace registry ───────────────────────────────────
+_stores: Dict[str, MemoryStore] = {}
+_registry_lock = threading.Lock()
+
+
+def get_memory_store(workspace_dir: str) -> MemoryStore:
+    key = os.path.normcase(os.path.abspath(workspace_dir))
+    with _registry_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = _stores[key] = MemoryStore(workspace_dir)
+        return store
+
+
+@atexit.register
+def flush_all_memory_stores():
+    """Flush every store's write-behind buffer (runs at interpreter exit)."""
+    with _registry_lock:
+        stores = list(_stores.values())
+    for store in stores:
+        try:
+            store.flush()
+        except Exception as e:
+            logger.warning(f"🗄️ MEMORY: Flush at exit failed for {store.workspace_dir}: {e}")
@@ -185,10 +185,12 @@ class PlannerEngine:
             payload["template_context"] = template_context
         return payload
 
-    def execute_graph_stream(self, graph: TaskGraph, context: dict, template_context: dict = None):
+    def execute_graph_stream(self, graph: TaskGraph, context: dict, template_context: dict = None,
+                             cancel_token=None):
         """
         Generator that executes the DAG and yields dag_update snapshots
         at every state transition for real-time WebSocket forwarding.
+        A cancelled `cancel_token` fails the next node instead of running it.
         """
         graph.validate_acyclic()
         graph.reset_states()
@@ -208,6 +210,7 @@ class PlannerEngine:
 
         completed_count = 0
         has_failed = False
+        was_cancelled = False
         queue = [graph.entry_node]
         results = {}
 
@@ -215,6 +218,13 @@ class PlannerEngine:
             current_id = queue.pop(0)
             node = graph.nodes[current_id]
 
+            if cancel_token is not None and cancel_token.cancelled:
+                node.status = "FAILED"
+                node.error = f"Cancelled ({cancel_token.reason})"
+                has_failed = was_cancelled = True
+                yield self._build_dag_snapshot(graph, current_id, template_context)
+                break
+
             node.status = "RUNNING"
             yield self._build_dag_snapshot(graph, current_id, template_context)
             
@@ -251,13 +261,15 @@ class PlannerEngine:
                 node.status = "FAILED"
                 node.error = str(e)
                 has_failed = True
+                was_cancelled = cancel_token is not None and cancel_token.cancelled
                 yield self._build_dag_snapshot(graph, current_id, template_context)
                 break
                 
         # Phase 7 Sprint 5: Telemetry stream finish
         analytics_engine.log_event("dag_failed" if has_failed else "dag_completed", {
             "completed_nodes": completed_count,
-            "failed": has_failed
+            "failed": has_failed,
+            "cancelled": was_cancelled
         })
 
     # --- Real Handlers (Wired to Agent) ---
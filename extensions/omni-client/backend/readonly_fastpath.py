@@ -0,0 +1,191 @@
+# ══════════════════════════════════════════════════════════════════
+# ⚡ Omni-IDE — Read-Only Fast Path
+# ══════════════════════════════════════════════════════════════════
+#
+#  "list files", "show app.py", "file tree", "what's in folder src"
+#  do not need intent routing or a multi-step CodeAgent run. These
+#  requests are answered straight from the filesystem.
+#
+#  Rules are deliberately strict: the WHOLE message must match one
+#  pattern and every path must resolve inside the workspace. Anything
+#  else ("show app.py and fix the bug", unknown files, ignored files)
+#  returns None and falls through to the full agent.
+#
+# ══════════════════════════════════════════════════════════════════
+
+import os
+import re
+import fnmatch
+import logging
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+MAX_LIST_ENTRIES = 200
+MAX_TREE_LINES = 300
+MAX_TREE_DEPTH = 4
+MAX_FILE_CHARS = 20000
+
+_PATH = r"[\w./\\:~-]+"
+_LEAD = r"^(?:please\s+|can you\s+|could you\s+)?"
+_TAIL = r"\s*[.?!]*$"
+
+_LIST_RE = re.compile(
+    _LEAD + r"(?:list|show(?: me)?|ls)(?: all)?(?: the)? (?:files|contents)"
+    rf"(?: (?:in|of|under) (?:the )?(?:folder |directory |dir )?(?P<dir>{_PATH}))?" + _TAIL,
+    re.IGNORECASE,
+)
+_LIST_DIR_RE = re.compile(
+    _LEAD + rf"(?:list|ls)(?: the)?(?: folder| directory| dir)? (?P<dir>{_PATH})" + _TAIL,
+    re.IGNORECASE,
+)
+_WHATS_IN_RE = re.compile(
+    _LEAD + rf"what(?:'s| is) in(?: the)?(?: folder| directory| dir)? (?P<dir>{_PATH})" + _TAIL,
+    re.IGNORECASE,
+)
+_TREE_RE = re.compile(
+    _LEAD + r"(?:(?:show|print|display)(?: me)? )?(?:the )?(?:file|folder|directory|project) (?:tree|structure)"
+    rf"(?: (?:of|for) (?:the )?(?:folder |directory )?(?P<dir>{_PATH}))?" + _TAIL,
+    re.IGNORECASE,
+)
+_SHOW_FILE_RE = re.compile(
+    _LEAD + r"(?:show|open|read|cat|display|print)(?: me)?(?: the)?(?: file| contents of| content of)?"
+    rf"(?: the file)? (?P<file>{_PATH}\.\w+)" + _TAIL,
+    re.IGNORECASE,
+)
+
+_LANGUAGES = {
+    ".py": "python", ".js": "javascript", ".jsx": "jsx", ".ts": "typescript", ".tsx": "tsx",
+    ".json": "json", ".html": "html", ".css": "css", ".md": "markdown", ".yml": "yaml",
+    ".yaml": "yaml", ".toml": "toml", ".sh": "bash", ".ps1": "powershell", ".sql": "sql",
+    ".rs": "rust", ".go": "go", ".java": "java", ".c": "c", ".cpp": "cpp", ".h": "c",
+}
+
+
+def _ignore_patterns(workspace_dir: str) -> List[str]:
+    from intelligence_core import IntelligenceCore
+    return IntelligenceCore(workspace_dir)._parse_gitignore()
+
+
+def _is_ignored(name: str, patterns: List[str]) -> bool:
+    return any(fnmatch.fnmatch(name, pat) for pat in patterns)
+
+
+def _resolve(workspace_dir: str, rel: Optional[str]) -> Optional[str]:
+    """Resolve a user path inside the workspace; None if it escapes it."""
+    root = os.path.realpath(workspace_dir)
+    rel = (rel or ".").strip().strip("'\"`")
+    target = os.path.realpath(rel if os.path.isabs(rel) else os.path.join(root, rel))
+    if os.path.normcase(target) != os.path.normcase(root) and \
+            not os.path.normcase(target).startswith(os.path.normcase(root) + os.sep):
+        return None
+    return target
+
+
+def _display(workspace_dir: str, path: str) -> str:
+    rel = os.path.relpath(path, os.path.realpath(workspace_dir)).replace(os.sep, "/")
+    return "." if rel == "." else rel
+
+
+def _list_dir(workspace_dir: str, rel: Optional[str]) -> Optional[str]:
+    target = _resolve(workspace_dir, rel)
+    if not target or not os.path.isdir(target):
+        return None
+    patterns = _ignore_patterns(workspace_dir)
+    entries = sorted(
+        (e for e in os.scandir(target) if not _is_ignored(e.name, patterns)),
+        key=lambda e: (not e.is_dir(), e.name.lower()),
+    )
+    lines = [f"📂 **{_display(workspace_dir, target)}** ({len(entries)} entries)\n"]
+    for entry in entries[:MAX_LIST_ENTRIES]:
+        lines.append(f"- 📁 `{entry.name}/`" if entry.is_dir() else f"- 📄 `{entry.name}`")
+    if len(entries) > MAX_LIST_ENTRIES:
+        lines.append(f"\n... and {len(entries) - MAX_LIST_ENTRIES} more")
+    if not entries:
+        lines.append("_(empty)_")
+    return "\n".join(lines)
+
+
+def _tree(workspace_dir: str, rel: Optional[str]) -> Optional[str]:
+    target = _resolve(workspace_dir, rel)
+    if not target or not os.path.isdir(target):
+        return None
+    patterns = _ignore_patterns(workspace_dir)
+    lines = [f"{_display(workspace_dir, target)}/"]
+    truncated = False
+
+    def walk(path: str, prefix: str, depth: int):
+        nonlocal truncated
+        try:
+            entries = sorted(
+                (e for e in os.scandir(path) if not _is_ignored(e.name, patterns)),
+                key=lambda e: (not e.is_dir(), e.name.lower()),
+            )
+        except OSError:
+            return
+        for i, entry in enumerate(entries):
+            if len(lines) >= MAX_TREE_LINES:
+                truncated = True
+                return
+            last = i == len(entries) - 1
+            is_dir = entry.is_dir()
+            lines.append(f"{prefix}{'└── ' if last else '├── '}{entry.name}{'/' if is_dir else ''}")
+            if is_dir and depth < MAX_TREE_DEPTH:
+                walk(entry.path, prefix + ("    " if last else "│   "), depth + 1)
+
+    walk(target, "", 1)
+    if truncated:
+        lines.append(f"... (truncated at {MAX_TREE_LINES} lines)")
+    return "```\n" + "\n".join(lines) + "\n```"
+
+
+def _show_file(workspace_dir: str, rel: str) -> Optional[str]:
+    target = _resolve(workspace_dir, rel)
+    if not target or not os.path.isfile(target):
+        return None
+    patterns = _ignore_patterns(workspace_dir)
+    rel_parts = _display(workspace_dir, target).split("/")
+    if any(_is_ignored(part, patterns) for part in rel_parts):
+        return None  # e.g. .env — leave it to the agent's own safety rules
+    try:
+        with open(target, "rb") as f:
+            raw = f.read(MAX_FILE_CHARS * 4 + 1)
+    except OSError:
+        return None
+    if b"\x00" in raw[:8192]:
+        return f"📄 **{_display(workspace_dir, target)}** is a binary file ({os.path.getsize(target)} bytes)."
+    text = raw.decode("utf-8", errors="replace")
+    truncated = len(text) > MAX_FILE_CHARS or os.path.getsize(target) > len(raw)
+    text = text[:MAX_FILE_CHARS].rstrip("\n")
+    lang = _LANGUAGES.get(os.path.splitext(target)[1].lower(), "")
+    note = f"\n\n_(truncated — file is {os.path.getsize(target)} bytes)_" if truncated else ""
+    return f"📄 **{_display(workspace_dir, target)}**\n```{lang}\n{text}\n```{note}"
+
+
+_RULES: List[tuple] = [
+    (_TREE_RE, lambda ws, m: _tree(ws, m.group("dir"))),
+    (_LIST_RE, lambda ws, m: _list_dir(ws, m.group("dir"))),
+    (_WHATS_IN_RE, lambda ws, m: _list_dir(ws, m.group("dir"))),
+    (_SHOW_FILE_RE, lambda ws, m: _show_file(ws, m.group("file"))),
+    (_LIST_DIR_RE, lambda ws, m: _list_dir(ws, m.group("dir"))),
+]
+
+
+def try_readonly_fastpath(text: str, workspace_dir: Optional[str]) -> Optional[str]:
+    """Answer an unambiguous read-only request from the filesystem, or return None."""
+    if not workspace_dir or not os.path.isdir(workspace_dir):
+        return None
+    query = " ".join(text.strip().split())
+    for pattern, handler in _RULES:
+        match = pattern.match(query)
+        if not match:
+            continue
+        try:
+            answer = handler(workspace_dir, match)
+        except Exception as e:
+            logger.warning(f"⚡ FASTPATH: Rule failed ({e}); deferring to agent.")
+            return None
+        if answer is not None:
+            logger.info(f"⚡ FASTPATH: Answered read-only request: {query[:60]}")
+        return answer
+    return None
@@ -0,0 +1,128 @@
+# ══════════════════════════════════════════════════════════════════
+# 🔗 Omni-IDE — Request Coalescer (Single-Flight LLM Calls)
+# ══════════════════════════════════════════════════════════════════
+#
+#  Double-clicks, UI retries and multiple windows frequently send the
+#  exact same completion request at the same moment. Instead of paying
+#  for N identical round trips, the first caller ("leader") performs the
+#  call and every concurrent caller with the same (model, messages, params)
+#  key awaits the leader's in-flight future and shares its result.
+#
+#  Only *concurrent* duplicates are merged — once the leader finishes the
+#  key is released, so a later retry always gets a fresh completion.
+#
+# ══════════════════════════════════════════════════════════════════
+
+import asyncio
+import hashlib
+import json
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class RequestCoalescer:
+    """Thread-safe single-flight registry shared by sync and async callers."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._in_flight: Dict[str, Future] = {}
+        self._executed_calls = 0
+        self._calls_saved = 0
+
+    @staticmethod
+    def make_key(model: Optional[str], messages: Any, params: Optional[dict] = None) -> str:
+        """Hash (model, messages, params) into a stable coalescing key."""
+        payload = json.dumps(
+            {"model": model, "messages": messages, "params": params or {}},
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _join(self, key: str) -> Tuple[Future, bool]:
+        """Return (future, is_leader) for the given key."""
+        with self._lock:
+            future = self._in_flight.get(key)
+            if future is not None:
+                self._calls_saved += 1
+                return future, False
+            future = Future()
+            self._in_flight[key] = future
+            self._executed_calls += 1
+            return future, True
+
+    def _settle(self, key: str, future: Future, fn: Callable[[], Any]) -> Any:
+        """Run fn as the leader and publish its outcome to all followers."""
+        try:
+            result = fn()
+        except BaseException as e:
+            if not future.done():
+                future.set_exception(e)
+            raise
+        else:
+            if not future.done():
+                future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                if self._in_flight.get(key) is future:
+                    del self._in_flight[key]
+
+    def run(self, key: str, fn: Callable[[], Any]) -> Any:
+        """Execute fn once per concurrent key; followers block on the leader's result."""
+        future, is_leader = self._join(key)
+        if not is_leader:
+            logger.info(f"🔗 COALESCER: Joined in-flight request {key[:10]}…")
+            return future.result()
+        return self._settle(key, future, fn)
+
+    async def run_async(self, key: str, fn: Callable[[], Any]) -> Any:
+        """Async variant: the leader runs fn in a worker thread, followers await without a thread."""
+        future, is_leader = self._join(key)
+        if not is_leader:
+            logger.info(f"🔗 COALESCER: Joined in-flight request {key[:10]}…")
+            # Shielded: a cancelled follower (hedge loser, client gone) must not
+            # cancel the shared future under the leader and the other followers
+            return await asyncio.shield(asyncio.wrap_future(future))
+        return await asyncio.to_thread(self._settle, key, future, fn)
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {
+                "in_flight": len(self._in_flight),
+                "executed_calls": self._executed_calls,
+                "calls_saved": self._calls_saved,
+            }
+
+
+# Process-wide singleton — the gateway is re-created on key changes, the
+# coalescer must survive that to keep merging requests already in flight.
+request_coalescer = RequestCoalescer()
+
+
+def _completion_key(kwargs: dict) -> str:
+    params = {k: v for k, v in kwargs.items() if k not in ("model", "messages")}
+    return RequestCoalescer.make_key(kwargs.get("model"), kwargs.get("messages"), params)
+
+
+def _tracked_completion(kwargs: dict):
+    """Run litellm.completion down the model chain, reporting each hop to the gateway's model health."""
+    import litellm
+    from gateway import get_gateway
+    gateway = get_gateway()
+    chain, hop_kwargs = gateway.completion_chain(kwargs)
+    return gateway.call_model_chain(chain, lambda model_id: litellm.completion(**hop_kwargs(model_id)))
+
+
+def coalesced_completion(**kwargs):
+    """Drop-in replacement for litellm.completion() with single-flight coalescing."""
+    return request_coalescer.run(_completion_key(kwargs), lambda: _tracked_completion(kwargs))
+
+
+async def coalesced_completion_async(**kwargs):
+    """Awaitable coalesced completion that keeps the event loop free while waiting."""
+    return await request_coalescer.run_async(_completion_key(kwargs), lambda: _tracked_completion(kwargs))
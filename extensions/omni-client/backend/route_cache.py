@@ -0,0 +1,187 @@
+# ══════════════════════════════════════════════════════════════════
+# 🗂️ Omni-IDE — Routing Decision Cache
+# ══════════════════════════════════════════════════════════════════
+#
+#  Re-asking after an error or sending a template-like request
+#  ("create a todo app") should not pay for another classification.
+#  Routing results are cached per workspace (.omni_route_cache.json),
+#  keyed on a normalized query, with LRU eviction and a TTL.
+#
+#  A 👎 on a router decision evicts the entry that produced it. The ids
+#  of decisions served from an entry are persisted with it (debounced),
+#  so feedback still finds the entry after a restart. Hit/miss counters
+#  stay in memory; lookups never touch the analytics log.
+#
+# ══════════════════════════════════════════════════════════════════
+
+import os
+import re
+import json
+import time
+import logging
+import atexit
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+ROUTE_CACHE_FILE = ".omni_route_cache.json"
+DEFAULT_MAX_ENTRIES = 256
+DEFAULT_TTL_S = 24 * 3600.0
+MAX_EVENT_IDS_PER_ENTRY = 8  # decisions served from one entry that feedback can still point at
+SAVE_DELAY_S = 2.0  # hits only append an event id; batch those writes
+
+
+def normalize_query(query: str, workspace_dir: Optional[str] = None) -> str:
+    """Lowercase, collapse whitespace and canonicalize file paths."""
+    text = query.strip().lower().replace("\\", "/")
+    if workspace_dir:
+        root = workspace_dir.replace("\\", "/").lower().rstrip("/") + "/"
+        text = text.replace(root, "")
+    text = re.sub(r"(?<![\w./])\./", "", text)   # ./src/app.py → src/app.py
+    text = re.sub(r"/{2,}", "/", text)
+    text = re.sub(r"\s+", " ", text)
+    return text.strip(" .!?")
+
+
+class RouteCache:
+    def __init__(self, workspace_dir: str, max_entries: int = DEFAULT_MAX_ENTRIES, ttl_s: float = DEFAULT_TTL_S):
+        self.workspace_dir = workspace_dir
+        self.filepath = os.path.join(workspace_dir, ROUTE_CACHE_FILE)
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._save_timer: Optional[threading.Timer] = None
+        self._stats = {"hits": 0, "misses": 0}
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.filepath, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return
+        now = time.time()
+        for key, entry in data.get("entries", []):
+            if now - entry.get("stored_at", 0) < self.ttl_s:
+                self._entries[key] = entry
+
+    def _save(self):
+        """Atomic write (tmp + replace) so a crash never leaves a torn cache file. Caller holds the lock."""
+        if self._save_timer is not None:
+            self._save_timer.cancel()
+            self._save_timer = None
+        tmp = self.filepath + ".tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"entries": list(self._entries.items())}, f)
+            os.replace(tmp, self.filepath)
+        except OSError as e:
+            logger.warning(f"⚠️ ROUTE CACHE: Could not persist {self.filepath}: {e}")
+
+    def _schedule_save(self):
+        """Debounced _save() for writes that only record served event ids. Caller holds the lock."""
+        if self._save_timer is None:
+            self._save_timer = threading.Timer(SAVE_DELAY_S, self.flush)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+
+    def flush(self):
+        """Write a pending debounced save now."""
+        with self._lock:
+            if self._save_timer is not None:
+                self._save()
+
+    def get(self, query: str, event_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Cached routing result for the query, recording `event_id` as served from it."""
+        key = normalize_query(query, self.workspace_dir)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.time() - entry["stored_at"] >= self.ttl_s:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            self._stats["hits"] += 1
+            self._entries.move_to_end(key)
+            if event_id:
+                entry["event_ids"] = (entry["event_ids"] + [event_id])[-MAX_EVENT_IDS_PER_ENTRY:]
+                self._schedule_save()
+            return dict(entry["result"])
+
+    def put(self, query: str, result: Dict[str, Any], event_id: str):
+        key = normalize_query(query, self.workspace_dir)
+        stored = {k: v for k, v in result.items() if k != "event_id"}
+        with self._lock:
+            self._entries[key] = {"result": stored, "stored_at": time.time(), "event_ids": [event_id]}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._save()
+
+    def invalidate_event(self, event_id: str) -> bool:
+        with self._lock:
+            stale = [k for k, e in self._entries.items() if event_id in e.get("event_ids", ())]
+            for key in stale:
+                del self._entries[key]
+            if stale:
+                self._save()
+        return bool(stale)
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {**self._stats, "entries": len(self._entries)}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# ── Per-workspace registry ───────────────────────────────────
+_caches: Dict[str, RouteCache] = {}
+_registry_lock = threading.Lock()
+
+
+def get_route_cache(workspace_dir: str) -> RouteCache:
+    key = os.path.normcase(os.path.abspath(workspace_dir))
+    with _registry_lock:
+        cache = _caches.get(key)
+        if cache is None:
+            cache = _caches[key] = RouteCache(workspace_dir)
+        return cache
+
+
+def get_route_cache_stats() -> dict:
+    """Lookup counters since start-up, summed over every loaded workspace."""
+    with _registry_lock:
+        caches = list(_caches.values())
+    hits = misses = 0
+    for cache in caches:
+        stats = cache.get_stats()
+        hits += stats["hits"]
+        misses += stats["misses"]
+    lookups = hits + misses
+    return {"lookups": lookups, "hits": hits, "hit_rate": round(hits / lookups, 2) if lookups else 0.0}
+
+
+@atexit.register
+def flush_all_route_caches():
+    """Persist event ids recorded since the last save (runs at interpreter exit)."""
+    with _registry_lock:
+        caches = list(_caches.values())
+    for cache in caches:
+        cache.flush()
+
+
+def invalidate_route_event(event_id: str) -> bool:
+    """Drop the cached route behind a downvoted decision (any loaded workspace)."""
+    with _registry_lock:
+        caches = list(_caches.values())
+    hit = False
+    for cache in caches:
+        hit = cache.invalidate_event(event_id) or hit
+    if hit:
+        logger.info(f"🗂️ ROUTE CACHE: Evicted route for downvoted event {event_id}")
+    return hit
@@ -0,0 +1,206 @@
+# ══════════════════════════════════════════════════════════════════
+# 🐚 Omni-IDE — Persistent Shell Session
+# ══════════════════════════════════════════════════════════════════
+#
+#  Opt-in (OMNI_PERSISTENT_SHELL=1, POSIX only). One long-lived shell per
+#  agent session, driven through a pty, so `cd`, activated venvs and
+#  exported variables carry over between TerminalTool calls.
+#
+#  Framing: each command is written to a script file and sourced in the
+#  running shell, followed by a printf of a per-command sentinel and $?.
+#  Output up to the sentinel line belongs to the command; the number after
+#  it is the exit code. Sourcing (rather than typing the command) keeps
+#  quoting, heredocs and syntax errors from desynchronising the framing.
+#
+#  Restart policy: on hard/idle timeout or cancellation the shell's whole
+#  process group is killed and a fresh shell is started on the next call
+#  (state is lost, and the result says so).
+#
+# ══════════════════════════════════════════════════════════════════
+
+import os
+import sys
+import uuid
+import codecs
+import shutil
+import signal
+import logging
+import select
+import tempfile
+import threading
+import subprocess
+import time
+from typing import Callable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+PERSISTENT_SHELL_ENV = "OMNI_PERSISTENT_SHELL"
+
+
+def is_enabled() -> bool:
+    return os.getenv(PERSISTENT_SHELL_ENV, "").strip().lower() in ("1", "true", "yes", "on")
+
+
+def is_supported() -> bool:
+    return sys.platform != "win32" and os.name == "posix"
+
+
+class ShellSession:
+    def __init__(self, cwd: str, env: dict):
+        self.cwd = cwd
+        self.env = dict(env)
+        self._proc: Optional[subprocess.Popen] = None
+        self._master_fd: Optional[int] = None
+        self._script_path: Optional[str] = None
+        self._lock = threading.Lock()
+        self.restarts = 0
+
+    # ----------------------------------------------------------
+    # LIFECYCLE
+    # ----------------------------------------------------------
+
+    @property
+    def alive(self) -> bool:
+        return self._proc is not None and self._proc.poll() is None
+
+    def _start(self):
+        import pty
+        import termios
+
+        shell = shutil.which("bash") or "/bin/sh"
+        args = [shell, "--noprofile", "--norc"] if shell.endswith("bash") else [shell]
+        master, slave = pty.openpty()
+        attrs = termios.tcgetattr(slave)
+        attrs[3] &= ~termios.ECHO  # don't echo the framing lines back
+        termios.tcsetattr(slave, termios.TCSANOW, attrs)
+
+        env = {**self.env, "PS1": "", "PS2": "", "TERM": "dumb"}
+        self._proc = subprocess.Popen(
+            args, stdin=slave, stdout=slave, stderr=slave,
+            cwd=self.cwd, env=env, start_new_session=True, close_fds=True,
+        )
+        os.close(slave)
+        self._master_fd = master
+        if self._script_path is None:
+            fd, self._script_path = tempfile.mkstemp(prefix="omni_shell_", suffix=".sh")
+            os.close(fd)
+        logger.info(f"🐚 SHELL: Started persistent {os.path.basename(shell)} (pid {self._proc.pid}) in {self.cwd}")
+
+    def _kill(self):
+        if self._proc is not None and self._proc.poll() is None:
+            try:
+                os.killpg(self._proc.pid, signal.SIGKILL)
+            except (OSError, ProcessLookupError):
+                pass
+            try:
+                self._proc.wait(timeout=2)
+            except subprocess.TimeoutExpired:
+                pass
+        if self._master_fd is not None:
+            try:
+                os.close(self._master_fd)
+            except OSError:
+                pass
+        self._proc = None
+        self._master_fd = None
+
+    def interrupt(self):
+        """Kill the running command (and the shell with it); the next run restarts the shell."""
+        self._kill()
+
+    def close(self):
+        with self._lock:
+            self._kill()
+            if self._script_path:
+                try:
+                    os.remove(self._script_path)
+                except OSError:
+                    pass
+                self._script_path = None
+
+    # ----------------------------------------------------------
+    # EXECUTION
+    # ----------------------------------------------------------
+
+    def run(self, command: str, on_line: Optional[Callable[[str], None]] = None, token=None,
+            hard_timeout: float = 120, idle_timeout: float = 60) -> Tuple[Optional[int], str, str]:
+        """
+        Run one command in the shell. Returns (exit_code, output, status) where
+        status is "exited", "timeout", "idle", "cancelled" or "died" (the
+        command ended the shell, e.g. `exit`). The pty merges stderr into output.
+        """
+        with self._lock:
+            if not self.alive:
+                if self._proc is not None or self.restarts:
+                    logger.info("🐚 SHELL: Restarting shell session")
+                self._kill()
+                self._start()
+
+            sentinel = f"__OMNI_DONE_{uuid.uuid4().hex}__"
+            with open(self._script_path, "w", encoding="utf-8") as f:
+                f.write(command + "\n")
+            frame = f". '{self._script_path}' < /dev/null; printf '{sentinel}%s\\n' \"$?\"\n"
+            os.write(self._master_fd, frame.encode("utf-8"))
+
+            if token is not None:
+                token.add_callback(self.interrupt)
+            try:
+                exit_code, lines, status = self._read_until(sentinel, on_line, token, hard_timeout, idle_timeout)
+            finally:
+                if token is not None:
+                    token.remove_callback(self.interrupt)
+
+            if status != "exited":
+                self._kill()
+                self.restarts += 1
+            return exit_code, "\n".join(lines).strip(), status
+
+    def _read_until(self, sentinel: str, on_line, token, hard_timeout: float, idle_timeout: float):
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        lines: List[str] = []
+        pending = ""
+        started = last_output = time.monotonic()
+        while True:
+            if token is not None and token.cancelled:
+                return None, lines, "cancelled"
+            now = time.monotonic()
+            if now - started > hard_timeout:
+                return None, lines, "timeout"
+            if now - last_output > idle_timeout:
+                return None, lines, "idle"
+            try:
+                ready, _, _ = select.select([self._master_fd], [], [], 0.25)
+                chunk = os.read(self._master_fd, 65536) if ready else None
+            except (OSError, ValueError, TypeError):
+                chunk = b""  # EIO / closed fd: the shell is gone
+            if chunk is None:
+                continue
+            if chunk == b"":
+                if token is not None and token.cancelled:
+                    return None, lines, "cancelled"
+                code = self._proc.wait() if self._proc is not None else None
+                if pending:
+                    lines.append(pending)
+                return code, lines, "died"
+            last_output = time.monotonic()
+            pending += decoder.decode(chunk)
+            *complete, pending = pending.split("\n")
+            for line in complete:
+                line = line.rstrip("\r")
+                if sentinel in line:
+                    # Output without a trailing newline shares the sentinel's line
+                    head, _, code = line.partition(sentinel)
+                    if head:
+                        lines.append(head)
+                        if on_line is not None:
+                            on_line(head)
+                    try:
+                        return int(code.strip()), lines, "exited"
+                    except ValueError:
+                        return None, lines, "exited"
+                lines.append(line)
+                if on_line is not None:
+                    try:
+                        on_line(line)
+                    except Exception:
+                        pass
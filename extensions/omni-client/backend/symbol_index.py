@@ -0,0 +1,320 @@
+# ══════════════════════════════════════════════════════════════════
+# 🗺️ Omni-IDE — Symbol Index & Repo Map
+# ══════════════════════════════════════════════════════════════════
+#
+#  Raw file heads are an expensive way to show a model a project's
+#  structure. This index records, per file, imports, classes (with
+#  methods) and functions with their signatures:
+#    • Python      → ast
+#    • JS/TS/TSX   → comment/string-stripping scanner + brace depth
+#  Entries are re-parsed only when a file's (mtime_ns, size) changes.
+#
+#  render_repo_map() turns it into a compact outline, e.g.
+#
+#    gateway.py
+#      imports: os, json, litellm, circuit_breaker
+#      class ModelGateway
+#        def get_cloud_chain(self) -> list
+#      def get_gateway()
+#
+#  Self-benchmark: python symbol_index.py [workspace]
+#
+# ══════════════════════════════════════════════════════════════════
+
+import os
+import re
+import ast
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+PY_EXTS = {".py"}
+JS_EXTS = {".js", ".jsx", ".ts", ".tsx", ".mjs", ".cjs"}
+MAX_FILE_BYTES = 512 * 1024
+MAX_INDEXED_FILES = 5000
+MAX_SIGNATURE_CHARS = 100
+
+
+# ----------------------------------------------------------
+# PYTHON
+# ----------------------------------------------------------
+
+def _short(text: str) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= MAX_SIGNATURE_CHARS else text[:MAX_SIGNATURE_CHARS - 3] + "..."
+
+
+def _py_signature(node) -> str:
+    prefix = "async def" if isinstance(node, ast.AsyncFunctionDef) else "def"
+    try:
+        args = ast.unparse(node.args)
+        returns = f" -> {ast.unparse(node.returns)}" if node.returns else ""
+    except Exception:
+        args, returns = "...", ""
+    return _short(f"{prefix} {node.name}({args}){returns}")
+
+
+def parse_python(source: str) -> dict:
+    tree = ast.parse(source)
+    imports, classes, functions = [], [], []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            imports.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            imports.append("." * node.level + (node.module or ""))
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            functions.append({"name": node.name, "signature": _py_signature(node), "line": node.lineno})
+        elif isinstance(node, ast.ClassDef):
+            try:
+                bases = ", ".join(ast.unparse(b) for b in node.bases)
+            except Exception:
+                bases = ""
+            methods = [
+                {"name": item.name, "signature": _py_signature(item), "line": item.lineno}
+                for item in node.body if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef))
+            ]
+            classes.append({
+                "name": node.name,
+                "signature": _short(f"class {node.name}({bases})" if bases else f"class {node.name}"),
+                "line": node.lineno,
+                "methods": methods,
+            })
+    return {"imports": _dedupe(imports), "classes": classes, "functions": functions}
+
+
+# ----------------------------------------------------------
+# JS / TS / TSX
+# ----------------------------------------------------------
+
+def _strip_js(source: str) -> str:
+    """Blank out comments and string/template literals, keeping newlines (and so line numbers)."""
+    out = []
+    i, n = 0, len(source)
+    while i < n:
+        ch = source[i]
+        nxt = source[i + 1] if i + 1 < n else ""
+        if ch == "/" and nxt == "/":
+            end = source.find("\n", i)
+            i = n if end == -1 else end
+        elif ch == "/" and nxt == "*":
+            end = source.find("*/", i + 2)
+            end = n if end == -1 else end + 2
+            out.append("\n" * source.count("\n", i, end))
+            i = end
+        elif ch in "'\"`":
+            quote, j = ch, i + 1
+            while j < n and source[j] != quote:
+                if source[j] == "\\":
+                    j += 1
+                elif quote != "`" and source[j] == "\n":
+                    break
+                j += 1
+            body = source[i + 1:j]
+            # Keep module specifiers readable for import extraction; blank everything else
+            keep = quote != "`" and len(body) < 200 and "\n" not in body
+            out.append(quote + (body if keep else "\n" * body.count("\n")) + quote)
+            i = j + 1
+        else:
+            out.append(ch)
+            i += 1
+    return "".join(out)
+
+
+_JS_IMPORT_RE = re.compile(r"^\s*import\b[^;]*?\bfrom\s+['\"]([^'\"]+)['\"]|^\s*import\s+['\"]([^'\"]+)['\"]"
+                           r"|\brequire\(\s*['\"]([^'\"]+)['\"]\s*\)")
+_JS_FUNC_RE = re.compile(r"^\s*(?:export\s+)?(?:default\s+)?(?:async\s+)?function\s*\*?\s*([A-Za-z_$][\w$]*)\s*(<[^>]*>)?\s*\(([^)]*)\)")
+_JS_ARROW_RE = re.compile(r"^\s*(?:export\s+)?(?:const|let|var)\s+([A-Za-z_$][\w$]*)\s*(?::[^=]+)?=\s*(?:async\s+)?"
+                          r"(?:\(([^)]*)\)|([A-Za-z_$][\w$]*))\s*(?::[^=]+)?=>")
+_JS_CLASS_RE = re.compile(r"^\s*(?:export\s+)?(?:default\s+)?(?:abstract\s+)?class\s+([A-Za-z_$][\w$]*)([^{]*)")
+_JS_TYPE_RE = re.compile(r"^\s*(?:export\s+)?(?:declare\s+)?(interface|type|enum)\s+([A-Za-z_$][\w$]*)")
+_JS_METHOD_RE = re.compile(r"^\s*(?:(?:public|private|protected|static|async|readonly|override|get|set)\s+)*"
+                           r"([A-Za-z_$#][\w$]*)\s*(<[^>]*>)?\s*\(([^)]*)\)\s*(?::\s*[^{;]+)?\s*\{")
+_JS_KEYWORDS = frozenset({"if", "for", "while", "switch", "catch", "function", "return", "with"})
+
+
+def parse_js(source: str) -> dict:
+    imports, classes, functions, types = [], [], [], []
+    depth = 0
+    current_class = None  # (entry, depth at which its body lives)
+    for lineno, line in enumerate(_strip_js(source).split("\n"), start=1):
+        for match in _JS_IMPORT_RE.finditer(line):
+            imports.append(next(g for g in match.groups() if g))
+        if depth == 0 or (current_class is None and line.lstrip().startswith("export")):
+            m = _JS_CLASS_RE.match(line)
+            if m:
+                heritage = " ".join(m.group(2).split())
+                current_class = ({"name": m.group(1), "line": lineno, "methods": [],
+                                  "signature": _short(f"class {m.group(1)} {heritage}".strip())}, depth + 1)
+                classes.append(current_class[0])
+            elif (m := _JS_FUNC_RE.match(line)):
+                functions.append({"name": m.group(1), "line": lineno,
+                                  "signature": _short(f"function {m.group(1)}({m.group(3).strip()})")})
+            elif (m := _JS_ARROW_RE.match(line)):
+                params = m.group(2) if m.group(2) is not None else m.group(3)
+                functions.append({"name": m.group(1), "line": lineno,
+                                  "signature": _short(f"const {m.group(1)} = ({(params or '').strip()}) =>")})
+            elif (m := _JS_TYPE_RE.match(line)):
+                types.append({"name": m.group(2), "line": lineno, "signature": f"{m.group(1)} {m.group(2)}"})
+        elif current_class is not None and depth == current_class[1]:
+            m = _JS_METHOD_RE.match(line)
+            if m and m.group(1) not in _JS_KEYWORDS:
+                current_class[0]["methods"].append({
+                    "name": m.group(1), "line": lineno,
+                    "signature": _short(f"{m.group(1)}({m.group(3).strip()})"),
+                })
+        depth += line.count("{") - line.count("}")
+        depth = max(depth, 0)
+        if current_class is not None and depth < current_class[1]:
+            current_class = None
+    return {"imports": _dedupe(imports), "classes": classes, "functions": functions, "types": types}
+
+
+def _dedupe(items: List[str]) -> List[str]:
+    seen, out = set(), []
+    for item in items:
+        if item and item not in seen:
+            seen.add(item)
+            out.append(item)
+    return out
+
+
+def parse_file(path: str, source: str) -> Optional[dict]:
+    ext = os.path.splitext(path)[1].lower()
+    try:
+        if ext in PY_EXTS:
+            return parse_python(source)
+        if ext in JS_EXTS:
+            return parse_js(source)
+    except (SyntaxError, ValueError, RecursionError):
+        return {"imports": [], "classes": [], "functions": [], "error": "unparsable"}
+    return None
+
+
+# ----------------------------------------------------------
+# INDEX
+# ----------------------------------------------------------
+
+class SymbolIndex:
+    def __init__(self, workspace_dir: str):
+        self.workspace_dir = workspace_dir
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Tuple[Tuple[int, int], Optional[dict]]] = {}  # rel → (stamp, symbols)
+        self._generation: Optional[int] = None
+
+    def refresh(self, core=None) -> int:
+        """Re-parse files whose (mtime_ns, size) changed; returns the number re-parsed."""
+        from intelligence_core import IntelligenceCore
+        core = core or IntelligenceCore(self.workspace_dir)
+        generation = core.workspace_generation()
+        with self._lock:
+            if generation == self._generation:
+                return 0
+            seen, updated = set(), 0
+            for i, path in enumerate(core.iter_files(core._parse_gitignore())):
+                if i >= MAX_INDEXED_FILES:
+                    break
+                rel_path = path.relative_to(core.workspace_dir).as_posix()
+                seen.add(rel_path)
+                try:
+                    st = path.stat()
+                except OSError:
+                    continue
+                stamp = (st.st_mtime_ns, st.st_size)
+                cached = self._entries.get(rel_path)
+                if cached is not None and cached[0] == stamp:
+                    continue
+                symbols = None
+                ext = path.suffix.lower()
+                if (ext in PY_EXTS or ext in JS_EXTS) and st.st_size <= MAX_FILE_BYTES:
+                    try:
+                        symbols = parse_file(str(path), path.read_text(encoding="utf-8", errors="replace"))
+                    except OSError:
+                        symbols = None
+                self._entries[rel_path] = (stamp, symbols)
+                updated += 1
+            for rel_path in [p for p in self._entries if p not in seen]:
+                del self._entries[rel_path]
+                updated += 1
+            self._generation = generation
+        if updated:
+            logger.info(f"🗺️ SYMBOLS: Re-parsed {updated} file(s)")
+        return updated
+
+    def symbols(self, rel_path: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(rel_path)
+        return entry[1] if entry else None
+
+    def render_repo_map(self, max_chars: int = 6000, paths: Optional[List[str]] = None) -> str:
+        """Compact outline of the workspace; files listed in `paths` come first."""
+        with self._lock:
+            entries = dict(self._entries)
+        order = sorted(entries)
+        if paths:
+            front = [p for p in paths if p in entries]
+            order = front + [p for p in order if p not in set(front)]
+
+        blocks, used, omitted = [], 0, 0
+        for rel_path in order:
+            block = _render_file(rel_path, entries[rel_path][1])
+            if used + len(block) + 1 > max_chars:
+                omitted += 1
+                continue
+            blocks.append(block)
+            used += len(block) + 1
+        if omitted:
+            blocks.append(f"... ({omitted} more files not shown)")
+        return "\n".join(blocks)
+
+
+def _render_file(rel_path: str, symbols: Optional[dict]) -> str:
+    if not symbols:
+        return rel_path
+    lines = [rel_path]
+    if symbols.get("imports"):
+        lines.append("  imports: " + _short(", ".join(symbols["imports"])))
+    for cls in symbols.get("classes", []):
+        lines.append(f"  {cls['signature']}")
+        lines.extend(f"    {m['signature']}" for m in cls.get("methods", []))
+    lines.extend(f"  {t['signature']}" for t in symbols.get("types", []))
+    lines.extend(f"  {fn['signature']}" for fn in symbols.get("functions", []))
+    return "\n".join(lines)
+
+
+# ── Per-workspace registry ───────────────────────────────────
+_indexes: Dict[str, SymbolIndex] = {}
+_registry_lock = threading.Lock()
+
+
+def get_symbol_index(workspace_dir: str) -> SymbolIndex:
+    key = os.path.normcase(os.path.abspath(workspace_dir))
+    with _registry_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = _indexes[key] = SymbolIndex(workspace_dir)
+        return index
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from intelligence_core import IntelligenceCore
+    from symbol_index import get_symbol_index  # the instance IntelligenceCore uses, not __main__'s
+
+    for workspace in sys.argv[1:] or [os.path.dirname(os.path.abspath(__file__))]:
+        core = IntelligenceCore(workspace)
+        index = get_symbol_index(workspace)
+        start = time.perf_counter()
+        index.refresh(core)
+        cold_ms = (time.perf_counter() - start) * 1000
+        n_files = sum(1 for _ in core.iter_files(core._parse_gitignore()))
+        heads = core.get_workspace_context(max_files=n_files, max_chars_per_file=1500)
+        full_map = index.render_repo_map(max_chars=10**9)
+        # ~4 chars per token is the usual rough estimate for code
+        print(f"{workspace}: {n_files} files, index built in {cold_ms:.0f} ms")
+        print(f"  file heads (1500 chars/file): {len(heads):>8} chars ≈ {len(heads) // 4:>7} tokens")
+        print(f"  repo map (all files)        : {len(full_map):>8} chars ≈ {len(full_map) // 4:>7} tokens"
+              f"  ({100 - 100 * len(full_map) // max(len(heads), 1)}% smaller)")
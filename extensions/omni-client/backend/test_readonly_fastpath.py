@@ -0,0 +1,65 @@
+import pytest
+from readonly_fastpath import try_readonly_fastpath
+
+
+@pytest.fixture
+def workspace(tmp_path):
+    (tmp_path / "src").mkdir()
+    (tmp_path / "src" / "app.py").write_text("print('hello')\n", encoding="utf-8")
+    (tmp_path / "src" / "utils.py").write_text("def helper():\n    return 1\n", encoding="utf-8")
+    (tmp_path / "README.md").write_text("# Demo\n", encoding="utf-8")
+    (tmp_path / ".env").write_text("SECRET=1\n", encoding="utf-8")
+    return str(tmp_path)
+
+
+@pytest.mark.parametrize("text", ["what's in folder src", "What is in the directory src?", "list src"])
+def test_folder_listing(workspace, text):
+    answer = try_readonly_fastpath(text, workspace)
+    assert answer is not None
+    assert "app.py" in answer and "utils.py" in answer
+
+
+@pytest.mark.parametrize("text", ["file tree", "project structure", "show me the file tree"])
+def test_tree(workspace, text):
+    answer = try_readonly_fastpath(text, workspace)
+    assert answer is not None
+    assert "src/" in answer and "app.py" in answer and "README.md" in answer
+
+
+@pytest.mark.parametrize("text", ["open src/app.py", "show src/app.py", "cat README.md"])
+def test_show_file(workspace, text):
+    answer = try_readonly_fastpath(text, workspace)
+    assert answer is not None
+    assert "print('hello')" in answer or "# Demo" in answer
+
+
+@pytest.mark.parametrize("text", [
+    "show src/app.py and fix the bug",   # not purely read-only
+    "open src/missing.py",               # unknown file
+    "open .env",                         # ignored file stays with the agent
+    "open ../outside.py",                # escapes the workspace
+    "hello there",
+])
+def test_defers_to_agent(workspace, text):
+    assert try_readonly_fastpath(text, workspace) is None
+
+
+def test_no_workspace():
+    assert try_readonly_fastpath("file tree", None) is None
+
+
+def test_chat_endpoint_answers_before_agent(workspace, monkeypatch):
+    """Read-only phrasings without an action keyword must not reach the agent or the LLM chat."""
+    pytest.importorskip("fastapi")
+    from fastapi.testclient import TestClient
+    import main
+
+    def _no_agent(*args, **kwargs):
+        raise AssertionError("agent should not be built for a read-only request")
+
+    monkeypatch.setattr(main, "get_agent", _no_agent)
+    client = TestClient(main.app)
+    for text in ("what's in folder src", "file tree", "project structure", "open src/app.py"):
+        response = client.post("/api/chat", json={"text": text, "projectPath": workspace})
+        assert response.status_code == 200
+        assert "app.py" in response.json()["response"] or "print('hello')" in response.json()["response"]
@@ -0,0 +1,50 @@
+import asyncio
+import threading
+
+from request_coalescer import RequestCoalescer
+
+
+def test_cancelled_follower_does_not_cancel_the_others():
+    coalescer = RequestCoalescer()
+    release = threading.Event()
+
+    def _slow_call():
+        release.wait(5)
+        return "answer"
+
+    async def _scenario():
+        leader = asyncio.ensure_future(coalescer.run_async("k", _slow_call))
+        await asyncio.sleep(0.05)
+        follower_a = asyncio.ensure_future(coalescer.run_async("k", _slow_call))
+        follower_b = asyncio.ensure_future(coalescer.run_async("k", _slow_call))
+        await asyncio.sleep(0.05)
+        follower_a.cancel()
+        await asyncio.sleep(0.05)
+        release.set()
+        return await leader, await follower_b, follower_a
+
+    leader_result, follower_result, cancelled = asyncio.run(_scenario())
+    assert leader_result == "answer"
+    assert follower_result == "answer"
+    assert cancelled.cancelled()
+    assert coalescer.get_stats() == {"in_flight": 0, "executed_calls": 1, "calls_saved": 2}
+
+
+def test_followers_share_the_leaders_exception():
+    coalescer = RequestCoalescer()
+    release = threading.Event()
+
+    def _failing_call():
+        release.wait(5)
+        raise RuntimeError("boom")
+
+    async def _scenario():
+        leader = asyncio.ensure_future(coalescer.run_async("k", _failing_call))
+        await asyncio.sleep(0.05)
+        follower = asyncio.ensure_future(coalescer.run_async("k", _failing_call))
+        await asyncio.sleep(0.05)
+        release.set()
+        return await asyncio.gather(leader, follower, return_exceptions=True)
+
+    results = asyncio.run(_scenario())
+    assert all(isinstance(r, RuntimeError) for r in results)
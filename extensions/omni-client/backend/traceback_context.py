@@ -0,0 +1,203 @@
+# ══════════════════════════════════════════════════════════════════
+# 🧭 Omni-IDE — Traceback-Scoped Debug Context
+# ══════════════════════════════════════════════════════════════════
+#
+#  /debug used to send five arbitrary files with the error, and the
+#  frames the traceback points at were often not among them. This module
+#  pulls (file, line) frames out of Python and Node stack traces, keeps
+#  the ones inside the workspace, and renders only:
+#    • a window of source around each frame line (marked with >>), and
+#    • the definition of the function each frame is in
+#      (whole body when short, header only when long),
+#  innermost frame first, merged per file and cut at a character budget.
+#
+# ══════════════════════════════════════════════════════════════════
+
+import os
+import re
+import ast
+import logging
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+WINDOW_LINES = 6          # lines of source on each side of a frame line
+MAX_FUNCTION_LINES = 60   # longer definitions contribute their header only
+MAX_FRAMES = 12
+
+# Python:  File "/ws/app.py", line 12, in handler
+_PY_FRAME_RE = re.compile(r'File "([^"]+)", line (\d+)(?:, in ([^\s]+))?')
+# pytest short tracebacks:  app.py:12: in handler   /   app.py:12: ValueError
+_PYTEST_FRAME_RE = re.compile(r'^\s*([^\s:]+\.py):(\d+): ', re.MULTILINE)
+# Node / V8:  at fn (/ws/app.js:12:5)   /   at /ws/app.js:12:5   /   at file:///ws/app.mjs:12:5
+_NODE_FRAME_RE = re.compile(r'^\s*at (?:(?:async )?([^\s(]+) \()?(?:file://)?([^\s()]+?):(\d+):\d+\)?\s*$', re.MULTILINE)
+# Node's first line for uncaught errors:  /ws/app.js:12
+_NODE_HEADER_RE = re.compile(r'^((?:/|[A-Za-z]:\\)[^\s:]+\.[cm]?[jt]sx?):(\d+)\s*$', re.MULTILINE)
+
+_JS_DEF_RE = re.compile(
+    r"^\s*(?:export\s+)?(?:default\s+)?(?:async\s+)?function\b"
+    r"|^\s*(?:export\s+)?(?:const|let|var)\s+[\w$]+\s*=\s*(?:async\s+)?(?:function\b|\([^)]*\)\s*=>|[\w$]+\s*=>)"
+    r"|^\s*(?:(?:public|private|protected|static|async|get|set)\s+)*[\w$#]+\s*\([^)]*\)\s*(?::\s*[^{]+)?\{\s*$"
+)
+_JS_NOT_DEF = re.compile(r"^\s*(?:if|for|while|switch|catch|return|else)\b")
+_IGNORED_PARTS = ("site-packages", "dist-packages", "node_modules", "node:internal", "<frozen")
+
+
+def _relative(workspace_dir: str, raw_path: str) -> Optional[str]:
+    """Workspace-relative path for a frame file, or None when it lives outside the workspace."""
+    if any(part in raw_path for part in _IGNORED_PARTS) or raw_path.startswith("<"):
+        return None
+    full = raw_path if os.path.isabs(raw_path) else os.path.join(workspace_dir, raw_path)
+    full = os.path.realpath(full)
+    root = os.path.realpath(workspace_dir)
+    if os.path.normcase(full) != os.path.normcase(root) and not os.path.normcase(full).startswith(os.path.normcase(root) + os.sep):
+        return None
+    if not os.path.isfile(full):
+        return None
+    return os.path.relpath(full, root).replace(os.sep, "/")
+
+
+def parse_frames(error_text: str, workspace_dir: str) -> List[Tuple[str, int, Optional[str]]]:
+    """(rel_path, line, function) for workspace frames, innermost first, deduplicated."""
+    found: List[Tuple[int, str, int, Optional[str]]] = []  # (priority, path, line, fn)
+    # Python prints innermost last; Node prints innermost first
+    py_frames = [(m.group(1), int(m.group(2)), m.group(3)) for m in _PY_FRAME_RE.finditer(error_text)]
+    py_frames += [(m.group(1), int(m.group(2)), None) for m in _PYTEST_FRAME_RE.finditer(error_text)]
+    for i, frame in enumerate(reversed(py_frames)):
+        found.append((i, *frame))
+    node_frames = [(m.group(1), int(m.group(2)), None) for m in _NODE_HEADER_RE.finditer(error_text)]
+    node_frames += [(m.group(2), int(m.group(3)), m.group(1)) for m in _NODE_FRAME_RE.finditer(error_text)]
+    for i, frame in enumerate(node_frames):
+        found.append((i, *frame))
+
+    frames: List[Tuple[str, int, Optional[str]]] = []
+    seen: Dict[Tuple[str, int], int] = {}
+    for _, raw_path, line, fn in sorted(found, key=lambda f: f[0]):
+        rel_path = _relative(workspace_dir, raw_path)
+        if rel_path is None:
+            continue
+        fn = fn if fn and fn != "<module>" else None
+        if (rel_path, line) in seen:
+            # Node's header line names no function; its `at` duplicate does
+            i = seen[(rel_path, line)]
+            if frames[i][2] is None and fn:
+                frames[i] = (rel_path, line, fn)
+            continue
+        if len(frames) >= MAX_FRAMES:
+            continue
+        seen[(rel_path, line)] = len(frames)
+        frames.append((rel_path, line, fn))
+    return frames
+
+
+# ----------------------------------------------------------
+# ENCLOSING DEFINITIONS
+# ----------------------------------------------------------
+
+def _python_definition(tree: ast.AST, line: int) -> Optional[Tuple[int, int]]:
+    """Line span to show for the innermost function containing `line`."""
+    best = None
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            end = getattr(node, "end_lineno", None) or node.lineno
+            start = min([node.lineno] + [d.lineno for d in node.decorator_list])
+            if start <= line <= end and (best is None or start >= best[0]):
+                body_start = node.body[0].lineno if node.body else end
+                best = (start, end, body_start)
+    if best is None:
+        return None
+    start, end, body_start = best
+    if end - start + 1 <= MAX_FUNCTION_LINES:
+        return start, end
+    return start, max(start, body_start - 1)  # signature only
+
+
+def _js_definition(lines: List[str], line: int) -> Optional[Tuple[int, int]]:
+    """Header line of the nearest function-like definition above `line`."""
+    for lineno in range(min(line, len(lines)), max(0, line - 200), -1):
+        text = lines[lineno - 1]
+        if _JS_DEF_RE.match(text) and not _JS_NOT_DEF.match(text):
+            return lineno, lineno
+    return None
+
+
+# ----------------------------------------------------------
+# RENDERING
+# ----------------------------------------------------------
+
+def _merge(spans: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    merged: List[List[int]] = []
+    for start, end in sorted(spans):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return [(s, e) for s, e in merged]
+
+
+def _render_file(rel_path: str, lines: List[str], spans: List[Tuple[int, int]], marks: set) -> str:
+    width = len(str(len(lines)))
+    parts = [f"### File: {rel_path}", "```"]
+    for i, (start, end) in enumerate(_merge(spans)):
+        if i:
+            parts.append("...")
+        for lineno in range(start, end + 1):
+            marker = ">>" if lineno in marks else "  "
+            parts.append(f"{marker}{lineno:>{width}} | {lines[lineno - 1]}")
+    parts.append("```")
+    return "\n".join(parts)
+
+
+def build_traceback_context(error_text: str, workspace_dir: str, max_chars: int = 8000,
+                            window: int = WINDOW_LINES) -> str:
+    """Source around each workspace frame plus its function definition, or "" when no frame matched."""
+    frames = parse_frames(error_text or "", workspace_dir)
+    if not frames:
+        return ""
+
+    file_lines: Dict[str, List[str]] = {}
+    trees: Dict[str, Optional[ast.AST]] = {}
+    spans: Dict[str, List[Tuple[int, int]]] = {}
+    marks: Dict[str, set] = {}
+    order: List[str] = []
+    rendered = ""
+    for rel_path, line, _ in frames:
+        if rel_path not in file_lines:
+            try:
+                with open(os.path.join(workspace_dir, rel_path), "r", encoding="utf-8", errors="replace") as f:
+                    file_lines[rel_path] = f.read().splitlines()
+            except OSError:
+                file_lines[rel_path] = []
+        lines = file_lines[rel_path]
+        if not 1 <= line <= len(lines):
+            continue
+
+        frame_spans = [(max(1, line - window), min(len(lines), line + window))]
+        if rel_path.endswith(".py"):
+            if rel_path not in trees:
+                try:
+                    trees[rel_path] = ast.parse("\n".join(lines))
+                except (SyntaxError, ValueError):
+                    trees[rel_path] = None
+            definition = _python_definition(trees[rel_path], line) if trees[rel_path] else None
+        else:
+            definition = _js_definition(lines, line)
+        if definition:
+            frame_spans.append(definition)
+
+        # Widest option that still fits the budget: window + definition, window, ±2 lines
+        options = [frame_spans, frame_spans[:1], [(max(1, line - 2), min(len(lines), line + 2))]]
+        candidate_marks = {**marks, rel_path: marks.get(rel_path, set()) | {line}}
+        candidate_order = order + ([rel_path] if rel_path not in order else [])
+        for option in options:
+            candidate_spans = {**spans, rel_path: spans.get(rel_path, []) + option}
+            candidate = "\n\n".join(
+                _render_file(p, file_lines[p], candidate_spans[p], candidate_marks[p]) for p in candidate_order
+            )
+            if len(candidate) <= max_chars:
+                spans, marks, order, rendered = candidate_spans, candidate_marks, candidate_order, candidate
+                break
+
+    if rendered:
+        logger.info(f"🧭 TRACEBACK: {len(frames)} workspace frame(s) → {len(rendered)} chars of context")
+    return rendered